@@ -0,0 +1,911 @@
+# -*- coding: utf-8 -*-
+"""離線效能量測與一致性檢查 (不連網，使用錄製好的頁面)
+
+錄製新的頁面: SCRAPER_RECORD=fixtures python scraper.py
+
+用法:
+    python bench.py replay --fixtures fixtures/
+    python bench.py replay --update-golden
+    python bench.py parsers --fixtures fixtures/
+    python bench.py titles
+    python bench.py categories
+    python bench.py index
+    python bench.py dedup
+    python bench.py structured
+    python bench.py notify
+    python bench.py memory
+    python bench.py archive
+    python bench.py stream
+    python bench.py prune --fixtures fixtures/
+    python bench.py startup --fixtures fixtures/
+    python bench.py scaling --fixtures fixtures/
+"""
+import argparse
+import asyncio
+import charset_normalizer
+import gc
+import json
+import logging
+import os
+import random
+import re
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone, timedelta
+from pathlib import Path
+from aiohttp import web
+
+import scraper
+
+FIXTURES_DIR = Path("fixtures")
+GOLDEN_FILE = "golden.json"
+
+# =========================
+# 🧪 離線抓取替身
+# =========================
+class StubFetcher:
+    """以錄製的頁面取代網路 (不經節流、HTTP 與解碼)，介面與 scraper.Fetcher 相同，交給 scraper.Pipeline 使用"""
+    cache = None
+
+    def __init__(self, pages):
+        self.pages = pages
+        self.metrics = scraper.RunMetrics()
+
+    async def fetch_page(self, url, referer=None, encoding=None, **kwargs):
+        return scraper.Page(url, self.pages.get(url), False)
+
+    async def fetch_pages(self, urls, **kwargs):
+        return [await self.fetch_page(u) for u in urls]
+
+    async def fetch_text(self, url, referer=None, encoding=None):
+        return self.pages.get(url)
+
+def load_fixtures(root=FIXTURES_DIR):
+    """讀取錄製檔，回傳 網址 -> 解碼後的 HTML (失敗的回應為 None)"""
+    archive = scraper.FixtureArchive(root)
+    return {url: archive.text(url) for url in archive.index}
+
+async def run_platforms(pages):
+    """與正式抓取相同的管線 (執行緒解析)，只把抓取換成錄製的頁面"""
+    return await scraper.Pipeline(StubFetcher(pages), mode="thread").run(scraper.PLATFORMS)
+
+def event_keys(events):
+    return sorted((e['platform'], e['url'], e['title'], e['img_url'] or '') for e in events)
+
+def golden_keys(events):
+    return sorted([e['platform'], e['url'], e['title'], e['img_url'] or '', e['type']] for e in events)
+
+# =========================
+# 📼 錄製檔重播
+# =========================
+def stage_totals(metrics):
+    totals = {}
+    for m in metrics.urls.values():
+        for field in ('decode', 'parse', 'normalize'):
+            totals[field] = totals.get(field, 0.0) + m[field]
+    return totals
+
+def cmd_replay(args):
+    """重播錄製檔：量測牆鐘時間、CPU 時間、記憶體峰值與每秒活動數，並與 golden 檔比對輸出"""
+    archive = scraper.FixtureArchive(args.fixtures)
+    if not archive.index:
+        print(f"no fixtures in {args.fixtures} (record with SCRAPER_RECORD={args.fixtures} python scraper.py)")
+        return 1
+    # 替身伺服器不會限流，退避只會量到 sleep
+    scraper.RETRY_BACKOFF = 0
+    wall = cpu = float('inf')
+    for _ in range(args.repeat):
+        wall_start, cpu_start = time.perf_counter(), time.process_time()
+        events, metrics = asyncio.run(scraper.replay_events(archive, mode=args.mode, workers=args.workers))
+        wall = min(wall, time.perf_counter() - wall_start)
+        cpu = min(cpu, time.process_time() - cpu_start)
+    tracemalloc.start()
+    asyncio.run(scraper.replay_events(archive, mode=args.mode, workers=args.workers))
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    titles = [e['title'] for e in events]
+    start = time.perf_counter()
+    for t in titles: scraper.create_event_obj(t, "u", "bench")
+    clean = time.perf_counter() - start
+    stages = stage_totals(metrics)
+    print(f"urls {len(archive.index)} | events {len(events)} | parser {scraper.HTML_PARSER} | "
+          f"{args.mode} x{args.workers}")
+    print(f"wall {wall * 1000:8.1f} ms   cpu {cpu * 1000:8.1f} ms   peak mem {peak / 1024 / 1024:6.1f} MiB   "
+          f"{len(events) / wall:10,.0f} events/s")
+    print(f"stages: decode {stages['decode'] * 1000:.1f} ms | parse {stages['parse'] * 1000:.1f} ms | "
+          f"normalize+classify {stages['normalize'] * 1000:.1f} ms | create_event_obj+category {clean * 1000:.1f} ms")
+
+    golden_path = Path(args.fixtures) / GOLDEN_FILE
+    keys = golden_keys(events)
+    if args.update_golden or not golden_path.exists():
+        golden_path.write_text(json.dumps(keys, ensure_ascii=False, indent=0) + "\n", encoding='utf-8')
+        print(f"golden written: {golden_path} ({len(keys)} events)")
+        return 0
+    golden = json.loads(golden_path.read_text(encoding='utf-8'))
+    if keys == golden:
+        print("golden OK")
+        return 0
+    have, want = set(map(tuple, keys)), set(map(tuple, golden))
+    print(f"golden MISMATCH: {len(have - want)} added, {len(want - have)} missing")
+    for k in sorted(want - have)[:10]: print(f"    - {k}")
+    for k in sorted(have - want)[:10]: print(f"    + {k}")
+    return 1
+
+# =========================
+# 🌲 解析器後端
+# =========================
+def available_parsers():
+    parsers = ["html.parser"]
+    try:
+        import lxml  # noqa: F401
+        parsers.append("lxml")
+    except ImportError:
+        pass
+    return parsers
+
+def cmd_parsers(args):
+    """每個可用的解析器跑一次全部平台，比較耗時並確認輸出與 html.parser 一致"""
+    pages = load_fixtures(args.fixtures)
+    baseline = None
+    ok = True
+    for name in available_parsers():
+        scraper.HTML_PARSER = name
+        best = float('inf')
+        for _ in range(args.repeat):
+            start = time.perf_counter()
+            events = asyncio.run(run_platforms(pages))
+            best = min(best, time.perf_counter() - start)
+        keys = event_keys(events)
+        if baseline is None: baseline = keys
+        same = keys == baseline
+        ok = ok and same
+        print(f"{name:12s} {best * 1000:8.1f} ms  {len(events):5d} events  parity={'OK' if same else 'MISMATCH'}")
+        if not same:
+            for k in sorted(set(baseline) ^ set(keys))[:10]:
+                print(f"    {'-' if k in baseline else '+'} {k}")
+    return 0 if ok else 1
+
+# =========================
+# 🧹 標題清洗
+# =========================
+def legacy_create_event_obj(title, url, platform, img_url=None, type_override=None):
+    """改版前的 create_event_obj (每次呼叫重建清單與時區、逐詞 replace)，作為比較基準"""
+    if not title: return None
+    noise_keywords = list(scraper.DEFAULT_NOISE_KEYWORDS)
+    if title.strip() in noise_keywords: return None
+    title = re.sub(r'^(event-)?banner-', '', title, flags=re.I)
+    for n in noise_keywords: title = title.replace(n, "")
+    title = re.sub(r'\d{4}[-/]\d{1,2}[-/]\d{1,2}', '', title)
+    title = re.sub(r'^[»\s]+|[»\s]+$', '', title).strip()
+    if re.match(r'^\d+$', title) or len(title) < 2: return None
+    tw_tz = timezone(timedelta(hours=8))
+    scraped_time = datetime.now(tw_tz).isoformat()
+    event_type = type_override if type_override else scraper.get_event_category_from_title(title)
+    return {
+        'title': title, 'url': url, 'platform': platform, 'img_url': img_url,
+        'date': "詳內文", 'type': event_type, 'scraped_at': scraped_time
+    }
+
+SAMPLE_TITLES = [
+    "周杰倫 嘉年華 世界巡迴演唱會", "國家交響樂團 馬勒第五號", "雲門舞集 新作首演", "莫內與印象派 特展",
+    "親子科學 夏令營", "台北電影節 數位修復 經典放映", "AI 與 Python 實作工作坊", "脫口秀之夜",
+    "Fan Concert 見面會", "歌劇 魔笛", "布袋戲 經典重現", "市集 週末美食",
+]
+SAMPLE_NOISE = ["立即購票", "Read More", "查看更多", "2026-05-01", "» ", "event-banner-", "詳細資訊", ""]
+
+def synthetic_titles(n, seed=42):
+    """混合真實標題、雜訊詞、日期與純雜訊連結，模擬列表頁的 anchor 文字"""
+    rng = random.Random(seed)
+    pool = SAMPLE_TITLES + list(scraper.DEFAULT_NOISE_KEYWORDS[:20]) + ["12345", "更多"]
+    titles = []
+    for _ in range(n):
+        t = rng.choice(pool)
+        if rng.random() < 0.5: t = f"{rng.choice(SAMPLE_NOISE)}{t} {rng.choice(SAMPLE_NOISE)}"
+        titles.append(t)
+    return titles
+
+def time_per_10k(func, titles, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for t in titles: func(t, "https://example.com/e", "bench", type_override="其他")
+        best = min(best, time.perf_counter() - start)
+    return best * 10000 / len(titles)
+
+def cmd_titles(args):
+    """create_event_obj 改版前後的吞吐量 (每 1 萬個標題)，並確認清洗結果相同"""
+    titles = synthetic_titles(args.count)
+    before = time_per_10k(legacy_create_event_obj, titles, args.repeat)
+    after = time_per_10k(scraper.create_event_obj, titles, args.repeat)
+    diff = sum(
+        1 for t in titles
+        if (legacy_create_event_obj(t, "u", "p", type_override="x") or {}).get('title')
+        != (scraper.create_event_obj(t, "u", "p", type_override="x") or {}).get('title'))
+    print(f"legacy   {before * 1000:8.1f} ms / 10k titles  ({10000 / before:10,.0f} titles/s)")
+    print(f"current  {after * 1000:8.1f} ms / 10k titles  ({10000 / after:10,.0f} titles/s)")
+    print(f"speedup  {before / after:8.2f}x   output mismatches: {diff}/{len(titles)}")
+    return 0
+
+# =========================
+# 🏷️ 類別分類
+# =========================
+def legacy_category(title):
+    """改版前的逐類別 any(keyword in title_lower) 線性掃描，作為比較基準"""
+    if not title: return "其他"
+    title_lower = title.lower()
+    for category, keywords in scraper.CATEGORY_KEYWORDS.items():
+        if any(keyword in title_lower for keyword in keywords): return category
+    return "其他"
+
+# 固定的分類結果：改動關鍵字或比對邏輯時，這份對照必須仍然成立
+CATEGORY_CORPUS = {
+    "周杰倫 嘉年華 世界巡迴演唱會": "音樂會/演唱會",
+    "國家交響樂團 馬勒第五號": "音樂會/演唱會",
+    "BLACKPINK WORLD TOUR": "音樂會/演唱會",
+    "Taipei Jazz Live": "音樂會/演唱會",
+    "聲優見面會": "音樂會/演唱會",
+    "Voice Actor Fan Meeting": "音樂會/演唱會",
+    "歌劇 魔笛": "音樂劇/歌劇",
+    "百老匯音樂劇 悲慘世界": "音樂劇/歌劇",
+    "Musical Night": "音樂劇/歌劇",
+    "布袋戲 經典重現": "戲劇表演",
+    "瓦舍說相聲": "戲劇表演",
+    "雲門舞集 舞作首演": "舞蹈表演",
+    "天鵝湖 芭蕾": "舞蹈表演",
+    "莫內與印象派 特展": "展覽/博覽",
+    "台北國際動漫博覽會": "展覽/博覽",
+    "親子科學 夏令營": "親子活動",
+    "動畫電影 放映會": "親子活動",
+    "台北電影節 數位修復": "電影放映",
+    "紀錄片 首映": "電影放映",
+    "2026 台北馬拉松": "體育賽事",
+    "中華職棒 棒球 開幕戰": "體育賽事",
+    "AI 與 Python 實作工作坊": "講座/工作坊",
+    "生成式AI應用講座": "講座/工作坊",
+    "Python 入門": "講座/工作坊",
+    "Taipei 101 跨年": "其他",
+    "脫口秀之夜": "娛樂表演",
+    "週末文創市集": "娛樂表演",
+    "美食 旅遊 特輯": "其他",
+    "年度股東會": "其他",
+    "": "其他",
+}
+
+def cmd_categories(args):
+    """核對固定分類對照，並比較線性掃描與 Aho–Corasick 的速度"""
+    failures = [(t, want, scraper.get_event_category_from_title(t)) for t, want in CATEGORY_CORPUS.items()
+                if scraper.get_event_category_from_title(t) != want]
+    for title, want, got in failures:
+        print(f"FAIL {title!r}: expected {want}, got {got}")
+    titles = synthetic_titles(args.count)
+    timings = {}
+    for name, func in (("legacy", lambda ts: [legacy_category(t) for t in ts]),
+                       ("classify", lambda ts: [scraper.CLASSIFIER.classify(t) for t in ts]),
+                       ("batch", scraper.CLASSIFIER.classify_batch)):
+        start = time.perf_counter()
+        func(titles)
+        timings[name] = time.perf_counter() - start
+        print(f"{name:9s} {timings[name] * 1000:8.1f} ms / {len(titles)} titles")
+    changed = sum(1 for t in titles if legacy_category(t) != scraper.CLASSIFIER.classify(t))
+    print(f"corpus {len(CATEGORY_CORPUS) - len(failures)}/{len(CATEGORY_CORPUS)} OK | "
+          f"differs from legacy on {changed}/{len(titles)} synthetic titles (mixed-case keyword fix)")
+    return 1 if failures else 0
+
+# =========================
+# 🧵 解析擴展性
+# =========================
+def parse_jobs(root, rounds):
+    """錄製檔中每個列表頁 -> (平台代碼, 原始位元組, 編碼)，重複 rounds 次以放大工作量"""
+    archive = scraper.FixtureArchive(root)
+    owner = {url: spec.key for spec in scraper.PLATFORMS for url in spec.urls}
+    jobs = []
+    for url, entry in archive.index.items():
+        status, body = archive.response(url)
+        if url in owner and status < 400: jobs.append((owner[url], body, entry.get('encoding')))
+    return jobs * rounds
+
+def run_jobs(executor, jobs):
+    keys, bodies, encodings = zip(*jobs)
+    if executor is None: return list(map(scraper.parse_in_worker, keys, bodies, encodings))
+    return list(executor.map(scraper.parse_in_worker, keys, bodies, encodings, chunksize=4))
+
+def cmd_scaling(args):
+    """解碼 + 解析在程序池 / 執行緒池下從 1 個 worker 到 CPU 核心數的吞吐量"""
+    jobs = parse_jobs(args.fixtures, args.rounds)
+    max_workers = args.max_workers or os.cpu_count() or 1
+    start = time.perf_counter()
+    baseline_rows = run_jobs(None, jobs)
+    inline = time.perf_counter() - start
+    print(f"{len(jobs)} pages, {os.cpu_count()} cpus")
+    print(f"inline          {inline * 1000:8.1f} ms  {len(jobs) / inline:8.1f} pages/s")
+    ok = True
+    sizes = sorted({min(2 ** i, max_workers) for i in range(max_workers.bit_length() + 1)})
+    for mode in ("process", "thread"):
+        for workers in sizes:
+            with (scraper.process_pool(workers) if mode == "process" else ThreadPoolExecutor(workers)) as executor:
+                run_jobs(executor, jobs[:workers])  # 預熱：先把 worker 都啟動
+                start = time.perf_counter()
+                rows = run_jobs(executor, jobs)
+                elapsed = time.perf_counter() - start
+            same = [r[0] for r in rows] == [r[0] for r in baseline_rows]
+            ok = ok and same
+            print(f"{mode:7s} x{workers:<3d}    {elapsed * 1000:8.1f} ms  {len(jobs) / elapsed:8.1f} pages/s  "
+                  f"speedup {inline / elapsed:5.2f}x  {'OK' if same else 'MISMATCH'}")
+    return 0 if ok else 1
+
+# =========================
+# 🔎 搜尋索引
+# =========================
+def synthetic_events(n):
+    platforms = [spec.name for spec in scraper.PLATFORMS]
+    return [{'id': f"{i:016x}", 'title': f"{t} 第{i}場", 'platform': platforms[i % len(platforms)],
+             'type': scraper.CLASSIFIER.classify(t), 'region': None}
+            for i, t in enumerate(synthetic_titles(n))]
+
+def cmd_index(args):
+    """SearchIndexBuilder 在不同活動數下的建置時間，確認與活動數成線性"""
+    for n in args.sizes:
+        events = synthetic_events(n)
+        start = time.perf_counter()
+        builder = scraper.SearchIndexBuilder()
+        for ev in events: builder.add(ev)
+        data = scraper.compact_json(builder.to_dict())
+        elapsed = time.perf_counter() - start
+        print(f"{n:8d} events  {elapsed * 1000:8.1f} ms  {elapsed * 1e6 / n:6.1f} us/event  "
+              f"{len(builder.words):6d} words  {len(builder.bigrams):6d} bigrams  {len(data) / 1024:8.1f} KiB")
+    return 0
+
+# =========================
+# 🔗 跨平台去重
+# =========================
+# 固定的去重對照：(標題 A, 平台 A, 標題 B, 平台 B, 是否應合併)
+DEDUP_CORPUS = [
+    ("周杰倫 嘉年華 世界巡迴演唱會 2026 台北站", "KKTIX", "周杰倫【嘉年華】世界巡迴演唱會2026－台北站", "拓元售票", True),
+    ("BLACKPINK WORLD TOUR IN TAIPEI", "KKTIX", "BLACKPINK World Tour in Taipei", "年代售票", True),
+    ("雲門舞集 舞作首演", "OPENTIX兩廳院文化生活", "雲門舞集《舞作首演》", "寬宏售票", True),
+    ("周杰倫 嘉年華 世界巡迴演唱會 2026 台北站", "KKTIX", "周杰倫 嘉年華 世界巡迴演唱會 2026 台北站", "KKTIX", False),
+    ("2026 台北馬拉松", "KKTIX", "2025 台北馬拉松", "拓元售票", False),
+    ("國家交響樂團 馬勒第五號", "OPENTIX兩廳院文化生活", "國家交響樂團 馬勒第九號", "年代售票", False),
+    ("莫內與印象派 特展", "KKTIX", "台北國際動漫博覽會", "拓元售票", False),
+]
+
+DEDUP_WORDS = ["周杰倫", "五月天", "蔡依林", "交響", "樂團", "世界", "巡迴", "演唱會", "音樂劇", "特展",
+               "台北", "高雄", "台中", "見面會", "首演", "經典", "重現", "夏日", "跨年", "馬拉松",
+               "爵士", "芭蕾", "劇場", "市集", "Live", "Tour", "Night", "Fan", "Concert", "Show"]
+
+def dedup_events(n, seed=7):
+    """約 1/3 的活動在 2~3 個平台重複上架，重複的標題加上標點 / 空白 / 全形差異"""
+    rng = random.Random(seed)
+    platforms = [spec.name for spec in scraper.PLATFORMS]
+    events, shows = [], 0
+    while len(events) < n:
+        title = " ".join(rng.sample(DEDUP_WORDS, 4)) + f" {rng.randrange(10000)}"
+        copies = rng.choice((1, 1, 2, 3))
+        for platform in rng.sample(platforms, copies):
+            variant = title if rng.random() < 0.5 else f"【{title.replace(' ', '')}】"
+            events.append({'title': variant, 'platform': platform, 'url': f"https://example.com/{len(events)}",
+                           'first_seen': f"2026-01-01T00:00:{len(events) % 60:02d}"})
+        shows += 1
+    return events[:n], shows
+
+def cmd_dedup(args):
+    """核對固定去重對照，並量測不同活動數下的分群時間 (應近似線性，不是平方)"""
+    failures = 0
+    for a, pa, b, pb, want in DEDUP_CORPUS:
+        got = bool(scraper.find_duplicates([a, b], [pa, pb]))
+        if got != want:
+            failures += 1
+            print(f"FAIL {a!r} / {b!r}: expected {'merge' if want else 'keep'}")
+    print(f"corpus {len(DEDUP_CORPUS) - failures}/{len(DEDUP_CORPUS)} OK")
+    for n in args.sizes:
+        events, shows = dedup_events(n)
+        scraper.shingle_hash.cache_clear()
+        batch = scraper.EventBatch.from_dicts(events)
+        start = time.perf_counter()
+        merged, dropped = scraper.merge_duplicates(batch)
+        elapsed = time.perf_counter() - start
+        print(f"{n:8d} events  {elapsed * 1000:8.1f} ms  {elapsed * 1e6 / n:6.1f} us/event  "
+              f"{len(merged):8d} after merge  (~{shows} distinct shows)")
+    return 1 if failures else 0
+
+# =========================
+# 🧬 結構化資料
+# =========================
+def listing_pages(n):
+    """同一份 KKTIX 風格列表：一份只有連結，一份另附 JSON-LD ItemList，回傳 (spec, 純連結頁, 結構化頁)"""
+    spec = scraper.platform_spec("kktix")
+    titles = [f"{t} 第{i}場" for i, t in enumerate(synthetic_titles(n))]
+    cards = "".join(f'<div class="event-card"><a href="/events/ev{i}?utm_source=x" title="{t}">'
+                    f'<img src="https://img.example/{i}.jpg"><span class="name">{t}</span></a></div>'
+                    for i, t in enumerate(titles))
+    ld = {"@context": "https://schema.org", "@type": "ItemList", "itemListElement": [
+        {"@type": "ListItem", "position": i + 1, "item": {
+            "@type": "MusicEvent", "name": t, "url": f"https://kktix.com/events/ev{i}",
+            "image": [f"https://img.example/{i}.jpg"], "startDate": f"2026-05-{i % 28 + 1:02d}T19:30:00+08:00",
+            "location": {"@type": "Place", "name": "Legacy Taipei", "address": {"addressLocality": "台北市"}}}}
+        for i, t in enumerate(titles)]}
+    plain = f"<html><body>{cards}</body></html>"
+    structured = (f'<html><head><script type="application/ld+json">{json.dumps(ld, ensure_ascii=False)}</script>'
+                  f"</head><body>{cards}</body></html>")
+    return spec, plain, structured
+
+def cmd_structured(args):
+    """同一份列表頁走連結掃描與 JSON-LD 兩條路的解析時間，並確認取出的活動相同"""
+    spec, plain, structured = listing_pages(args.count)
+    results = {}
+    for name, html in (("anchors", plain), ("json-ld", structured)):
+        best = float('inf')
+        for _ in range(args.repeat):
+            start = time.perf_counter()
+            events = scraper.extract_events(spec, html)
+            best = min(best, time.perf_counter() - start)
+        results[name] = events
+        print(f"{name:8s} {best * 1000:8.1f} ms  {len(events):6d} events  {len(html) / 1024:8.1f} KiB  "
+              f"dated {sum(e['date'] != '詳內文' for e in events)}")
+    same = event_keys(results["anchors"]) == event_keys(results["json-ld"])
+    print(f"same (title, url) set: {'OK' if same else 'MISMATCH'}")
+    # 只有「精選」ItemList (前 10 筆) 的頁面：其餘活動仍要由連結掃描取得
+    tag = '<script type="application/ld+json">'
+    ld = json.loads(structured[structured.index(tag) + len(tag):structured.index('</script>')])
+    ld["itemListElement"] = ld["itemListElement"][:10]
+    featured = plain.replace("<html>", f'<html><head><script type="application/ld+json">{json.dumps(ld, ensure_ascii=False)}'
+                                       f"</script></head>", 1)
+    events = scraper.extract_events(spec, featured)
+    complete = event_keys(events) == event_keys(results["anchors"])
+    print(f"featured   {len(events):6d} events  dated {sum(e['date'] != '詳內文' for e in events)}  "
+          f"all listings kept: {'OK' if complete else 'MISSING'}")
+    return 0 if same and complete else 1
+
+# =========================
+# 🔔 通知派送
+# =========================
+async def notify_roundtrip(batches, per_batch, fail_every):
+    """本機替身 webhook：每 fail_every 個請求輪流回 500 / 429，確認重試後全部送達"""
+    from aiohttp import web
+    received, calls = [], [0]
+
+    async def handler(request):
+        calls[0] += 1
+        if calls[0] % fail_every == 0:
+            if calls[0] // fail_every % 2: return web.Response(status=500)
+            return web.Response(status=429, headers={'Retry-After': '1'})
+        received.append((await request.json())['text'])
+        return web.Response(text="ok")
+
+    app = web.Application()
+    app.router.add_post('/hook', handler)
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    site = web.TCPSite(runner, '127.0.0.1', 0)
+    await site.start()
+    port = runner.addresses[0][1]
+    sink = scraper.WebhookSink(f"http://127.0.0.1:{port}/hook")
+    sink.min_interval = 0.05
+    sink.max_chars = 400
+    events = synthetic_events(batches * per_batch)
+    for i, ev in enumerate(events): ev['url'] = f"https://example.com/e/{i}"
+    with tempfile.TemporaryDirectory() as tmp:
+        async with scraper.Notifier([sink], path=Path(tmp) / "outbox.json", window=0.2) as notifier:
+            dispatcher = asyncio.create_task(notifier.run())
+            enqueue = 0.0
+            for b in range(batches):
+                start = time.perf_counter()
+                notifier.enqueue(events[b * per_batch:(b + 1) * per_batch])
+                enqueue += time.perf_counter() - start
+                await asyncio.sleep(0.05)
+            start = time.perf_counter()
+            await notifier.finish(dispatcher, 30)
+            drain = time.perf_counter() - start
+            left = len(notifier.outbox['messages'])
+    await runner.cleanup()
+    return notifier.counters, received, calls[0], enqueue, drain, left
+
+def cmd_notify(args):
+    """outbox → 摘要 → 本機替身 webhook，含 500 / 429 重試；確認全部送達且排入不拖慢發佈"""
+    backoff = scraper.NOTIFY_BACKOFF
+    scraper.NOTIFY_BACKOFF = 0.2
+    try:
+        c, received, calls, enqueue, drain, left = asyncio.run(
+            notify_roundtrip(args.batches, args.per_batch, args.fail_every))
+    finally:
+        scraper.NOTIFY_BACKOFF = backoff
+    total = args.batches * args.per_batch
+    mentioned = sum(int(m.group(1)) for text in received for m in re.finditer(r"發現 (\d+) 個新活動", text))
+    print(f"enqueue {enqueue * 1e6 / total:6.1f} us/event | drain {drain:5.2f}s | {calls} requests")
+    print(f"queued {c['queued']} | sent {c['sent']} | failed {c['failed']} | dropped {c['dropped']} | outbox left {left}")
+    ok = mentioned == total and not left and not c['dropped']
+    print(f"digest covers {mentioned}/{total} events: {'OK' if ok else 'MISMATCH'}")
+    return 0 if ok else 1
+
+# =========================
+# 🧱 活動記錄記憶體
+# =========================
+def store_text(n):
+    """模擬 n 筆的活動資料庫檔 (60 輪的時間戳、19 個平台)，回傳 JSON 文字；載入後每筆的字串各自獨立，與實際情況相同"""
+    platforms = [spec.name for spec in scraper.PLATFORMS]
+    runs = [f"2026-{1 + r % 12:02d}-{1 + r % 28:02d}T06:00:00.000000+08:00" for r in range(60)]
+    titles = synthetic_titles(10000)
+    types = scraper.CLASSIFIER.classify_batch(titles)
+    records = {}
+    for i in range(n):
+        eid, seen = f"{i:016x}", runs[i % len(runs)]
+        records[eid] = {'id': eid, 'first_seen': seen, 'title': f"{titles[i % 10000]} 第{i}場",
+                        'url': f"https://example.com/events/{i}", 'platform': platforms[i % len(platforms)],
+                        'img_url': None, 'date': "詳內文", 'type': types[i % 10000], 'last_seen': seen, 'active': True}
+    return json.dumps({'events': records}, ensure_ascii=False)
+
+def legacy_active_events(records):
+    """改版前 EventStore.active_events：每筆組一個輸出 dict"""
+    events = [rec for rec in records.values() if rec['active']]
+    events.sort(key=lambda r: (r['first_seen'], r['platform'], r['url']), reverse=True)
+    return [{**{k: rec.get(k) for k in scraper.EVENT_FIELDS if k not in scraper.DETAIL_FIELDS or rec.get(k)},
+             'id': rec['id'], 'first_seen': rec['first_seen'], 'scraped_at': rec['first_seen']} for rec in events]
+
+def retained(func):
+    """回傳 (結果, 執行後仍佔用的 MiB)；中途產生又釋放的物件不計"""
+    gc.collect()
+    tracemalloc.start()
+    result = func()
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, current / 2 ** 20
+
+def timed(func):
+    start = time.perf_counter()
+    result = func()
+    return result, time.perf_counter() - start
+
+def cmd_memory(args):
+    """dict 紀錄 / 輸出清單 與 Event (__slots__ + intern) / EventBatch 的常駐記憶體與 data.json 序列化時間
+    (輸出清單與 EventBatch 只計容器本身，字串與紀錄共用)"""
+    ok = True
+    for n in args.sizes:
+        text = store_text(n)
+        records, dict_mb = retained(lambda: json.loads(text)['events'])
+        output, list_mb = retained(lambda: legacy_active_events(records))
+        legacy_json, legacy_s = timed(lambda: scraper.compact_json(output))
+        del output, records
+        events, slot_mb = retained(lambda: {eid: scraper.Event.from_dict(rec)
+                                            for eid, rec in json.loads(text)['events'].items()})
+        store = scraper.EventStore.__new__(scraper.EventStore)
+        store.records = events
+        batch, batch_mb = retained(store.active_events)
+        batch_json, batch_s = timed(batch.to_json)
+        same = legacy_json == batch_json
+        ok = ok and same
+        print(f"{n:8d} events | store: dict {dict_mb:8.1f} MiB  Event {slot_mb:8.1f} MiB ({dict_mb / slot_mb:4.1f}x) | "
+              f"output: list[dict] {list_mb:8.1f} MiB  EventBatch {batch_mb:8.1f} MiB | "
+              f"to JSON: {legacy_s * 1000:7.0f} ms vs {batch_s * 1000:7.0f} ms  {'OK' if same else 'MISMATCH'}")
+        del events, store, batch, legacy_json, batch_json, text
+    return 0 if ok else 1
+
+# =========================
+# 🏛️ 歷史封存
+# =========================
+def churn_runs(n, runs, seed=7):
+    """模擬 runs 輪 (每 6 小時) 的 n 筆活動：每輪約 2% 下架、2% 新上架、1% 改標題；逐輪產生 (時間, 平台, 該平台活動)"""
+    rng = random.Random(seed)
+    platforms = [spec.name for spec in scraper.PLATFORMS]
+    titles = synthetic_titles(10000)
+    types = scraper.CLASSIFIER.classify_batch(titles)
+    serial = 0
+    def new_event():
+        nonlocal serial
+        serial += 1
+        i = serial % 10000
+        return {'title': f"{titles[i]} 第{serial}場", 'url': f"https://example.com/events/{serial}",
+                'platform': platforms[serial % len(platforms)], 'img_url': None, 'date': "詳內文", 'type': types[i]}
+    live = [new_event() for _ in range(n)]
+    start = datetime(2026, 1, 1, 6, tzinfo=scraper.TW_TZ)
+    for r in range(runs):
+        if r:
+            live = [ev for ev in live if rng.random() >= 0.02] + [new_event() for _ in range(n // 50)]
+            for ev in rng.sample(live, n // 100): ev['title'] += " (加場)"
+        now = (start + timedelta(hours=6 * r)).isoformat()
+        by_platform = {}
+        for ev in live: by_platform.setdefault(ev['platform'], []).append(dict(ev))
+        yield now, by_platform
+
+def cmd_archive(args):
+    """逐輪寫入封存的成本、時間點回溯 / 區間查詢的時間，並核對回溯結果與當時的輸出完全相同 (含壓縮後)"""
+    with tempfile.TemporaryDirectory() as tmp:
+        archive = scraper.EventArchive(Path(tmp) / "archive.sqlite3")
+        store = scraper.EventStore.__new__(scraper.EventStore)
+        store.records, store.retention = {}, timedelta(days=scraper.EVENT_STORE_RETENTION_DAYS)
+        expected, record_s = {}, 0.0
+        for r, (now, by_platform) in enumerate(churn_runs(args.events, args.runs)):
+            for platform, events in by_platform.items():
+                diff = store.merge(events, now, {platform})
+                start = time.perf_counter()
+                archive.record(platform, now, len(events), diff)
+                record_s += time.perf_counter() - start
+            if r % max(1, args.runs // 5) == 0 or r == args.runs - 1: expected[now] = store.active_events().to_json()
+        rows = archive.db.execute("SELECT COUNT(*) FROM listings").fetchone()[0]
+        print(f"{args.runs} runs x {args.events} events | record {record_s * 1000 / args.runs:6.1f} ms/run | "
+              f"{rows} listing rows | {os.path.getsize(archive.path) / 2 ** 20:.1f} MiB")
+
+        def check(label):
+            ok = True
+            for at, text in expected.items():
+                batch, elapsed = timed(lambda: archive.snapshot(at))
+                ok = ok and batch.to_json() == text
+            print(f"{label}: snapshot {elapsed * 1000:6.1f} ms ({len(batch)} events) | "
+                  f"{len(expected)} points in time {'OK' if ok else 'MISMATCH'}")
+            return ok
+
+        ok = check("before compaction")
+        times = sorted(expected)
+        mid, last = times[len(times) // 2], times[-1]
+        platform = scraper.PLATFORMS[0].name
+        kind = archive.query(url="https://example.com/events/1")[0]['type']
+        for label, query in (("url", lambda: archive.query(url="https://example.com/events/1")),
+                             ("platform+window", lambda: archive.query(times[1], mid, platform=platform)),
+                             ("type+window", lambda: archive.query(times[1], mid, type=kind)),
+                             ("yields", lambda: archive.yields(platform))):
+            found, elapsed = timed(query)
+            print(f"  query {label:16s} {elapsed * 1000:7.2f} ms  {len(found):6d} rows")
+        # 壓縮到最後一個檢查點為止：之後的快照必須不變
+        cut = datetime.fromisoformat(last)
+        merged, folded = archive.compact(days=0, now=cut)
+        rows = archive.db.execute("SELECT COUNT(*) FROM listings").fetchone()[0]
+        print(f"compact: merged {merged} versions, folded {folded} run rows -> {rows} listing rows | "
+              f"{os.path.getsize(archive.path) / 2 ** 20:.1f} MiB")
+        expected = {last: expected[last]}
+        ok = check("after compaction") and ok
+        archive.close()
+    return 0 if ok else 1
+
+# =========================
+# 🌊 串流讀取
+# =========================
+def utk_page(n, tail_bytes, charset, declare):
+    """寬宏風格列表頁：n 筆活動、<footer> 之後接 tail_bytes 的 script；declare 為 meta / header / None (不宣告)"""
+    titles = [f"{t} 第{i}場" for i, t in enumerate(synthetic_titles(n))]
+    rows = "".join(f'<a href="../UTK02/UTK0201_.aspx?PRODUCT_ID=P{i:05d}">{t}</a>' for i, t in enumerate(titles))
+    meta = f'<meta charset="{charset}">' if declare == "meta" else ""
+    script = "var config = {};" * (tail_bytes // 16)
+    html = (f"<!DOCTYPE html><html><head>{meta}<title>節目列表</title></head><body><main>{rows}</main>"
+            f'<footer><a href="/privacy">隱私權政策</a></footer><script>{script}</script></body></html>')
+    content_type = f"text/html; charset={charset}" if declare == "header" else "text/html"
+    return html.encode(charset, errors="xmlcharrefreplace"), content_type
+
+async def stream_compare(pages, repeat):
+    """本機伺服器送出各頁；整頁讀取 + 全文偵測 (改版前) 與 串流讀取 + 標記提前結束 各跑 repeat 次"""
+    async def handler(request):
+        body, content_type = pages[request.match_info['name']]
+        return web.Response(body=body, headers={'Content-Type': content_type})
+    app = web.Application()
+    app.router.add_get('/{name}', handler)
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    site = web.TCPSite(runner, '127.0.0.1', 0)
+    await site.start()
+    base = f"http://127.0.0.1:{site._server.sockets[0].getsockname()[1]}"
+    spec = scraper.platform_spec("kham")
+    results = {}
+    try:
+        async with scraper.Fetcher(throttle=scraper.HostThrottle(delay=(0, 0))) as fetcher:
+            for name in pages:
+                url = f"{base}/{name}"
+                best_full = best_stream = float('inf')
+                for _ in range(repeat):
+                    start = time.perf_counter()
+                    async with fetcher.session.get(url) as resp:
+                        body = await resp.read()
+                    encoding = charset_normalizer.detect(body)['encoding'] or 'utf-8'
+                    full_text = body.decode(encoding, errors='replace')
+                    best_full = min(best_full, time.perf_counter() - start)
+                    start = time.perf_counter()
+                    page = await fetcher.fetch_page(url, max_bytes=spec.max_bytes, stop_at=spec.stop_at)
+                    best_stream = min(best_stream, time.perf_counter() - start)
+                m = fetcher.metrics.url(url)
+                same = event_keys(scraper.extract_events(spec, full_text)) == event_keys(
+                    scraper.extract_events(spec, page.text))
+                results[name] = (len(body), len(page.body), m['cut'], m['dropped'], best_full, best_stream, same)
+    finally:
+        await runner.cleanup()
+    return results
+
+def cmd_stream(args):
+    """大頁面 (列表之後接大量 script)：下載量、讀取 + 解碼時間，並確認取出的活動與整頁讀取相同"""
+    pages = {f"{charset}-{declare or 'none'}": utk_page(args.count, args.tail, charset, declare)
+             for charset, declare in (("utf-8", "meta"), ("big5", "header"), ("big5", None), ("utf-8", None))}
+    # 尾端不大的頁面：截斷後把剩下的讀完，連線留在連線池
+    pages["utf-8-short"] = utk_page(args.count, scraper.STREAM_DRAIN_BYTES // 4, "utf-8", "meta")
+    ok = True
+    for name, (full, read, cut, dropped, t_full, t_stream, same) in asyncio.run(stream_compare(pages, args.repeat)).items():
+        ok = ok and same
+        print(f"{name:12s} read {read / 1024:8.0f} / {full / 1024:6.0f} KiB ({cut or 'full'}, "
+              f"{'connection dropped' if dropped else 'connection kept'}) | "
+              f"full read + detect {t_full * 1000:7.1f} ms  stream {t_stream * 1000:7.1f} ms | "
+              f"{'OK' if same else 'MISMATCH'}")
+    return 0 if ok else 1
+
+# =========================
+# ✂️ 連結剪枝
+# =========================
+def broad_page(n, noise_per_event):
+    """ibon 風格的寬鬆掃描頁：每筆活動旁有多個同樣含 activity 的導覽、分享、圖片連結 (標題清洗後會被丟掉)"""
+    rng = random.Random(7)
+    noise = list(scraper.DEFAULT_NOISE_KEYWORDS[:10]) + ["", " "]
+    rows = []
+    for i, title in enumerate(SAMPLE_TITLES[i % len(SAMPLE_TITLES)] + f" 第{i}場" for i in range(n)):
+        links = [f'<a href="/ActivityInfo/Details/{38000 + i}"><img src="https://img.example/{i}.jpg">'
+                 f'<span><b>{title}</b></span></a>']
+        for j in range(noise_per_event):
+            href = rng.choice(("/Activity/Index?page={}", "/ActivityInfo/Share/{}", "/activity/tag/{}", "/Activity/Search?kw={}"))
+            links.append(f'<a href="{href.format(i * noise_per_event + j)}"><span>{rng.choice(noise)}</span></a>')
+        rows.append(f'<li class="item">{"".join(links)}</li>')
+    return f'<html><body><ul>{"".join(rows)}</ul></body></html>'
+
+def pruned_events(spec, html, shapes, stats=None):
+    return scraper.build_events(spec, scraper.extract_candidates(spec, html, stats, shapes))
+
+def learned_shapes(spec, pages):
+    """以全掃描的結果學習 PRUNE_MIN_RUNS 輪 (暫存檔，不動 .cache)，回傳之後會用的形狀集合"""
+    with tempfile.TemporaryDirectory() as tmp:
+        patterns = scraper.LinkPatterns(Path(tmp) / "patterns.json", full_scan=False)
+        for _ in range(scraper.PRUNE_MIN_RUNS):
+            patterns.learn(spec, [ev for html in pages for ev in scraper.extract_events(spec, html)])
+        return patterns.matcher(spec)
+
+def cmd_prune(args):
+    """寬鬆掃描平台的連結剪枝：處理的連結數與解析時間，並確認剪枝 / 全掃描 / 全部剪光時的回退結果相同"""
+    spec = scraper.platform_spec("ibon")
+    html = broad_page(args.count, args.noise)
+    shapes = learned_shapes(spec, [html])
+    ok = shapes is not None
+    links = list(scraper.find_links(spec, scraper.make_soup(html, anchors_only=not spec.full_tree)))
+    results = {}
+    for name, use in (("full scan", None), ("pruned", shapes), ("fallback", frozenset({"elsewhere.example/*"}))):
+        best = scan = float('inf')
+        for _ in range(args.repeat):
+            stats = {'anchors': 0, 'structured': 0, 'pruned': 0}
+            start = time.perf_counter()
+            events = pruned_events(spec, html, use, stats)
+            best = min(best, time.perf_counter() - start)
+            # 只量連結階段 (解析樹已建好)：剪枝省下的是標題、圖片擷取與標題清洗
+            start = time.perf_counter()
+            rows = list(scraper.link_candidates(spec, links, {}, None, use))
+            if not rows and use: rows = list(scraper.link_candidates(spec, links, {}))
+            scraper.build_events(spec, rows)
+            scan = min(scan, time.perf_counter() - start)
+        results[name] = events
+        print(f"{name:10s} page {best * 1000:8.1f} ms  links {scan * 1000:7.1f} ms  anchors {stats['anchors']:7d}  "
+              f"pruned {stats['pruned']:7d}  {len(events):6d} events")
+    for name in ("pruned", "fallback"):
+        same = event_keys(results[name]) == event_keys(results["full scan"])
+        ok = ok and same
+        print(f"{name} == full scan: {'OK' if same else 'MISMATCH'}")
+    print(f"learned shapes: {sorted(shapes or ())}")
+    # 錄製檔：各寬鬆掃描平台學到形狀後再跑一次，結果應與全掃描相同
+    pages = load_fixtures(args.fixtures)
+    for spec in filter(scraper.prunable, scraper.PLATFORMS):
+        htmls = [pages[url] for url in spec.urls if pages.get(url)]
+        if not htmls: continue
+        shapes = learned_shapes(spec, htmls)
+        stats = {'anchors': 0, 'structured': 0, 'pruned': 0}
+        full = [ev for html in htmls for ev in scraper.extract_events(spec, html)]
+        pruned = [ev for html in htmls for ev in pruned_events(spec, html, shapes, stats)]
+        same = event_keys(full) == event_keys(pruned)
+        ok = ok and same
+        print(f"fixture {spec.key:10s} anchors {stats['anchors']:6d}  pruned {stats['pruned']:6d}  "
+              f"shapes {len(shapes or ()):3d}  {len(full):5d} events  {'OK' if same else 'MISMATCH'}")
+    return 0 if ok else 1
+
+# =========================
+# 🚀 載入與啟動時間
+# =========================
+HEAVY_MODULES = ("aiohttp", "bs4", "charset_normalizer", "lxml")
+IMPORT_PROBE = f"""
+import json, logging, os, sys, time
+start = time.perf_counter()
+import scraper
+elapsed = time.perf_counter() - start
+print(json.dumps({{'seconds': elapsed, 'heavy': sorted({{m.split('.')[0] for m in sys.modules}} & set({HEAVY_MODULES!r})),
+                  'handlers': len(logging.getLogger().handlers), 'files': os.listdir('.')}}))
+"""
+
+def run_python(args, cwd, repeat):
+    """以子程序執行 repeat 次，回傳 (最短牆鐘秒數, 最後一次的 stdout)"""
+    env = {**os.environ, 'PYTHONPATH': str(Path(scraper.__file__).resolve().parent)}
+    best, out = float('inf'), ""
+    for _ in range(repeat):
+        start = time.perf_counter()
+        out = subprocess.run([sys.executable, *args], cwd=cwd, env=env, capture_output=True, text=True, check=True).stdout
+        best = min(best, time.perf_counter() - start)
+    return best, out
+
+def cmd_startup(args):
+    """import scraper 的時間與副作用 (不應載入 aiohttp / bs4、不應建立 scraper.log)，以及各命令列路徑的啟動時間"""
+    script = str(Path(scraper.__file__).resolve())
+    with tempfile.TemporaryDirectory() as tmp:
+        run_python(["-c", IMPORT_PROBE], tmp, 1)  # 先跑一次讓 .pyc 就緒
+        probe = min((json.loads(run_python(["-c", IMPORT_PROBE], tmp, 1)[1]) for _ in range(args.repeat)),
+                    key=lambda p: p['seconds'])
+        ok = not probe['heavy'] and not probe['handlers'] and not probe['files']
+        print(f"import scraper        {probe['seconds'] * 1000:7.1f} ms | heavy modules loaded: {probe['heavy'] or 'none'} | "
+              f"log handlers {probe['handlers']} | files created {probe['files'] or 'none'}  {'OK' if ok else 'SIDE EFFECTS'}")
+        rows = [("python -c pass", ["-c", "pass"]),
+                ("import heavy deps", ["-c", "import aiohttp, aiohttp.web, bs4, charset_normalizer"]),
+                ("scraper.py --help", [script, "--help"]),
+                ("scraper.py replay -p kham", [script, "replay", "-p", "kham", "--fixtures", str(Path(args.fixtures).resolve())])]
+        for label, argv in rows:
+            seconds, _ = run_python(argv, tmp, args.repeat)
+            print(f"{label:26s} {seconds * 1000:7.1f} ms")
+    return 0 if ok else 1
+
+def main():
+    parser = argparse.ArgumentParser(description="event_scraper 離線效能量測")
+    sub = parser.add_subparsers(dest="command", required=True)
+    p = sub.add_parser("replay", help="經本機替身伺服器重播錄製檔，量測效能並比對 golden 輸出")
+    p.add_argument("--fixtures", default=FIXTURES_DIR)
+    p.add_argument("--repeat", type=int, default=3)
+    p.add_argument("--update-golden", action="store_true")
+    p.add_argument("--mode", choices=("thread", "process"), default=scraper.PARSE_MODE)
+    p.add_argument("--workers", type=int, default=scraper.PARSE_WORKERS)
+    p.set_defaults(func=cmd_replay)
+    p = sub.add_parser("scaling", help="程序池 / 執行緒池解析從 1 核到全部核心的擴展性")
+    p.add_argument("--fixtures", default=FIXTURES_DIR)
+    p.add_argument("--rounds", type=int, default=10)
+    p.add_argument("--max-workers", type=int, default=0)
+    p.set_defaults(func=cmd_scaling)
+    p = sub.add_parser("parsers", help="比較 HTML 解析器後端的速度與輸出一致性")
+    p.add_argument("--fixtures", default=FIXTURES_DIR)
+    p.add_argument("--repeat", type=int, default=3)
+    p.set_defaults(func=cmd_parsers)
+    p = sub.add_parser("titles", help="create_event_obj 標題清洗的微基準")
+    p.add_argument("--count", type=int, default=10000)
+    p.add_argument("--repeat", type=int, default=5)
+    p.set_defaults(func=cmd_titles)
+    p = sub.add_parser("categories", help="分類器固定對照核對與速度比較")
+    p.add_argument("--count", type=int, default=10000)
+    p.set_defaults(func=cmd_categories)
+    p = sub.add_parser("index", help="搜尋索引建置時間與大小")
+    p.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000])
+    p.set_defaults(func=cmd_index)
+    p = sub.add_parser("dedup", help="跨平台去重的固定對照核對與分群時間")
+    p.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 50000])
+    p.set_defaults(func=cmd_dedup)
+    p = sub.add_parser("structured", help="JSON-LD 結構化資料層與連結掃描的解析時間比較")
+    p.add_argument("--count", type=int, default=500)
+    p.add_argument("--repeat", type=int, default=5)
+    p.set_defaults(func=cmd_structured)
+    p = sub.add_parser("notify", help="通知派送經本機替身 webhook 的重試與摘要核對")
+    p.add_argument("--batches", type=int, default=5)
+    p.add_argument("--per-batch", type=int, default=200)
+    p.add_argument("--fail-every", type=int, default=3)
+    p.set_defaults(func=cmd_notify)
+    p = sub.add_parser("memory", help="活動紀錄 / 輸出清單的記憶體與序列化時間 (dict vs __slots__ / 欄式)")
+    p.add_argument("--sizes", type=int, nargs="+", default=[10000, 100000, 1000000])
+    p.set_defaults(func=cmd_memory)
+    p = sub.add_parser("archive", help="歷史封存的寫入、時間點回溯、區間查詢與壓縮")
+    p.add_argument("--events", type=int, default=10000)
+    p.add_argument("--runs", type=int, default=40)
+    p.set_defaults(func=cmd_archive)
+    p = sub.add_parser("stream", help="串流讀取 (宣告編碼 / 有限偵測 / 標記提前結束) 與整頁讀取的比較")
+    p.add_argument("--count", type=int, default=300)
+    p.add_argument("--tail", type=int, default=2 * 1024 * 1024)
+    p.add_argument("--repeat", type=int, default=3)
+    p.set_defaults(func=cmd_stream)
+    p = sub.add_parser("prune", help="寬鬆掃描平台依學到的網址形狀剪枝的連結數、解析時間與結果一致性")
+    p.add_argument("--fixtures", default=FIXTURES_DIR)
+    p.add_argument("--count", type=int, default=500)
+    p.add_argument("--noise", type=int, default=8)
+    p.add_argument("--repeat", type=int, default=5)
+    p.set_defaults(func=cmd_prune)
+    p = sub.add_parser("startup", help="import 時間與副作用、各命令列路徑的啟動時間")
+    p.add_argument("--fixtures", default=str(FIXTURES_DIR))
+    p.add_argument("--repeat", type=int, default=5)
+    p.set_defaults(func=cmd_startup)
+    args = parser.parse_args()
+    scraper.logger.setLevel(logging.WARNING)
+    raise SystemExit(args.func(args))
+
+if __name__ == "__main__":
+    main()
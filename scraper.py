@@ -1,37 +1,182 @@
 # -*- coding: utf-8 -*-
-import requests
-from requests.adapters import HTTPAdapter
-from urllib3.util.retry import Retry
+import argparse
 import asyncio
-import aiohttp
+import copy
+import importlib
+import importlib.util
 import random
 import json
+import codecs
 import re
+import hashlib
+import gzip
 import time
 import logging
 import os
+import sys
+import sqlite3
+import html as html_lib
+import unicodedata
+from collections import deque, namedtuple
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+import multiprocessing
+from contextlib import asynccontextmanager, contextmanager
+from dataclasses import dataclass
+from functools import partial, lru_cache
 from datetime import datetime, timezone, timedelta
-from urllib.parse import urljoin
+from urllib.parse import urljoin, urlparse, urlsplit, urlunsplit, parse_qsl, urlencode, quote
 from pathlib import Path
-from bs4 import BeautifulSoup
+from json.encoder import encode_basestring as encode_json_string
+
+class LazyModule:
+    """第一次取用屬性時才 import 的模組代理"""
+    def __init__(self, name):
+        self.name = name
+
+    def __getattr__(self, attr):
+        return getattr(importlib.import_module(self.name), attr)
+
+# 重量級相依 (aiohttp 約 0.2 秒、bs4) 延遲到真正抓取 / 解析時才載入：rebuild、--help 等路徑不必付出載入時間
+aiohttp = LazyModule("aiohttp")
+web = LazyModule("aiohttp.web")
+charset_normalizer = LazyModule("charset_normalizer")
+bs4 = LazyModule("bs4")
 
 # =========================
 # 🛠️ 設定區
 # =========================
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - [%(levelname)s] - %(message)s',
-    datefmt='%Y-%m-%d %H:%M:%S',
-    handlers=[
-        logging.FileHandler("scraper.log", encoding='utf-8', mode='w'),
-        logging.StreamHandler()
-    ]
-)
+# import 本模組不做任何設定；日誌 (scraper.log + 終端機) 由命令列進入點 setup_logging() 設定
 logger = logging.getLogger(__name__)
+LOG_FILE = "scraper.log"
+
+def setup_logging(log_file=LOG_FILE, mode='w'):
+    """mode='w' 每輪爬取重新開始日誌；重播、重建等輔助命令用 'a' 接在後面，不蓋掉上一輪爬取的紀錄"""
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - [%(levelname)s] - %(message)s',
+        datefmt='%Y-%m-%d %H:%M:%S',
+        handlers=[
+            logging.FileHandler(log_file, encoding='utf-8', mode=mode),
+            logging.StreamHandler()
+        ]
+    )
 
 OUTPUT_DIR = Path("docs")
 OUTPUT_FILE = OUTPUT_DIR / "data.json"
+# PWA 用的分片：docs/shards/<平台>/<日期>.json (+ .gz) 與 manifest.json
+SHARD_DIR = OUTPUT_DIR / "shards"
+SHARD_MANIFEST = SHARD_DIR / "manifest.json"
+# 除錯用：設定 SCRAPER_PRETTY=1 時 data.json 以縮排格式輸出，預設為精簡格式
+PRETTY_OUTPUT = bool(os.environ.get("SCRAPER_PRETTY"))
 LINE_TOKEN = os.environ.get("LINE_TOKEN")
+LINE_NOTIFY_URL = "https://notify-api.line.me/api/notify"
+# 通知：另可送到任意 webhook (POST JSON {"text": ...})；設定關鍵字 (逗號分隔) 時命中的活動在摘要中優先列出
+NOTIFY_WEBHOOK = os.environ.get("SCRAPER_NOTIFY_WEBHOOK")
+NOTIFY_KEYWORDS = [k.strip() for k in os.environ.get("SCRAPER_NOTIFY_KEYWORDS", "").split(",") if k.strip()]
+
+# 本機快取 (不進版控)：條件式 GET 的回應內容與驗證標頭
+CACHE_DIR = Path(".cache")
+HTTP_CACHE_DIR = CACHE_DIR / "http"
+HTTP_CACHE_MAX_AGE = 7 * 24 * 3600
+HTTP_CACHE_MAX_BYTES = 64 * 1024 * 1024
+
+# 跨輪次的活動資料庫 (first_seen / last_seen)，下架超過保留天數的紀錄會被清除
+EVENT_STORE_FILE = CACHE_DIR / "event_store.json"
+EVENT_STORE_RETENTION_DAYS = 90
+# 歷史封存 (SQLite，不受保留天數限制)：每輪各平台的抓取筆數，以及每檔活動各版本的上架區間
+ARCHIVE_FILE = CACHE_DIR / "archive.sqlite3"
+# 壓縮：這麼久以前的連續版本合併成一段上架期間，執行紀錄併成每平台每日一筆
+ARCHIVE_COMPACT_DAYS = 180
+
+TW_TZ = timezone(timedelta(hours=8))
+
+# HTML 解析器：有安裝 lxml (C 實作) 就優先使用，否則退回內建 html.parser；可用 SCRAPER_PARSER 強制指定
+HTML_PARSER = "lxml" if importlib.util.find_spec("lxml") else "html.parser"
+HTML_PARSER = os.environ.get("SCRAPER_PARSER", HTML_PARSER)
+
+# JSON 解碼：有安裝 orjson 就用它解析 JSON-LD / 內嵌 JSON / JSON 端點，否則用內建 json
+try:
+    import orjson
+    json_loads = orjson.loads
+except ImportError:
+    json_loads = json.loads
+
+# 連結候選剪枝：記住寬鬆掃描的平台 (沒有 CSS 選擇器) 哪些網址形狀產出過活動，之後其他連結在擷取標題前就略過
+LINK_PATTERN_FILE = CACHE_DIR / "link_patterns.json"
+# 學滿這麼多輪才開始剪枝；每隔這麼多輪全掃描一次以學到改版後的新形狀；形狀這麼多天沒再產出活動就忘掉
+PRUNE_MIN_RUNS = 3
+PRUNE_EXPLORE_EVERY = 10
+PRUNE_FORGET_DAYS = 30
+# SCRAPER_FULL_SCAN=1 或命令列 --full-scan：不剪枝，每個連結都完整處理
+FULL_SCAN = bool(os.environ.get("SCRAPER_FULL_SCAN"))
+
+# 每個主機的禮貌延遲 (秒) 與同時連線上限；不同主機彼此獨立、可同時進行
+POLITE_DELAY = (2, 4)
+HOST_MAX_CONCURRENCY = 2
+
+# 連線池與重試 (所有平台一致)
+HTTP_POOL_LIMIT = 32
+HTTP_KEEPALIVE = 30
+HTTP_TIMEOUT = 30
+RETRY_TOTAL = 3
+RETRY_BACKOFF = 1
+RETRY_STATUS = {403, 429, 500, 502, 503}
+# 串流讀取：每次讀取的區塊大小與回應大小上限 (平台可在 PlatformSpec.max_bytes 覆寫)，超過的部分不下載
+STREAM_CHUNK_SIZE = 64 * 1024
+MAX_RESPONSE_BYTES = 8 * 1024 * 1024
+# 提前結束後剩下不超過這麼多就讀完丟掉，讓連線回到連線池；更多時不下載，連線由 aiohttp 關閉 (記為 dropped)
+STREAM_DRAIN_BYTES = 256 * 1024
+# 編碼判斷：先看 Content-Type / <meta charset> (開頭這麼多位元組內)，都沒有才對一段這麼長的內容做偵測
+ENCODING_SNIFF_BYTES = 32 * 1024
+
+# 串流管線：各階段之間的佇列上限 (頁數)、解析工作數、單一平台逾時 (逾時的平台不影響其他平台發佈)
+PIPELINE_QUEUE_SIZE = 16
+PARSE_WORKERS = int(os.environ.get("SCRAPER_PARSE_WORKERS", 2))
+PLATFORM_TIMEOUT = 600
+# 解析模式：thread (執行緒池) 或 process (程序池，解碼與解析都移出主程序，不受 GIL 限制)
+PARSE_MODE = os.environ.get("SCRAPER_PARSE_MODE", "thread")
+
+# 主機健康度 (跨輪次保存)：連續被擋 (403/404) 達門檻就斷路，冷卻後只送一個探測請求
+HOST_HEALTH_FILE = CACHE_DIR / "host_health.json"
+BREAKER_STATUS = {403, 404}
+BREAKER_THRESHOLD = 3
+BREAKER_COOLDOWN = 3 * 3600
+BREAKER_MAX_COOLDOWN = 48 * 3600
+# 禮貌延遲倍率：遇 429 或回應變慢就放大，回應快則慢慢縮回
+DELAY_SCALE_MIN, DELAY_SCALE_MAX = 0.5, 8.0
+LATENCY_FAST, LATENCY_SLOW = 1.0, 5.0
+
+# 錄製模式：設定 SCRAPER_RECORD=目錄 時，把每個網址的回應存成離線錄製檔 (index.json + bodies/)
+RECORD_DIR = os.environ.get("SCRAPER_RECORD")
+
+# 詳細頁補充：設定 SCRAPER_ENRICH=1 時抓取活動詳細頁補上日期、地點、地區與簡介
+ENRICH_DETAILS = bool(os.environ.get("SCRAPER_ENRICH"))
+DETAIL_CACHE_FILE = CACHE_DIR / "details.json"
+DETAIL_TTL = 3 * 24 * 3600
+DETAIL_MAX_PER_RUN = 300
+DETAIL_DESC_MAX = 300
+
+# 通知 outbox：新活動累積 NOTIFY_BATCH_WINDOW 秒後整理成一份摘要；每個通道兩次送出至少間隔
+# NOTIFY_MIN_INTERVAL 秒，失敗以 NOTIFY_BACKOFF 起算指數退避，NOTIFY_MAX_ATTEMPTS 次後放棄
+OUTBOX_FILE = CACHE_DIR / "outbox.json"
+NOTIFY_BATCH_WINDOW = 60
+NOTIFY_MIN_INTERVAL = 2.0
+NOTIFY_BACKOFF = 30
+NOTIFY_MAX_ATTEMPTS = 5
+NOTIFY_DIGEST_ITEMS = 5
+# 單次執行結束時最多再等這麼久把 outbox 送完，沒送完的留到下一輪
+NOTIFY_DRAIN_TIMEOUT = 60
+
+# 常駐模式：各平台預設重抓間隔 (秒，平台可在 PlatformSpec.interval 覆寫)，排程加上 ±10% 抖動
+REFRESH_INTERVAL = 6 * 3600
+REFRESH_JITTER = 0.1
+# 抓取失敗 (0 筆 / 逾時) 的平台最晚這麼久後重試
+REFRESH_RETRY = 30 * 60
+# 啟動時把到期的平台分散在這段時間內開始，不要同時湧出
+STARTUP_SPREAD = 30
+# 本機控制端點 (GET /status、POST /refresh/<平台代號|all>)，只綁 127.0.0.1
+CONTROL_HOST = "127.0.0.1"
+CONTROL_PORT = int(os.environ.get("SCRAPER_CONTROL_PORT", 8765))
 
 USER_AGENTS = [
     'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/123.0.0.0 Safari/537.36',
@@ -39,67 +184,592 @@ USER_AGENTS = [
 ]
 
 # =========================
-# 🧩 雙引擎核心
-# =========================
-
-def create_session():
-    """建立 Requests Session"""
-    session = requests.Session()
-    retries = Retry(total=3, backoff_factor=1, status_forcelist=[403, 429, 500, 502, 503])
-    session.mount("https://", HTTPAdapter(max_retries=retries))
-    
-    session.headers.update({
-        'User-Agent': random.choice(USER_AGENTS),
-        'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,image/webp,*/*;q=0.8',
-        'Accept-Language': 'zh-TW,zh;q=0.9,en-US;q=0.8,en;q=0.7',
-        'Connection': 'keep-alive',
-        'Upgrade-Insecure-Requests': '1',
-        'Sec-Fetch-Dest': 'document',
-        'Sec-Fetch-Mode': 'navigate',
-        'Sec-Fetch-Site': 'none',
-        'Sec-Fetch-User': '?1',
-    })
-    return session
-
-def fetch_text_requests(session, url, referer=None, encoding=None):
-    try:
-        # 隨機延遲
-        time.sleep(random.uniform(2, 4))
-        
+# 🧩 非同步抓取引擎
+# =========================
+
+DEFAULT_HEADERS = {
+    'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,image/webp,*/*;q=0.8',
+    'Accept-Language': 'zh-TW,zh;q=0.9,en-US;q=0.8,en;q=0.7',
+    'Upgrade-Insecure-Requests': '1',
+    'Sec-Fetch-Dest': 'document',
+    'Sec-Fetch-Mode': 'navigate',
+    'Sec-Fetch-Site': 'none',
+    'Sec-Fetch-User': '?1',
+}
+
+class HostThrottle:
+    """每個主機獨立的禮貌延遲與併發上限"""
+    def __init__(self, delay=POLITE_DELAY, max_concurrency=HOST_MAX_CONCURRENCY, health=None):
+        self.delay = delay
+        self.max_concurrency = max_concurrency
+        self.health = health
+        self._slots = {}
+        self._next_at = {}
+        self.stats = {}
+
+    async def enter(self, host):
+        if host not in self._slots:
+            self._slots[host] = asyncio.Semaphore(self.max_concurrency)
+            self.stats[host] = {'requests': 0, 'sleep': 0.0, 'first_start': None, 'last_end': None}
+        queued_at = time.monotonic()
+        await self._slots[host].acquire()
+        # 排隊期間主機已斷路：不預約延遲，交由呼叫端略過
+        if self.health and self.health.blocked(host): return time.monotonic() - queued_at, 0.0
+        # 預約下一個發送時間：同主機的請求間隔 2~4 秒，第一個請求不必等待
+        now = time.monotonic()
+        start_at = max(now, self._next_at.get(host, now))
+        scale = self.health.delay_scale(host) if self.health else 1.0
+        self._next_at[host] = start_at + random.uniform(*self.delay) * scale
+        st = self.stats[host]
+        st['requests'] += 1
+        st['sleep'] += start_at - now
+        if st['first_start'] is None: st['first_start'] = start_at
+        if start_at > now: await asyncio.sleep(start_at - now)
+        return now - queued_at, start_at - now
+
+    def leave(self, host):
+        self.stats[host]['last_end'] = time.monotonic()
+        self._slots[host].release()
+
+    @asynccontextmanager
+    async def slot(self, host):
+        """進入主機佇列，回傳 (排隊秒數, 禮貌延遲秒數)"""
+        waited = await self.enter(host)
+        try:
+            yield waited
+        finally:
+            self.leave(host)
+
+class HostHealth:
+    """每個主機的斷路器與延遲倍率，存在 .cache 以便跨輪次沿用"""
+    def __init__(self, path=HOST_HEALTH_FILE):
+        self.path = Path(path)
+        try:
+            self.hosts = json.loads(self.path.read_text(encoding='utf-8'))
+        except (OSError, ValueError):
+            self.hosts = {}
+        self.run = {}
+
+    def _host(self, host):
+        if host not in self.hosts:
+            self.hosts[host] = {'state': 'closed', 'failures': 0, 'opened_at': None,
+                                'cooldown': BREAKER_COOLDOWN, 'scale': 1.0, 'fail_cost': None}
+        if host not in self.run:
+            self.run[host] = {'skipped': 0, 'probe': None}
+        return self.hosts[host]
+
+    def delay_scale(self, host):
+        return self._host(host)['scale']
+
+    def blocked(self, host):
+        return self._host(host)['state'] == 'open'
+
+    async def admit(self, host):
+        """回傳 (是否放行, 探測 future)；closed 放行，open 在冷卻期內略過
+
+        冷卻結束後轉 half_open 只放行一個探測請求 (回傳其 future，結束時交給 settle)，
+        其他請求等探測結束再判斷：斷路器關閉就放行，重新斷路才略過
+        """
+        while True:
+            h, r = self._host(host), self.run[host]
+            if h['state'] == 'closed': return True, None
+            if h['state'] == 'open' and time.time() - h['opened_at'] >= h['cooldown']:
+                h['state'] = 'half_open'
+                logger.info(f"🔌 {host} 冷卻結束，送出探測請求")
+            if h['state'] != 'half_open': return False, None
+            if r['probe'] is None:
+                r['probe'] = asyncio.get_running_loop().create_future()
+                return True, r['probe']
+            await asyncio.shield(r['probe'])
+
+    def settle(self, host, probe):
+        """探測請求結束 (不論成敗、重試或取消)，喚醒等待的請求"""
+        r = self.run[host]
+        if r['probe'] is probe: r['probe'] = None
+        if not probe.done(): probe.set_result(None)
+
+    def skip(self, host):
+        self.run[host]['skipped'] += 1
+
+    def record(self, host, status, latency):
+        h = self._host(host)
+        if status == 429:
+            h['scale'] = min(DELAY_SCALE_MAX, h['scale'] * 2)
+        elif status < 400:
+            if latency > LATENCY_SLOW: h['scale'] = min(DELAY_SCALE_MAX, h['scale'] * 1.25)
+            elif latency < LATENCY_FAST: h['scale'] = max(DELAY_SCALE_MIN, h['scale'] * 0.9)
+        if status in BREAKER_STATUS:
+            self._failure(host, h, f"HTTP {status}")
+        elif status < 400:
+            if h['state'] != 'closed': logger.info(f"🔌 {host} 恢復正常，斷路器關閉")
+            h.update(state='closed', failures=0, opened_at=None, cooldown=BREAKER_COOLDOWN)
+
+    def record_error(self, host, exc):
+        """連線錯誤 / 逾時 (重試用完才記一次)，與 BREAKER_STATUS 同樣計入斷路"""
+        self._failure(host, self._host(host), error_class(exc))
+
+    def _failure(self, host, h, reason):
+        h['failures'] += 1
+        if h['state'] == 'half_open':
+            h['cooldown'] = min(BREAKER_MAX_COOLDOWN, h['cooldown'] * 2)
+            self._open(host, h, "探測失敗")
+        elif h['state'] == 'closed' and h['failures'] >= BREAKER_THRESHOLD:
+            self._open(host, h, f"連續 {h['failures']} 次 {reason}")
+
+    def _open(self, host, h, reason):
+        h['state'] = 'open'
+        h['opened_at'] = time.time()
+        logger.warning(f"🔌 {host} 斷路 ({reason})，{h['cooldown'] / 3600:.0f} 小時內略過")
+
+    def record_failure_cost(self, host, seconds):
+        """記錄一次失敗抓取 (含重試與退避) 的實際耗時，用來估計略過省下的時間"""
+        h = self._host(host)
+        h['fail_cost'] = seconds if h['fail_cost'] is None else 0.7 * h['fail_cost'] + 0.3 * seconds
+
+    def summary(self):
+        default_cost = sum(RETRY_BACKOFF * 2 ** i for i in range(RETRY_TOTAL)) + (RETRY_TOTAL + 1) * sum(POLITE_DELAY) / 2
+        result = {}
+        for host, h in self.hosts.items():
+            skipped = self.run.get(host, {}).get('skipped', 0)
+            result[host] = {
+                'state': h['state'], 'failures': h['failures'], 'delay_scale': round(h['scale'], 3),
+                'cooldown_hours': round(h['cooldown'] / 3600, 1), 'skipped': skipped,
+                'saved_seconds': round(skipped * (h['fail_cost'] or default_cost), 1),
+            }
+        return result
+
+    def save(self):
+        write_text_atomic(self.path, json.dumps(self.hosts, ensure_ascii=False))
+        for host, h in self.summary().items():
+            if h['skipped']:
+                logger.info(f"🔌 斷路器: {host} {h['state']} | 略過 {h['skipped']} 次，約省 {h['saved_seconds']:.0f}s")
+
+class HttpCache:
+    """條件式 GET 快取：磁碟上保存回應內容、ETag / Last-Modified 與上次解析出的活動"""
+    def __init__(self, root=HTTP_CACHE_DIR, max_age=HTTP_CACHE_MAX_AGE, max_bytes=HTTP_CACHE_MAX_BYTES):
+        self.root = Path(root)
+        self.max_age = max_age
+        self.max_bytes = max_bytes
+        self.index_file = self.root / "index.json"
+        self.counters = {'hit': 0, 'miss': 0, 'reused': 0, 'evicted': 0}
+        try:
+            self.index = json.loads(self.index_file.read_text(encoding='utf-8'))
+        except (OSError, ValueError):
+            self.index = {}
+
+    def _body_path(self, url):
+        return self.root / (hashlib.sha1(url.encode('utf-8')).hexdigest() + ".body")
+
+    def validators(self, url):
+        """回傳要附加的 If-None-Match / If-Modified-Since 標頭 (沒有本機內容就不送)"""
+        entry = self.index.get(url)
+        if not entry or not self._body_path(url).exists(): return {}
+        headers = {}
+        if entry.get('etag'): headers['If-None-Match'] = entry['etag']
+        if entry.get('last_modified'): headers['If-Modified-Since'] = entry['last_modified']
+        return headers
+
+    def load(self, url):
+        """304 時取回上次的內容與編碼"""
+        entry = self.index[url]
+        entry['accessed_at'] = time.time()
+        return self._body_path(url).read_bytes(), entry.get('encoding')
+
+    def store(self, url, body, etag, last_modified, encoding):
+        if not etag and not last_modified:
+            self.index.pop(url, None)
+            return
+        self.root.mkdir(parents=True, exist_ok=True)
+        self._body_path(url).write_bytes(body)
+        now = time.time()
+        self.index[url] = {
+            'etag': etag, 'last_modified': last_modified, 'encoding': encoding,
+            'size': len(body), 'stored_at': now, 'accessed_at': now,
+        }
+
+    def cached_events(self, url):
+        entry = self.index.get(url)
+        return entry.get('events') if entry else None
+
+    def store_events(self, url, events):
+        if url in self.index: self.index[url]['events'] = events
+
+    def evict(self):
+        """依存放時間與總大小 (最久未使用優先) 淘汰"""
+        now = time.time()
+        expired = [u for u, e in self.index.items() if now - e['stored_at'] > self.max_age]
+        by_access = sorted(self.index.items(), key=lambda kv: kv[1]['accessed_at'])
+        total = sum(e['size'] for e in self.index.values())
+        for url in expired:
+            total -= self.index[url]['size']
+            self._drop(url)
+        for url, entry in by_access:
+            if total <= self.max_bytes: break
+            if url not in self.index: continue
+            total -= entry['size']
+            self._drop(url)
+
+    def _drop(self, url):
+        self.index.pop(url, None)
+        self._body_path(url).unlink(missing_ok=True)
+        self.counters['evicted'] += 1
+
+    def save(self):
+        self.evict()
+        write_text_atomic(self.index_file, json.dumps(self.index, ensure_ascii=False))
+        c = self.counters
+        logger.info(f"🗄️ HTTP 快取: 304 命中 {c['hit']} | 完整下載 {c['miss']} | "
+                    f"沿用解析結果 {c['reused']} | 淘汰 {c['evicted']}")
+
+class Page(namedtuple('Page', ['url', 'text', 'not_modified', 'body', 'encoding'], defaults=(None, None))):
+    """抓取結果；decode=False 時 text 為 None，原始內容放在 body 交給解析程序解碼"""
+    @property
+    def ok(self):
+        return bool(self.text or self.body)
+
+class FixtureArchive:
+    """離線錄製檔：index.json 記錄 網址 -> {file, status, encoding}，內容存在 bodies/"""
+    def __init__(self, root):
+        self.root = Path(root)
+        try:
+            self.index = json.loads((self.root / "index.json").read_text(encoding='utf-8'))
+        except (OSError, ValueError):
+            self.index = {}
+
+    def record(self, url, status, body, encoding=None):
+        name = f"bodies/{hashlib.sha1(url.encode('utf-8')).hexdigest()[:16]}.html"
+        path = self.root / name
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_bytes(body)
+        self.index[url] = {'file': name, 'status': status, 'encoding': encoding}
+
+    def response(self, url):
+        """回傳 (狀態碼, 內容)；沒錄到的網址視為 404"""
+        entry = self.index.get(url)
+        if not entry: return 404, b""
+        return entry.get('status', 200), (self.root / entry['file']).read_bytes()
+
+    def text(self, url):
+        status, body = self.response(url)
+        return decode_body(body, self.index[url].get('encoding')) if status < 400 else None
+
+    def save(self):
+        write_text_atomic(self.root / "index.json", json.dumps(self.index, ensure_ascii=False, indent=1, sort_keys=True))
+        logger.info(f"📼 已錄製 {len(self.index)} 個網址到 {self.root}")
+
+async def serve_fixtures(archive, port=0):
+    """在本機啟動替身伺服器重播錄製檔 (GET /replay?u=原網址)，回傳 (runner, 基底網址)"""
+    async def handler(request):
+        status, body = archive.response(request.query.get('u', ''))
+        return web.Response(status=status, body=body, content_type='text/html')
+    app = web.Application()
+    app.router.add_get('/replay', handler)
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    site = web.TCPSite(runner, '127.0.0.1', port)
+    await site.start()
+    return runner, f"http://127.0.0.1:{runner.addresses[0][1]}"
+
+class Fetcher:
+    """所有平台共用的抓取引擎：單一連線池 Session、統一的重試退避與編碼偵測
+
+    recorder: 把回應寫進 FixtureArchive；replay: 替身伺服器的基底網址，請求改送到替身但其餘流程 (節流、重試、解碼) 不變
+    """
+    def __init__(self, throttle=None, cache=None, metrics=None, health=None, recorder=None, replay=None):
+        self.health = health
+        self.throttle = throttle or HostThrottle(health=health)
+        self.cache = cache
+        self.metrics = metrics or RunMetrics()
+        self.recorder = recorder
+        self.replay = replay
+        self.session = None
+
+    async def __aenter__(self):
+        connector = aiohttp.TCPConnector(
+            limit=HTTP_POOL_LIMIT, limit_per_host=HOST_MAX_CONCURRENCY,
+            keepalive_timeout=HTTP_KEEPALIVE, ssl=False)
+        self.session = aiohttp.ClientSession(
+            connector=connector,
+            headers={**DEFAULT_HEADERS, 'User-Agent': random.choice(USER_AGENTS)},
+            timeout=aiohttp.ClientTimeout(total=HTTP_TIMEOUT))
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.session.close()
+
+    def with_metrics(self, metrics):
+        """共用連線池、節流、快取與斷路器，只換掉指標 (常駐模式每次重抓各用一份，用完即丟)"""
+        view = copy.copy(self)
+        view.metrics = metrics
+        return view
+
+    async def fetch_text(self, url, referer=None, encoding=None):
+        """抓取單一頁面並解碼，失敗回傳 None"""
+        return (await self.fetch_page(url, referer, encoding)).text
+
+    async def fetch_page(self, url, referer=None, encoding=None, decode=True, breaker=True,
+                         max_bytes=MAX_RESPONSE_BYTES, stop_at=None):
+        """抓取單一頁面；有快取時送出條件式 GET，304 則回傳本機內容並標記 not_modified
+
+        breaker=False 時 403/404 不計入斷路器 (詳細頁下架是常態，不代表主機擋爬蟲)
+        本文以串流讀取：超過 max_bytes 或讀到 stop_at 標記 (列表區塊之後) 就不再下載，decode 時邊讀邊解碼
+        """
+        host = urlparse(url).hostname
         # [V62] KKTIX 移除 Referer，其他平台保留
-        if referer and "kktix" not in url:
-            session.headers.update({'Referer': referer})
-        else:
-            session.headers.pop('Referer', None)
-
-        resp = session.get(url, timeout=30, verify=False)
-        resp.raise_for_status()
-        
-        # [V62] 年代修正：不強制 Big5，改用自動偵測 (apparent_encoding 通常比 header 準)
-        if encoding:
-            resp.encoding = encoding
-        else:
-            resp.encoding = resp.apparent_encoding
-            
-        return resp.text
-    except Exception as e:
-        logger.error(f"💥 Requests 失敗: {url} - {e}")
-        return None
-
-async def fetch_text_aiohttp(url):
-    """Aiohttp 專用於 StrollTimes"""
-    headers = {
-        'User-Agent': random.choice(USER_AGENTS),
-        'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
-    }
+        headers = {'Referer': referer} if referer and "kktix" not in url else {}
+        if self.cache: headers.update(self.cache.validators(url))
+        m = self.metrics.url(url)
+        began = time.monotonic()
+        error = probe = None
+        try:
+            for attempt in range(RETRY_TOTAL + 1):
+                # 斷路中的主機不再送出請求 (含排隊期間才斷路、重試途中斷路)；探測請求自己的重試不再重新申請
+                tripped = False
+                if self.health is not None and attempt == 0:
+                    allowed, probe = await self.health.admit(host)
+                    tripped = not allowed
+                if not tripped:
+                    async with self.throttle.slot(host) as (queued, slept):
+                        m['queue'] += queued
+                        m['sleep'] += slept
+                        tripped = self.health is not None and self.health.blocked(host)
+                        if not tripped:
+                            error = None
+                            try:
+                                status, reader, resp_headers, resp, ttfb = await self._request(
+                                    url, headers, m, StreamBody(max_bytes, stop_at, decode, encoding))
+                                body = reader.body
+                            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                                error = e
+                if tripped:
+                    if error is not None: raise error
+                    if attempt: break
+                    self.health.skip(host)
+                    m['error'] = 'CircuitOpen'
+                    return Page(url, None, False)
+                m['attempts'] += 1
+                if error is not None:
+                    # 連線錯誤 / 逾時與 RETRY_STATUS 一樣退避重試 (同 urllib3 Retry 的 connect / read)，用完才計入主機健康度
+                    if attempt == RETRY_TOTAL:
+                        if self.health:
+                            self.health.record_error(host, error)
+                            self.health.record_failure_cost(host, time.monotonic() - began)
+                        raise error
+                    wait = RETRY_BACKOFF * (2 ** attempt)
+                    m['backoff'] += wait
+                    await asyncio.sleep(wait)
+                    continue
+                m['status'] = status
+                m['bytes'] += len(body)
+                if self.health and (breaker or status not in BREAKER_STATUS): self.health.record(host, status, ttfb)
+                if status not in RETRY_STATUS or attempt == RETRY_TOTAL: break
+                # 與 urllib3 Retry(backoff_factor=1) 相同的指數退避，429/503 優先採用 Retry-After
+                wait = RETRY_BACKOFF * (2 ** attempt)
+                retry_after = resp_headers.get('Retry-After')
+                if retry_after and retry_after.isdigit(): wait = max(wait, int(retry_after))
+                m['backoff'] += wait
+                await asyncio.sleep(wait)
+            if status == 304 and self.cache:
+                self.cache.counters['hit'] += 1
+                m['cache'] = 'hit'
+                body, cached_encoding = self.cache.load(url)
+                encoding = encoding or cached_encoding
+                if self.recorder: self.recorder.record(url, 200, body, encoding)
+                if not decode: return Page(url, None, True, body, encoding)
+                with self.metrics.timer(m, 'decode'):
+                    text = decode_body(body, encoding)
+                return Page(url, text, True)
+            if self.recorder and status >= 400: self.recorder.record(url, status, body)
+            if status >= 400:
+                if self.health and breaker and status in BREAKER_STATUS:
+                    self.health.record_failure_cost(host, time.monotonic() - began)
+                raise aiohttp.ClientResponseError(resp.request_info, (), status=status, message=resp.reason)
+            text, encoding = reader.text, reader.encoding
+            m['decode'] += reader.decode_time
+            if reader.cut:
+                m['cut'] = reader.cut
+                m['drained'] += reader.drained
+                m['dropped'] += reader.dropped
+                if reader.cut == 'max_bytes': logger.warning(f"✂️ 回應超過 {max_bytes} bytes，只保留開頭: {url}")
+            if self.recorder: self.recorder.record(url, status, body, encoding)
+            if self.cache:
+                self.cache.counters['miss'] += 1
+                m['cache'] = 'miss'
+                self.cache.store(url, body, resp_headers.get('ETag'), resp_headers.get('Last-Modified'), encoding)
+            return Page(url, text, False, body, encoding)
+        except Exception as e:
+            m['error'] = error_class(e)
+            logger.error(f"💥 抓取失敗: {url} - {type(e).__name__} {e}")
+            return Page(url, None, False)
+        finally:
+            if probe is not None: self.health.settle(host, probe)
+
+    async def _request(self, url, headers, m, reader):
+        if self.replay: url = f"{self.replay}/replay?u={quote(url, safe='')}"
+        sent_at = time.monotonic()
+        async with self.session.get(url, headers=headers) as resp:
+            ttfb = time.monotonic() - sent_at
+            m['ttfb'] += ttfb
+            if resp.status != 200: reader.decode = False
+            reader.content_type = resp.headers.get('Content-Type')
+            if 'Content-Encoding' not in resp.headers: reader.length = resp.content_length
+            await reader.read(resp.content)
+            m['download'] += time.monotonic() - sent_at - reader.decode_time
+            return resp.status, reader, resp.headers, resp, ttfb
+
+    async def fetch_pages(self, urls, **kwargs):
+        """同一平台多個網址一起排隊，由 throttle 控制節奏，回傳順序與 urls 相同"""
+        return await asyncio.gather(*(self.fetch_page(u, **kwargs) for u in urls))
+
+def reuse_cached_events(fetcher, page):
+    """未變更 (304) 的頁面直接沿用上次的解析結果；沒有可用結果時回傳 None"""
+    if not page.not_modified: return None
+    events = fetcher.cache.cached_events(page.url)
+    if events is not None: fetcher.cache.counters['reused'] += 1
+    return events
+
+def merge_page_events(pages):
+    """依頁面順序合併，跨頁重複的網址保留第一筆"""
+    events, seen = [], set()
+    for page_events in pages:
+        for ev in page_events:
+            if ev['url'] in seen: continue
+            events.append(ev); seen.add(ev['url'])
+    return events
+
+NON_ASCII_RE = re.compile(rb'[\x80-\xff]')
+CHARSET_RE = re.compile(rb'charset\s*=\s*["\']?\s*([\w.:-]+)', re.I)
+META_CHARSET_RE = re.compile(rb'<meta[^>]+?charset\s*=\s*["\']?\s*([\w.:-]+)', re.I)
+# 宣告為 big5 / gb2312 / latin-1 的頁面實際多用其超集 (與瀏覽器的對應相同)
+ENCODING_ALIASES = {'big5': 'cp950', 'gb2312': 'gb18030', 'gbk': 'gb18030', 'iso8859-1': 'cp1252'}
+
+def detect_encoding(body):
+    """只從第一個非 ASCII 位元組起取一段偵測：全文偵測在大頁面很慢，純 ASCII 的開頭 (<head>、script) 也判斷不出編碼"""
+    # [V62] 年代修正：不強制 Big5，改用自動偵測 (同 requests 的 apparent_encoding)
+    m = NON_ASCII_RE.search(body)
+    if not m: return 'utf-8'
+    return charset_normalizer.detect(body[m.start():m.start() + ENCODING_SNIFF_BYTES])['encoding'] or 'utf-8'
+
+def declared_encoding(content_type, prefix):
+    """Content-Type 的 charset，其次是開頭的 <meta charset>；宣告與內容不符 (開頭嚴格解碼失敗) 時視為沒有宣告"""
+    prefix = prefix[:ENCODING_SNIFF_BYTES]
+    found = [CHARSET_RE.search(content_type.encode('latin-1', 'replace'))] if content_type else []
+    found.append(META_CHARSET_RE.search(prefix))
+    for m in found:
+        if not m: continue
+        try:
+            encoding = codecs.lookup(m.group(1).decode('ascii')).name
+            encoding = ENCODING_ALIASES.get(encoding, encoding)
+            codecs.getincrementaldecoder(encoding)().decode(prefix)
+            return encoding
+        except (LookupError, UnicodeError):
+            continue
+    return None
+
+def incremental_decoder(encoding):
+    try:
+        return codecs.getincrementaldecoder(encoding)(errors='replace')
+    except LookupError:
+        return codecs.getincrementaldecoder('utf-8')(errors='replace')
+
+class StreamBody:
+    """逐塊讀取回應本文：超過 max_bytes 或讀到 stop_at 標記就停止 (cut 記錄原因)，已讀的部分照常使用
+
+    decode 時邊讀邊以增量解碼器轉成文字；編碼依序取 指定 → Content-Type / <meta> 宣告 → 偵測，
+    沒有宣告時等到第一個非 ASCII 位元組之後湊滿 ENCODING_SNIFF_BYTES (或讀完) 才偵測
+    length 為未壓縮回應的 Content-Length (壓縮或未知時為 None)，用來判斷截斷後剩下的量
+    """
+    def __init__(self, max_bytes=MAX_RESPONSE_BYTES, stop_at=None, decode=False, encoding=None, content_type=None):
+        self.max_bytes, self.stop_at = max_bytes, stop_at
+        self.decode, self.encoding, self.content_type = decode, encoding, content_type
+        self.chunks, self.parts, self.size, self.received = [], [], 0, 0
+        self.cut, self.decoder, self.non_ascii, self.declared = None, None, None, None
+        self.length, self.drained, self.dropped = None, 0, False
+        self.decode_time = 0.0
+
+    async def read(self, stream):
+        tail = b""
+        async for chunk in stream.iter_chunked(STREAM_CHUNK_SIZE):
+            self.received += len(chunk)
+            if self.size + len(chunk) > self.max_bytes:
+                chunk, self.cut = chunk[:self.max_bytes - self.size], 'max_bytes'
+            elif self.stop_at and self.stop_at in tail + chunk:
+                self.cut = 'stop_at'
+            self.feed(chunk)
+            if self.cut: break
+            if self.stop_at: tail = (tail + chunk)[-len(self.stop_at):]
+        self.finish()
+        if self.cut: await self.drain(stream)
+        return self
+
+    async def drain(self, stream):
+        """截斷後剩下的本文不多就讀完丟掉，連線才能回到連線池；剩下超過 STREAM_DRAIN_BYTES 就不讀，
+        由 aiohttp 關閉連線 (dropped)：省下大頁面尾端的下載，代價是下一個請求要重新建立連線"""
+        if self.length is not None and self.length - self.received > STREAM_DRAIN_BYTES:
+            self.dropped = True
+            return
+        while self.drained <= STREAM_DRAIN_BYTES:
+            chunk = await stream.readany()
+            if not chunk: return
+            self.drained += len(chunk)
+        self.dropped = True
+
+    def feed(self, chunk):
+        offset = self.size
+        self.chunks.append(chunk)
+        self.size += len(chunk)
+        if not self.decode: return
+        if self.decoder:
+            self.parts.append(self.decode_chunk(chunk))
+            return
+        if self.non_ascii is None:
+            m = NON_ASCII_RE.search(chunk)
+            if m: self.non_ascii = offset + m.start()
+        if self.declared is None and self.size >= ENCODING_SNIFF_BYTES:
+            self.declared = declared_encoding(self.content_type, b"".join(self.chunks)) or ""
+        if self.encoding or self.declared or (self.non_ascii is not None
+                                              and self.size >= self.non_ascii + ENCODING_SNIFF_BYTES):
+            self.start_decoder()
+
+    def start_decoder(self):
+        prefix = b"".join(self.chunks)
+        if not self.encoding:
+            if self.declared is None: self.declared = declared_encoding(self.content_type, prefix) or ""
+            self.encoding = self.declared or detect_encoding(prefix)
+        self.decoder = incremental_decoder(self.encoding)
+        self.parts.append(self.decode_chunk(prefix))
+
+    def decode_chunk(self, data, final=False):
+        start = time.perf_counter()
+        text = self.decoder.decode(data, final)
+        self.decode_time += time.perf_counter() - start
+        return text
+
+    def finish(self):
+        if not self.decode:
+            # 不解碼 (程序池模式) 時仍記下宣告的編碼，交給解析程序與快取使用
+            self.encoding = self.encoding or declared_encoding(self.content_type, self.body) or None
+            return
+        if self.decoder is None: self.start_decoder()
+        self.parts.append(self.decode_chunk(b"", final=True))
+
+    @property
+    def body(self):
+        if len(self.chunks) > 1: self.chunks = [b"".join(self.chunks)]
+        return self.chunks[0] if self.chunks else b""
+
+    @property
+    def text(self):
+        if not self.decode: return None
+        if len(self.parts) > 1: self.parts = ["".join(self.parts)]
+        return self.parts[0] if self.parts else ""
+
+def decode_body(body, encoding=None):
+    encoding = encoding or detect_encoding(body)
     try:
-        async with aiohttp.ClientSession() as session:
-            async with session.get(url, headers=headers, ssl=False, timeout=30) as resp:
-                if resp.status != 200: return None
-                return await resp.text()
-    except Exception as e:
-        logger.error(f"💥 Aiohttp 失敗: {url} - {e}")
-        return None
+        return body.decode(encoding, errors='replace')
+    except LookupError:
+        return body.decode('utf-8', errors='replace')
 
 # =========================
 # 🧠 資料清洗與網址修復
@@ -114,6 +784,14 @@ def fix_utk_url(domain, raw_url):
             return f"https://{domain}/application/UTK02/UTK0201_.aspx?PRODUCT_ID={pid}"
     return raw_url
 
+@lru_cache(maxsize=None)
+def anchor_strainer():
+    return bs4.SoupStrainer('a')
+
+def make_soup(html, anchors_only=False):
+    """建立解析樹；只需要 <a> 的平台只保留 <a> 子樹，省下建整棵樹的成本"""
+    return bs4.BeautifulSoup(html, HTML_PARSER, parse_only=anchor_strainer() if anchors_only else None)
+
 def safe_get_text(element):
     if element: return element.get_text(strip=True)
     return ""
@@ -131,516 +809,2109 @@ def extract_smart_title(link_tag):
         if text: title = text
     return title
 
-def create_event_obj(title, url, platform, img_url=None, type_override=None):
-    if not title: return None
+# [V62] 黑名單大補強 (針對 StrollTimes, KidsClub, Fami)
+# 可用 NOISE_KEYWORDS_FILE (每行一個詞，# 開頭為註解) 置換整份清單
+DEFAULT_NOISE_KEYWORDS = [
+    '立即購票', '詳細內容', 'Read More', '活動詳情', '查看更多', '已結束', '報名', '詳細資訊', '購票', 
+    'More', 'None', '活動介紹', 'Traffic', '更多詳情', '其他活動', '開放時間', '交通資訊', 
+    '當前頁面', 'Current Page', 'Go to page', '看更多', '查看全部', 'FamiTicket全網購票網', '首頁',
+    '找活動', '下一頁', '廣告版位出租', '隱私權政策', '較舊的文章', '詳細介紹', '回首頁', '網站導覽',
+    '兩側門廳', '中央通廊', '服務台', '堂景介紹', '租借', '全票', '優待票', '建立活動', 'Facebook', 'Instagram',
+    '聯絡我們', '關於我們', '全台週末活動', 'VIVE EAGLE', 'Uncategorized', '親子運動', '展覽活動', 
+    '科學益智', '藝術創作', '5-6歲', '7-8歲', '9-10歲', '11-12歲', '兒童營隊'
+]
 
-    # [V62] 黑名單大補強 (針對 StrollTimes, KidsClub, Fami)
-    noise_keywords = [
-        '立即購票', '詳細內容', 'Read More', '活動詳情', '查看更多', '已結束', '報名', '詳細資訊', '購票', 
-        'More', 'None', '活動介紹', 'Traffic', '更多詳情', '其他活動', '開放時間', '交通資訊', 
-        '當前頁面', 'Current Page', 'Go to page', '看更多', '查看全部', 'FamiTicket全網購票網', '首頁',
-        '找活動', '下一頁', '廣告版位出租', '隱私權政策', '較舊的文章', '詳細介紹', '回首頁', '網站導覽',
-        '兩側門廳', '中央通廊', '服務台', '堂景介紹', '租借', '全票', '優待票', '建立活動', 'Facebook', 'Instagram',
-        '聯絡我們', '關於我們', '全台週末活動', 'VIVE EAGLE', 'Uncategorized', '親子運動', '展覽活動', 
-        '科學益智', '藝術創作', '5-6歲', '7-8歲', '9-10歲', '11-12歲', '兒童營隊'
-    ]
-    
-    if title.strip() in noise_keywords: return None
+def load_noise_keywords(path=None):
+    path = path or os.environ.get("NOISE_KEYWORDS_FILE")
+    if not path: return DEFAULT_NOISE_KEYWORDS
+    lines = Path(path).read_text(encoding='utf-8').splitlines()
+    return [w.strip() for w in lines if w.strip() and not w.lstrip().startswith('#')]
 
-    title = re.sub(r'^(event-)?banner-', '', title, flags=re.I)
-    for n in noise_keywords: title = title.replace(n, "")
-    
-    # 移除年份日期
-    title = re.sub(r'\d{4}[-/]\d{1,2}[-/]\d{1,2}', '', title)
-    title = re.sub(r'^[»\s]+|[»\s]+$', '', title).strip()
+def compile_noise_pattern(keywords):
+    """所有雜訊詞合併成單一 alternation (長詞優先，'Read More' 先於 'More')，一次掃過標題"""
+    ordered = sorted(set(keywords), key=len, reverse=True)
+    return re.compile('|'.join(map(re.escape, ordered)))
 
-    if re.match(r'^\d+$', title) or len(title) < 2: return None
+NOISE_KEYWORDS = load_noise_keywords()
+NOISE_SET = frozenset(NOISE_KEYWORDS)
+NOISE_RE = compile_noise_pattern(NOISE_KEYWORDS)
+BANNER_PREFIX_RE = re.compile(r'^(event-)?banner-', re.I)
+DATE_RE = re.compile(r'\d{4}[-/]\d{1,2}[-/]\d{1,2}')
+EDGE_RE = re.compile(r'^[»\s]+|[»\s]+$')
+DIGITS_RE = re.compile(r'^\d+$')
 
-    tw_tz = timezone(timedelta(hours=8))
-    scraped_time = datetime.now(tw_tz).isoformat()
-    event_type = type_override if type_override else get_event_category_from_title(title)
+def normalize_title(title):
+    """清除雜訊詞、日期與頭尾符號；不是有效標題時回傳 None"""
+    if title.strip() in NOISE_SET: return None
+    title = BANNER_PREFIX_RE.sub('', title)
+    title = NOISE_RE.sub('', title)
+    # 移除年份日期
+    title = DATE_RE.sub('', title)
+    title = EDGE_RE.sub('', title).strip()
+    if DIGITS_RE.match(title) or len(title) < 2: return None
+    return title
 
+def event_record(title, url, platform, img_url, event_type, scraped_at):
     return {
         'title': title, 'url': url, 'platform': platform, 'img_url': img_url,
-        'date': "詳內文", 'type': event_type, 'scraped_at': scraped_time
+        'date': "詳內文", 'type': event_type, 'scraped_at': scraped_at
     }
 
+def create_event_obj(title, url, platform, img_url=None, type_override=None):
+    if not title: return None
+    title = normalize_title(title)
+    if not title: return None
+
+    scraped_time = datetime.now(TW_TZ).isoformat()
+    event_type = type_override if type_override else get_event_category_from_title(title)
+    return event_record(title, url, platform, img_url, event_type, scraped_time)
+
+# 類別優先順序即字典順序：標題同時命中多個類別時取排在前面的
+CATEGORY_KEYWORDS = {
+    "音樂會/演唱會": ["音樂會", "演唱會", "獨奏會", "合唱", "交響", "管樂", "國樂", "弦樂", "鋼琴", "提琴", "巡演", "fan concert", "fancon", "音樂節", "爵士", "演奏", "歌手", "樂團", "tour", "live", "concert", "solo", "recital", "電音派對", "藝人見面會", "音樂祭", "Voice", "聲優"],
+    "音樂劇/歌劇": ["音樂劇", "歌劇", "musical", "opera"],
+    "戲劇表演": ["戲劇", "舞台劇", "劇團", "劇場", "喜劇", "公演", "掌中戲", "歌仔戲", "豫劇", "話劇", "相聲", "布袋戲", "京劇", "崑劇", "藝文活動"],
+    "舞蹈表演": ["舞蹈", "舞作", "舞團", "芭蕾", "舞劇", "現代舞", "民族舞", "踢踏舞", "zumba"],
+    "展覽/博覽": ["展覽", "特展", "博物館", "美術館", "藝術展", "畫展", "攝影展", "文物展", "科學展", "博覽會", "動漫", "展出", "聯展", "個展"],
+    "親子活動": ["親子", "兒童", "寶寶", "家庭", "小朋友", "童話", "卡通", "動畫", "體驗", "營隊", "冬令營", "夏令營"],
+    "電影放映": ["電影", "影展", "數位修復", "放映", "首映", "紀錄片", "動畫電影"],
+    "體育賽事": ["棒球", "籃球", "錦標賽", "運動會", "足球", "羽球", "網球", "馬拉松", "路跑", "游泳", "體操", "championship", "遊戲競賽"],
+    "講座/工作坊": ["工作坊", "課程", "導讀", "沙龍", "講座", "體驗", "研習", "培訓", "論壇", "研討會", "座談", "workshop", "職場工作術", "資訊科技", "AI", "Python", "競賽", "創作", "纏繞"],
+    "娛樂表演": ["脫口秀", "魔術", "雜技", "馬戲", "特技", "魔幻", "綜藝", "娛樂", "秀場", "表演秀", "社群活動", "派對", "市集"],
+    "其他": ["旅遊", "美食", "公益"]
+}
+
+class CategoryClassifier:
+    """Aho–Corasick 多關鍵字比對：一次掃描標題即可找出所有命中的類別"""
+    def __init__(self, mapping, default="其他"):
+        self.categories = list(mapping)
+        self.default = default
+        self.goto = [{}]
+        self.fail = [0]
+        self.out = [()]
+        for ci, keywords in enumerate(mapping.values()):
+            for kw in keywords: self._add(kw.lower(), ci)
+        self._build_fail_links()
+
+    def _add(self, kw, ci):
+        node = 0
+        for ch in kw:
+            nxt = self.goto[node].get(ch)
+            if nxt is None:
+                nxt = len(self.goto)
+                self.goto.append({}); self.fail.append(0); self.out.append(())
+                self.goto[node][ch] = nxt
+            node = nxt
+        # 過短的英文關鍵字 (如 AI) 需完整單字，避免誤中 "Taipei" 之類的字
+        whole_word = kw.isascii() and len(kw) <= 3
+        self.out[node] += ((ci, kw, whole_word),)
+
+    def _build_fail_links(self):
+        queue = deque(self.goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for ch, nxt in self.goto[node].items():
+                queue.append(nxt)
+                f = self.fail[node]
+                while f and ch not in self.goto[f]: f = self.fail[f]
+                self.fail[nxt] = self.goto[f].get(ch, 0)
+                self.out[nxt] += self.out[self.fail[nxt]]
+
+    def scores(self, title):
+        """回傳 {類別: 命中的不同關鍵字數}，依優先順序排列"""
+        if not title: return {}
+        text = title.lower()
+        goto, fail, out = self.goto, self.fail, self.out
+        hits = {}
+        node = 0
+        for i, ch in enumerate(text):
+            while node and ch not in goto[node]: node = fail[node]
+            node = goto[node].get(ch, 0)
+            for ci, kw, whole_word in out[node]:
+                if whole_word and not _is_word_at(text, i + 1 - len(kw), i + 1): continue
+                hits.setdefault(ci, set()).add(kw)
+        return {self.categories[ci]: len(hits[ci]) for ci in sorted(hits)}
+
+    def classify(self, title):
+        scores = self.scores(title)
+        return next(iter(scores), self.default)
+
+    def classify_batch(self, titles):
+        """整批分類 (相同標題只掃描一次)"""
+        memo = {}
+        return [memo[t] if t in memo else memo.setdefault(t, self.classify(t)) for t in titles]
+
+def _is_word_at(text, start, end):
+    before = text[start - 1] if start > 0 else ' '
+    after = text[end] if end < len(text) else ' '
+    return not (before.isascii() and before.isalnum()) and not (after.isascii() and after.isalnum())
+
+CLASSIFIER = CategoryClassifier(CATEGORY_KEYWORDS)
+
 def get_event_category_from_title(title):
-    if not title: return "其他"
-    title_lower = title.lower()
-    category_mapping = {
-        "音樂會/演唱會": ["音樂會", "演唱會", "獨奏會", "合唱", "交響", "管樂", "國樂", "弦樂", "鋼琴", "提琴", "巡演", "fan concert", "fancon", "音樂節", "爵士", "演奏", "歌手", "樂團", "tour", "live", "concert", "solo", "recital", "電音派對", "藝人見面會", "音樂祭", "Voice", "聲優"],
-        "音樂劇/歌劇": ["音樂劇", "歌劇", "musical", "opera"],
-        "戲劇表演": ["戲劇", "舞台劇", "劇團", "劇場", "喜劇", "公演", "掌中戲", "歌仔戲", "豫劇", "話劇", "相聲", "布袋戲", "京劇", "崑劇", "藝文活動"],
-        "舞蹈表演": ["舞蹈", "舞作", "舞團", "芭蕾", "舞劇", "現代舞", "民族舞", "踢踏舞", "zumba"],
-        "展覽/博覽": ["展覽", "特展", "博物館", "美術館", "藝術展", "畫展", "攝影展", "文物展", "科學展", "博覽會", "動漫", "展出", "聯展", "個展"],
-        "親子活動": ["親子", "兒童", "寶寶", "家庭", "小朋友", "童話", "卡通", "動畫", "體驗", "營隊", "冬令營", "夏令營"],
-        "電影放映": ["電影", "影展", "數位修復", "放映", "首映", "紀錄片", "動畫電影"],
-        "體育賽事": ["棒球", "籃球", "錦標賽", "運動會", "足球", "羽球", "網球", "馬拉松", "路跑", "游泳", "體操", "championship", "遊戲競賽"],
-        "講座/工作坊": ["工作坊", "課程", "導讀", "沙龍", "講座", "體驗", "研習", "培訓", "論壇", "研討會", "座談", "workshop", "職場工作術", "資訊科技", "AI", "Python", "競賽", "創作", "纏繞"],
-        "娛樂表演": ["脫口秀", "魔術", "雜技", "馬戲", "特技", "魔幻", "綜藝", "娛樂", "秀場", "表演秀", "社群活動", "派對", "市集"],
-        "其他": ["旅遊", "美食", "公益"]
-    }
-    for category, keywords in category_mapping.items():
-        if any(keyword in title_lower for keyword in keywords): return category
-    return "其他"
+    return CLASSIFIER.classify(title)
+
+# 地區代碼與前端 regionLabelMap 一致 (North / Central / South / East / Islands)
+REGION_KEYWORDS = {
+    'North': ('台北', '臺北', '新北', '基隆', '桃園', '新竹', '宜蘭', '兩廳院', '國家戲劇院', '國家音樂廳', '小巨蛋'),
+    'Central': ('苗栗', '台中', '臺中', '彰化', '南投', '雲林'),
+    'South': ('嘉義', '台南', '臺南', '高雄', '屏東', '衛武營'),
+    'East': ('花蓮', '台東', '臺東'),
+    'Islands': ('澎湖', '金門', '馬祖', '連江'),
+}
+
+def region_of(text):
+    """文字中最早出現的縣市 / 場館決定地區；都沒有則回傳 None"""
+    if not text: return None
+    best = None
+    for region, keywords in REGION_KEYWORDS.items():
+        for kw in keywords:
+            pos = text.find(kw)
+            if pos >= 0 and (best is None or pos < best[0]): best = (pos, region)
+    return best[1] if best else None
+
+DETAIL_DATE_RE = re.compile(r'(20\d{2})\s*[./\-年]\s*(\d{1,2})\s*[./\-月]\s*(\d{1,2})')
+
+def format_dates(*texts):
+    """取出文字中的日期 (去重後最多兩個) 統一成 2026/05/01 或 2026/05/01 ~ 2026/05/03"""
+    dates = [f"{y}/{int(mo):02d}/{int(d):02d}" for text in texts if text for y, mo, d in DETAIL_DATE_RE.findall(text)]
+    return " ~ ".join(list(dict.fromkeys(dates))[:2]) or None
 
 # =========================
-# 🕷️ 平台爬蟲 (Requests)
+# 🧬 結構化資料 (JSON-LD / __NEXT_DATA__ / JSON 端點)
 # =========================
+LD_JSON_RE = re.compile(r'<script[^>]*type=["\']application/ld\+json["\'][^>]*>(.*?)</script>', re.S | re.I)
+NEXT_DATA_RE = re.compile(r'<script[^>]*id=["\']__NEXT_DATA__["\'][^>]*>(.*?)</script>', re.S | re.I)
+LD_CONTAINER_KEYS = ('@graph', 'itemListElement', 'item', 'mainEntity')
 
-def fetch_kktix(session):
-    logger.info("🚀 啟動 KKTIX (V62 No-Referer)...")
-    urls = [f"https://kktix.com/events?category_id={i}" for i in [2,6,4,3,8]] + ["https://kktix.com/"]
-    events = []
-    seen = set()
-    for url in urls:
-        html = fetch_text_requests(session, url)
-        if not html: continue
-        soup = BeautifulSoup(html, "html.parser")
-        links = soup.select('a[href*="/events/"], .event-item a, .event-card a')
-        for link in links:
-            href = link.get('href')
-            if not href: continue
-            full_url = urljoin("https://kktix.com", href).split('?')[0]
-            if full_url in seen: continue
-            title = link.get('title') or safe_get_text(link.find(class_='name')) or safe_get_text(link)
-            img = link.find('img')
-            ev = create_event_obj(title, full_url, "KKTIX", img.get('src') if img else None)
-            if ev: events.append(ev); seen.add(full_url)
-    logger.info(f"[KKTIX] 抓取 {len(events)} 筆")
-    return events
+def iter_ld_events(data):
+    """走訪 JSON-LD (含 @graph / ItemList)，產生 @type 為 Event 或其子型別 (MusicEvent ...) 的物件"""
+    if isinstance(data, list):
+        for item in data: yield from iter_ld_events(item)
+    elif isinstance(data, dict):
+        types = data.get('@type')
+        types = types if isinstance(types, list) else [types]
+        if any(isinstance(t, str) and t.endswith('Event') for t in types):
+            yield data
+            return
+        for key in LD_CONTAINER_KEYS:
+            if key in data: yield from iter_ld_events(data[key])
 
-def fetch_accupass(session):
-    logger.info("🚀 啟動 ACCUPASS...")
-    urls = [f"https://www.accupass.com/search?q={k}" for k in ["音樂", "藝文", "學習", "科技", "展覽"]] + ["https://www.accupass.com/?area=north"]
-    events = []
-    seen = set()
-    for url in urls:
-        html = fetch_text_requests(session, url)
-        if not html: continue
-        soup = BeautifulSoup(html, "html.parser")
-        candidates = soup.find_all('a', href=re.compile(r'^/event/([A-Za-z0-9]+)'))
-        for link in candidates:
-            href = link.get('href')
-            full_url = urljoin("https://www.accupass.com", href).split('?')[0]
-            if full_url in seen: continue
-            title = safe_get_text(link.find('h3')) or safe_get_text(link)
-            img = link.find('img')
-            ev = create_event_obj(title, full_url, "ACCUPASS", img.get('src') if img else None)
-            if ev: events.append(ev); seen.add(full_url)
-    logger.info(f"[ACCUPASS] 抓取 {len(events)} 筆")
-    return events
+def ld_text(value):
+    """schema.org 欄位可能是字串、物件或陣列，取第一個可用的文字 / 網址"""
+    if isinstance(value, list): value = value[0] if value else None
+    if isinstance(value, dict): value = value.get('url') or value.get('name') or value.get('@id')
+    return html_lib.unescape(value).strip() if isinstance(value, str) else None
 
-def fetch_tixcraft(session):
-    logger.info("🚀 啟動 拓元...")
-    urls = ["https://tixcraft.com/activity", "https://tixcraft.com/activity/list/select_type/all"]
-    events = []
-    seen = set()
-    for url in urls:
-        html = fetch_text_requests(session, url)
-        if not html: continue
-        soup = BeautifulSoup(html, "html.parser")
-        links = soup.select('a[href*="/activity/detail/"]')
-        for link in links:
-            full_url = urljoin("https://tixcraft.com", link.get('href'))
-            if full_url in seen: continue
-            title = link.get('title') or safe_get_text(link)
-            ev = create_event_obj(title, full_url, "拓元售票", None)
-            if ev: events.append(ev); seen.add(full_url)
-    logger.info(f"[拓元] 抓取 {len(events)} 筆")
-    return events
+def ld_location(value):
+    if isinstance(value, list): value = value[0] if value else None
+    if not isinstance(value, dict): return ld_text(value)
+    address = value.get('address')
+    if isinstance(address, dict):
+        address = "".join(address.get(k) or "" for k in ('addressRegion', 'addressLocality', 'streetAddress'))
+    parts = [p for p in (ld_text(value.get('name')), ld_text(address)) if p]
+    return " ".join(dict.fromkeys(parts)) or None
 
-def fetch_kham(session):
-    logger.info("🚀 啟動 寬宏...")
-    urls = [f"https://kham.com.tw/application/UTK01/UTK0101_06.aspx?TYPE=1&CATEGORY={i}" for i in [205,231,116,129]]
-    events = []
-    seen = set()
-    for url in urls:
-        html = fetch_text_requests(session, url)
-        if not html: continue
-        soup = BeautifulSoup(html, "html.parser")
-        links = soup.select('a[href*="UTK0201_"]') 
-        for link in links:
-            raw_url = urljoin("https://kham.com.tw", link.get('href'))
-            full_url = fix_utk_url("kham.com.tw", raw_url)
-            if full_url in seen: continue
-            if "PRODUCT_ID" not in full_url: continue
-            title = safe_get_text(link)
-            ev = create_event_obj(title, full_url, "寬宏", None)
-            if ev: events.append(ev); seen.add(full_url)
-    logger.info(f"[寬宏] 抓取 {len(events)} 筆")
-    return events
+def ld_event_fields(obj):
+    """schema.org Event -> (標題, 網址, 圖片, 額外欄位)"""
+    extra = {}
+    date = format_dates(obj.get('startDate'), obj.get('endDate'))
+    if date: extra['date'] = date
+    location = ld_location(obj.get('location'))
+    if location:
+        extra['location'] = location
+        region = region_of(location)
+        if region: extra['region'] = region
+    return ld_text(obj.get('name')), ld_text(obj.get('url')) or ld_text(obj.get('@id')), ld_text(obj.get('image')), extra
 
-def fetch_opentix(session):
-    logger.info("🚀 啟動 OPENTIX...")
-    html = fetch_text_requests(session, "https://www.opentix.life/event")
-    if not html: return []
-    soup = BeautifulSoup(html, "html.parser")
-    links = soup.select('a[href*="/event/"]')
-    events = []
-    seen = set()
-    for link in links:
-        full_url = urljoin("https://www.opentix.life", link.get('href'))
-        if full_url in seen: continue
-        title = extract_smart_title(link)
-        img = link.find('img')
-        ev = create_event_obj(title, full_url, "OPENTIX", img.get('src') if img else None)
-        if ev: events.append(ev); seen.add(full_url)
-    logger.info(f"[OPENTIX] 抓取 {len(events)} 筆")
-    return events
+def structured_items(html, spec=None):
+    """不建解析樹，直接從原始文字取出 schema.org Event 形式的物件
 
-def fetch_udn(session):
-    logger.info("🚀 啟動 UDN...")
-    categories = [231, 205, 77, 116, 100, 129, 218, 163, 101]
-    urls = [f"https://tickets.udnfunlife.com/application/UTK01/UTK0101_03.aspx?Category={c}&kdid=cateList" for c in categories]
-    events = []
-    seen = set()
-    for url in urls:
-        html = fetch_text_requests(session, url)
-        if not html: continue
-        soup = BeautifulSoup(html, "html.parser")
-        links = soup.select('a[href*="UTK0201_"]')
-        for link in links:
-            raw_url = urljoin("https://tickets.udnfunlife.com", link.get('href'))
-            full_url = fix_utk_url("tickets.udnfunlife.com", raw_url)
-            if full_url in seen: continue
-            if "PRODUCT_ID" not in full_url: continue
-            title = safe_get_text(link).split("NT$")[0].strip()
-            ev = create_event_obj(title, full_url, "UDN售票網", None)
-            if ev: events.append(ev); seen.add(full_url)
-    logger.info(f"[UDN] 抓取 {len(events)} 筆")
-    return events
+    整份內容就是 JSON (JSON 端點) 時交給 spec.json_events；
+    HTML 則讀 JSON-LD，平台有 json_events 時再讀 __NEXT_DATA__
+    """
+    json_events = spec.json_events if spec else None
+    text = html.lstrip()
+    if text[:1] in ('{', '['):
+        try:
+            data = json_loads(text)
+        except ValueError:
+            return []
+        return list(json_events(data) if json_events else iter_ld_events(data))
+    items = []
+    for block in LD_JSON_RE.findall(html):
+        try:
+            items.extend(iter_ld_events(json_loads(block.strip())))
+        except ValueError:
+            continue
+    if json_events:
+        m = NEXT_DATA_RE.search(html)
+        if m:
+            try:
+                items.extend(json_events(json_loads(m.group(1))))
+            except ValueError:
+                pass
+    return items
 
-def fetch_fami(session):
-    logger.info("🚀 啟動 FamiTicket...")
-    html = fetch_text_requests(session, "https://www.famiticket.com.tw/Home/Activity/Search/242")
-    if not html: return []
-    soup = BeautifulSoup(html, "html.parser")
-    links = soup.find_all('a', href=re.compile(r'Activity', re.I))
-    events = []
-    seen = set()
-    for link in links:
-        href = link.get('href')
-        full_url = urljoin("https://www.famiticket.com.tw", link.get('href'))
-        if full_url in seen: continue
-        if "Info" not in full_url and "Search" not in full_url: continue
-        if "Search" in full_url: continue 
-        title = safe_get_text(link)
-        ev = create_event_obj(title, full_url, "FamiTicket", None)
-        if ev: events.append(ev); seen.add(full_url)
-    logger.info(f"[FamiTicket] 抓取 {len(events)} 筆")
-    return events
+# =========================
+# 🕷️ 平台設定 (宣告式)
+# =========================
+# 標題擷取方式
+def title_text(link):
+    return safe_get_text(link)
 
-def fetch_era(session):
-    logger.info("🚀 啟動 年代 (V62 Auto Encoding)...")
-    # [V62] 不強制指定 Big5，讓 requests 自動偵測
-    html = fetch_text_requests(session, "https://ticket.com.tw/application/UTK01/UTK0101_06.aspx?TYPE=1&CATEGORY=77")
-    if not html: return []
-    soup = BeautifulSoup(html, "html.parser")
-    links = soup.find_all('a', href=re.compile(r'UTK0201', re.I))
-    events = []
-    seen = set()
-    for link in links:
-        raw_url = urljoin("https://ticket.com.tw", link.get('href'))
-        full_url = fix_utk_url("ticket.com.tw", raw_url)
-        if full_url in seen: continue
-        title = extract_smart_title(link)
-        ev = create_event_obj(title, full_url, "年代售票", None)
-        if ev: events.append(ev); seen.add(full_url)
-    logger.info(f"[年代] 抓取 {len(events)} 筆")
-    return events
+def title_attr_or_text(link):
+    return link.get('title') or safe_get_text(link)
 
-def fetch_tixfun(session):
-    logger.info("🚀 啟動 TixFun...")
-    html = fetch_text_requests(session, "https://tixfun.com/UTK0101_?TYPE=1&CATEGORY=77")
-    if not html: return []
-    soup = BeautifulSoup(html, "html.parser")
-    links = soup.select('a[href*="UTK0201_"]')
-    events = []
-    seen = set()
-    for link in links:
-        raw_url = urljoin("https://tixfun.com", link.get('href'))
-        full_url = fix_utk_url("tixfun.com", raw_url)
-        if full_url in seen: continue
-        if "PRODUCT_ID" not in full_url: continue
-        title = safe_get_text(link)
-        ev = create_event_obj(title, full_url, "TixFun售票網", None)
-        if ev: events.append(ev); seen.add(full_url)
-    logger.info(f"[TixFun] 抓取 {len(events)} 筆")
-    return events
+def title_text_or_attr(link):
+    return link.get_text(strip=True) or link.get('title')
 
-def fetch_eventgo(session):
-    logger.info("🚀 啟動 Event Go...")
-    html = fetch_text_requests(session, "https://eventgo.bnextmedia.com.tw/")
-    if not html: return []
-    soup = BeautifulSoup(html, "html.parser")
-    links = soup.select('a[href*="/event/detail"]')
-    events = []
-    seen = set()
-    for link in links:
-        full_url = urljoin("https://eventgo.bnextmedia.com.tw", link.get('href'))
-        if full_url in seen: continue
-        title = safe_get_text(link)
-        img = link.find('img')
-        ev = create_event_obj(title, full_url, "Event Go", img.get('src') if img else None)
-        if ev: events.append(ev); seen.add(full_url)
-    logger.info(f"[Event Go] 抓取 {len(events)} 筆")
-    return events
+def title_kktix(link):
+    return link.get('title') or safe_get_text(link.find(class_='name')) or safe_get_text(link)
 
-def fetch_beclass(session):
-    logger.info("🚀 啟動 BeClass...")
-    html = fetch_text_requests(session, "https://www.beclass.com/default.php?name=ShowList&op=recent")
-    if not html: return []
-    soup = BeautifulSoup(html, "html.parser")
-    links = soup.select("a[href*='rid=']")
-    events = []
-    seen = set()
-    for link in links:
-        full_url = urljoin("https://www.beclass.com", link.get('href'))
-        if full_url in seen: continue
-        title = link.get_text(strip=True)
-        ev = create_event_obj(title, full_url, "BeClass", None)
-        if ev: events.append(ev); seen.add(full_url)
-    logger.info(f"[BeClass] 抓取 {len(events)} 筆")
-    return events
+def title_h3_or_text(link):
+    return safe_get_text(link.find('h3')) or safe_get_text(link)
 
-def fetch_ibon(session):
-    logger.info("🚀 啟動 ibon...")
-    html = fetch_text_requests(session, "https://ticket.ibon.com.tw/Activity/Index")
-    if not html: return []
-    soup = BeautifulSoup(html, "html.parser")
-    all_links = soup.find_all('a', href=True)
-    events = []
-    seen = set()
-    for link in all_links:
-        href = link.get('href')
-        if "activity" not in href.lower(): continue
-        full_url = urljoin("https://ticket.ibon.com.tw", href)
-        if full_url in seen: continue
-        title = safe_get_text(link)
-        img = link.find('img')
-        ev = create_event_obj(title, full_url, "ibon", img.get('src') if img else None)
-        if ev: events.append(ev); seen.add(full_url)
-    logger.info(f"[ibon] 抓取 {len(events)} 筆")
-    return events
+def title_before_price(link):
+    return safe_get_text(link).split("NT$")[0].strip()
 
-def fetch_huashan(session):
-    logger.info("🚀 啟動 華山 (V62 Broad)...")
-    html = fetch_text_requests(session, "https://www.huashan1914.com/w/huashan1914/exhibition")
-    if not html: return []
-    soup = BeautifulSoup(html, "html.parser")
-    links = soup.find_all('a', href=re.compile(r'exhibition', re.I))
-    events = []
-    seen = set()
+def has_product_id(url):
+    return "PRODUCT_ID" in url
+
+@dataclass(frozen=True)
+class PlatformSpec:
+    """一個平台的抓取規則；所有平台都由同一套通用流程 (extract_candidates → build_events) 處理"""
+    key: str                      # 內部代號 (日誌、指標、命令列)
+    name: str                     # 寫進活動資料的平台名稱
+    label: str                    # 日誌顯示名稱
+    base_url: str                 # urljoin 的基準網址
+    urls: tuple                   # 列表頁
+    selector: str = None          # CSS 選擇器；未指定則用 href_pattern 或全部 <a href>
+    href_pattern: str = None      # find_all('a', href=re.compile(...)) 的樣式
+    href_ignore_case: bool = False  # href_pattern 不分大小寫 (re.I)
+    row_selector: str = None      # 先選列再以 selector 取該列的第一個連結 (台北世貿)
+    href_filter: object = None    # 組網址前以 href 過濾
+    url_fixer: object = None      # 網址修正 (如 fix_utk_url)
+    url_filter: object = None     # 以完整網址過濾
+    strip_query: bool = False     # 去除 ? 之後的參數
+    join_url: bool = True         # False 時直接使用 href (StrollTimes)
+    title: object = extract_smart_title
+    min_title_len: int = 0
+    with_image: bool = False
+    type_override: str = None
+    full_tree: bool = False       # 需要 <a> 以外的節點 (祖先選擇器 / 表格列) 時建完整解析樹
+    json_events: object = None    # JSON 端點 / __NEXT_DATA__ -> schema.org Event 形式的 dict (需確認過該站的資料格式)
+    structured_only: bool = False # 結構化資料就是完整列表 (需確認過)，有資料就不掃描連結
+    interval: int = REFRESH_INTERVAL  # 常駐模式的重抓間隔 (秒)
+    max_bytes: int = MAX_RESPONSE_BYTES  # 單頁回應大小上限
+    stop_at: bytes = None         # 列表區塊之後必定出現的標記，讀到就不再下載其餘部分 (需確認過該站的頁面結構)
+
+def find_links(spec, soup):
+    if spec.row_selector:
+        return (row.select_one(spec.selector) for row in soup.select(spec.row_selector))
+    if spec.selector:
+        return soup.select(spec.selector)
+    if spec.href_pattern:
+        return soup.find_all('a', href=href_regex(spec.href_pattern, spec.href_ignore_case))
+    return soup.find_all('a', href=True)
+
+@lru_cache(maxsize=None)
+def href_regex(pattern, ignore_case=False):
+    return re.compile(pattern, re.I if ignore_case else 0)
+
+def href_matches(spec, href):
+    """結構化資料的網址套用與連結掃描相同的 href_pattern；JSON-LD 多為絕對網址，同站的也以 路徑 + query 比對"""
+    if not spec.href_pattern: return True
+    regex = href_regex(spec.href_pattern, spec.href_ignore_case)
+    if regex.search(href): return True
+    parts = urlsplit(href)
+    same_site = parts.hostname and parts.hostname.removeprefix('www.') == urlsplit(spec.base_url).hostname.removeprefix('www.')
+    return bool(same_site and regex.search(urlunsplit(('', '', parts.path, parts.query, parts.fragment))))
+
+def spec_url(spec, href):
+    """過濾 → 組網址 → 修正；不符合平台規則時回傳 None"""
+    if spec.href_filter and not spec.href_filter(href): return None
+    full_url = urljoin(spec.base_url, href) if spec.join_url else href
+    if spec.strip_query: full_url = full_url.split('?')[0]
+    if spec.url_fixer: full_url = spec.url_fixer(full_url)
+    if spec.url_filter and not spec.url_filter(full_url): return None
+    return full_url
+
+def structured_candidates(spec, html, stats=None, shapes=None):
+    """結構化資料層：產生 (標題, 網址, 圖片, 額外欄位)，網址同樣套用平台規則 (href_pattern、過濾修正、剪枝)"""
+    rows = []
+    for obj in structured_items(html, spec):
+        title, href, img, extra = ld_event_fields(obj)
+        full_url = spec_url(spec, href) if href and title and href_matches(spec, href) else None
+        if not full_url: continue
+        if shapes is not None and url_shape(full_url) not in shapes:
+            if stats is not None: stats['pruned'] += 1
+            continue
+        rows.append((title, full_url, img, extra))
+    return rows
+
+# 原始 HTML 中的 <a href> (不建解析樹)
+RAW_HREF_RE = re.compile(r'<a\s[^>]*?\bhref\s*=\s*["\']([^"\'>]+)', re.I)
+
+def structured_covers(spec, html, structured):
+    """頁面上每個符合平台規則的連結網址都已在結構化資料中 (連結掃描不會多找到活動)
+
+    以原始文字比對、不套用 CSS 選擇器，範圍比連結掃描寬，只會多掃描、不會漏掉
+    """
+    urls = {url for _, url, _, _ in structured}
+    for href in RAW_HREF_RE.findall(html):
+        href = html_lib.unescape(href)
+        if not href_matches(spec, href): continue
+        full_url = spec_url(spec, href)
+        if full_url and full_url not in urls: return False
+    return True
+
+def link_candidates(spec, links, extras, stats=None, shapes=None):
+    """選出的連結 → 過濾 → 組網址 → 修正 → (剪枝) → 擷取原始標題與圖片"""
     for link in links:
+        if link is None: continue
+        if stats is not None: stats['anchors'] += 1
         href = link.get('href')
-        full_url = urljoin("https://www.huashan1914.com", link.get('href'))
-        if full_url in seen: continue
-        title = link.get_text(strip=True) or link.get('title')
-        ev = create_event_obj(title, full_url, "華山1914", None)
-        if ev: events.append(ev); seen.add(full_url)
-    logger.info(f"[華山] 抓取 {len(events)} 筆")
-    return events
+        if not href: continue
+        full_url = spec_url(spec, href)
+        if not full_url: continue
+        if shapes is not None and url_shape(full_url) not in shapes:
+            if stats is not None: stats['pruned'] += 1
+            continue
+        title = spec.title(link)
+        if spec.min_title_len and (not title or len(title) < spec.min_title_len): continue
+        img = link.find('img') if spec.with_image else None
+        yield title, full_url, img.get('src') if img else None, extras.get(full_url)
 
-def fetch_songshan(session):
-    logger.info("🚀 啟動 松山...")
-    html = fetch_text_requests(session, "https://www.songshanculturalpark.org/exhibition")
-    if not html: return []
-    soup = BeautifulSoup(html, "html.parser")
-    links = soup.find_all('a', href=re.compile(r'/exhibition/'))
+def extract_candidates(spec, html, stats=None, shapes=None):
+    """解析階段，回傳 (標題, 網址, 圖片, 額外欄位) 清單
+
+    shapes (LinkPatterns 學到的網址形狀) 不為 None 時結構化資料與連結都只處理符合的網址；
+    一筆都不剩就改回全掃描 (網站可能改版)
+    """
+    counts = {'anchors': 0, 'structured': 0, 'pruned': 0}
+    rows = page_candidates(spec, html, counts, shapes)
+    if shapes is not None and not rows and counts['pruned']:
+        counts = dict.fromkeys(counts, 0)
+        rows = page_candidates(spec, html, counts)
+    if stats is not None:
+        for k, v in counts.items(): stats[k] += v
+    return rows
+
+def page_candidates(spec, html, stats, shapes=None):
+    """先讀結構化資料 (不建解析樹)，涵蓋整頁的連結 (或平台宣告 structured_only) 才直接採用；否則走
+    選連結 → 過濾 → 組網址 → 修正 → 擷取原始標題與圖片，並把結構化資料的日期、地點補到相同網址上
+    """
+    structured = structured_candidates(spec, html, stats, shapes)
+    stats['structured'] += len(structured)
+    # 只有「精選」或第一頁 ItemList 的頁面若整頁採用，其餘活動會被漏掉並在下一次發佈時被當成下架
+    if structured and (spec.structured_only or structured_covers(spec, html, structured)): return structured
+    extras = {url: extra for _, url, _, extra in structured}
+    soup = make_soup(html, anchors_only=not spec.full_tree)
+    rows = list(link_candidates(spec, find_links(spec, soup), extras, stats, shapes))
+    # 連結掃描沒找到的結構化活動也收進來 (同網址以先出現的為準)
+    return rows + structured
+
+def build_events(spec, candidates):
+    """清洗分類階段：清洗標題、同頁網址去重 (保留第一筆有效的)，再整批分類組成活動"""
+    rows, seen = [], set()
+    for title, url, img_url, extra in candidates:
+        if url in seen or not title: continue
+        title = normalize_title(title)
+        if not title: continue
+        rows.append((title, url, img_url, extra)); seen.add(url)
+    if spec.type_override: types = [spec.type_override] * len(rows)
+    else: types = CLASSIFIER.classify_batch([title for title, _, _, _ in rows])
+    scraped_time = datetime.now(TW_TZ).isoformat()
     events = []
-    seen = set()
-    for link in links:
-        full_url = urljoin("https://www.songshanculturalpark.org", link.get('href'))
-        if full_url in seen: continue
-        title = extract_smart_title(link)
-        img = link.find('img')
-        ev = create_event_obj(title, full_url, "松山文創", img.get('src') if img else None)
-        if ev: events.append(ev); seen.add(full_url)
-    logger.info(f"[松山] 抓取 {len(events)} 筆")
+    for (title, url, img_url, extra), event_type in zip(rows, types):
+        ev = event_record(title, url, spec.name, img_url, event_type, scraped_time)
+        if extra: ev.update(extra)
+        events.append(ev)
     return events
 
-def fetch_kidsclub(session):
-    logger.info("🚀 啟動 KidsClub (V62 Fix)...")
-    html = fetch_text_requests(session, "https://www.kidsclub.com.tw/")
-    if not html: return []
-    soup = BeautifulSoup(html, "html.parser")
-    all_links = soup.find_all('a', href=True)
-    events = []
-    seen = set()
-    for link in all_links:
-        href = link.get('href')
+def extract_events(spec, html, stats=None):
+    """通用擷取流程：解析候選連結 → 清洗分類，回傳該頁的活動清單"""
+    return build_events(spec, extract_candidates(spec, html, stats))
+
+# UTK 系統 (寬宏 / UDN / 年代 / TixFun) 的列表頁：活動連結都在 <footer> 之前，之後只剩頁尾連結與 script
+UTK_LIST_END = b"<footer"
+
+PLATFORMS = [
+    PlatformSpec(
+        key="kktix", name="KKTIX", label="KKTIX", base_url="https://kktix.com",
+        urls=tuple(f"https://kktix.com/events?category_id={i}" for i in [2,6,4,3,8]) + ("https://kktix.com/",),
+        selector='a[href*="/events/"], .event-item a, .event-card a',
+        strip_query=True, title=title_kktix, with_image=True, full_tree=True),
+    PlatformSpec(
+        key="accupass", name="ACCUPASS", label="ACCUPASS", base_url="https://www.accupass.com",
+        urls=tuple(f"https://www.accupass.com/search?q={k}" for k in ["音樂", "藝文", "學習", "科技", "展覽"]) + ("https://www.accupass.com/?area=north",),
+        href_pattern=r'^/event/([A-Za-z0-9]+)', strip_query=True, title=title_h3_or_text, with_image=True),
+    PlatformSpec(
+        key="tixcraft", name="拓元售票", label="拓元", base_url="https://tixcraft.com",
+        urls=("https://tixcraft.com/activity", "https://tixcraft.com/activity/list/select_type/all"),
+        selector='a[href*="/activity/detail/"]', title=title_attr_or_text),
+    PlatformSpec(
+        key="kham", name="寬宏", label="寬宏", base_url="https://kham.com.tw",
+        urls=tuple(f"https://kham.com.tw/application/UTK01/UTK0101_06.aspx?TYPE=1&CATEGORY={i}" for i in [205,231,116,129]),
+        selector='a[href*="UTK0201_"]', url_fixer=partial(fix_utk_url, "kham.com.tw"),
+        url_filter=has_product_id, title=title_text, stop_at=UTK_LIST_END),
+    PlatformSpec(
+        key="opentix", name="OPENTIX", label="OPENTIX", base_url="https://www.opentix.life",
+        urls=("https://www.opentix.life/event",),
+        selector='a[href*="/event/"]', with_image=True, interval=3600),
+    PlatformSpec(
+        key="udn", name="UDN售票網", label="UDN", base_url="https://tickets.udnfunlife.com",
+        urls=tuple(f"https://tickets.udnfunlife.com/application/UTK01/UTK0101_03.aspx?Category={c}&kdid=cateList"
+                   for c in [231, 205, 77, 116, 100, 129, 218, 163, 101]),
+        selector='a[href*="UTK0201_"]', url_fixer=partial(fix_utk_url, "tickets.udnfunlife.com"),
+        url_filter=has_product_id, title=title_before_price, stop_at=UTK_LIST_END),
+    PlatformSpec(
+        key="fami", name="FamiTicket", label="FamiTicket", base_url="https://www.famiticket.com.tw",
+        urls=("https://www.famiticket.com.tw/Home/Activity/Search/242",),
+        href_pattern=r'Activity', href_ignore_case=True, url_filter=lambda u: "Info" in u and "Search" not in u, title=title_text),
+    PlatformSpec(
+        # [V62] 不強制指定 Big5，自動偵測編碼
+        key="era", name="年代售票", label="年代", base_url="https://ticket.com.tw",
+        urls=("https://ticket.com.tw/application/UTK01/UTK0101_06.aspx?TYPE=1&CATEGORY=77",),
+        href_pattern=r'UTK0201', href_ignore_case=True, url_fixer=partial(fix_utk_url, "ticket.com.tw"), stop_at=UTK_LIST_END),
+    PlatformSpec(
+        key="tixfun", name="TixFun售票網", label="TixFun", base_url="https://tixfun.com",
+        urls=("https://tixfun.com/UTK0101_?TYPE=1&CATEGORY=77",),
+        selector='a[href*="UTK0201_"]', url_fixer=partial(fix_utk_url, "tixfun.com"),
+        url_filter=has_product_id, title=title_text, stop_at=UTK_LIST_END),
+    PlatformSpec(
+        key="eventgo", name="Event Go", label="Event Go", base_url="https://eventgo.bnextmedia.com.tw",
+        urls=("https://eventgo.bnextmedia.com.tw/",),
+        selector='a[href*="/event/detail"]', title=title_text, with_image=True),
+    PlatformSpec(
+        key="beclass", name="BeClass", label="BeClass", base_url="https://www.beclass.com",
+        urls=("https://www.beclass.com/default.php?name=ShowList&op=recent",),
+        selector="a[href*='rid=']", title=title_text),
+    PlatformSpec(
+        key="ibon", name="ibon", label="ibon", base_url="https://ticket.ibon.com.tw",
+        urls=("https://ticket.ibon.com.tw/Activity/Index",),
+        href_filter=lambda h: "activity" in h.lower(), title=title_text, with_image=True),
+    PlatformSpec(
+        key="huashan", name="華山1914", label="華山", base_url="https://www.huashan1914.com",
+        urls=("https://www.huashan1914.com/w/huashan1914/exhibition",),
+        href_pattern=r'exhibition', href_ignore_case=True, title=title_text_or_attr, interval=24 * 3600),
+    PlatformSpec(
+        key="songshan", name="松山文創", label="松山", base_url="https://www.songshanculturalpark.org",
+        urls=("https://www.songshanculturalpark.org/exhibition",),
+        href_pattern=r'/exhibition/', with_image=True, interval=24 * 3600),
+    PlatformSpec(
         # [V62] 更嚴格的類別排除
-        if "product-category" in href or "tag" in href: continue
-        if "/courses/category/" in href or "/courses/uncategorized/" in href: continue
-        if not re.search(r'(product|courses)', href): continue
-        
-        full_url = urljoin("https://www.kidsclub.com.tw", href)
-        if full_url in seen: continue
-        title = extract_smart_title(link)
-        img = link.find('img')
-        ev = create_event_obj(title, full_url, "KidsClub", img.get('src') if img else None)
-        if ev: events.append(ev); seen.add(full_url)
-    logger.info(f"[KidsClub] 抓取 {len(events)} 筆")
-    return events
+        key="kidsclub", name="KidsClub", label="KidsClub", base_url="https://www.kidsclub.com.tw",
+        urls=("https://www.kidsclub.com.tw/",),
+        href_filter=lambda h: ("product-category" not in h and "tag" not in h
+                               and "/courses/category/" not in h and "/courses/uncategorized/" not in h
+                               and re.search(r'(product|courses)', h) is not None),
+        with_image=True),
+    PlatformSpec(
+        key="wtc", name="台北世貿", label="台北世貿", base_url="https://www.twtc.com.tw/",
+        urls=("https://www.twtc.com.tw/exhibition?p=home",),
+        row_selector="tr", selector="a[href*='detail'], a[href*='id=']",
+        title=title_text, min_title_len=5, full_tree=True, interval=24 * 3600),
+    PlatformSpec(
+        key="cksmh", name="中正紀念堂", label="中正紀念堂", base_url="https://www.cksmh.gov.tw",
+        urls=("https://www.cksmh.gov.tw/activitybee_list.aspx?n=105",),
+        href_pattern=r'activitybee', href_ignore_case=True, interval=24 * 3600),
+    PlatformSpec(
+        key="indievox", name="iNDIEVOX", label="iNDIEVOX", base_url="https://www.indievox.com",
+        urls=("https://www.indievox.com/activity/list",),
+        selector='a[href*="/activity/detail"]', with_image=True, type_override="音樂會/演唱會"),
+    PlatformSpec(
+        # [V62] 不分大小寫過濾 contact, about；標題黑名單在 create_event_obj
+        key="stroll", name="StrollTimes", label="StrollTimes", base_url="https://strolltimes.com",
+        urls=("https://strolltimes.com/",),
+        href_filter=lambda h: len(h) >= 15 and not any(x in h.lower() for x in ['category', 'tag', 'contact', 'about', 'facebook']),
+        join_url=False),
+]
 
-def fetch_wtc(session):
-    logger.info("🚀 啟動 台北世貿...")
-    url = "https://www.twtc.com.tw/exhibition?p=home"
-    html = fetch_text_requests(session, url)
-    if not html: return []
-    soup = BeautifulSoup(html, "html.parser")
-    base_url = "https://www.twtc.com.tw/"
-    events = []
-    seen = set()
-    rows = soup.select("tr")
-    for row in rows:
-        link = row.select_one("a[href*='detail'], a[href*='id=']")
-        if not link: continue
-        href = link['href']
-        raw_title = link.get_text(strip=True)
-        if not raw_title or len(raw_title) < 5: continue
-        full_url = urljoin(base_url, href)
-        if full_url in seen: continue
-        ev = create_event_obj(raw_title, full_url, "台北世貿", None)
-        if ev: events.append(ev); seen.add(full_url)
-    logger.info(f"[台北世貿] 抓取 {len(events)} 筆")
-    return events
+# =========================
+# ✂️ 連結候選剪枝 (學習各平台的活動網址形狀)
+# =========================
+SHAPE_WORD_RE = re.compile(r'[A-Za-z_-]{1,32}(\.[A-Za-z]{2,5})?')
 
-def fetch_cksmh(session):
-    logger.info("🚀 啟動 中正紀念堂 (V62 Broad)...")
-    html = fetch_text_requests(session, "https://www.cksmh.gov.tw/activitybee_list.aspx?n=105")
-    if not html: return []
-    soup = BeautifulSoup(html, "html.parser")
-    # [V62] 廣域搜索
-    links = soup.find_all('a', href=re.compile(r'activitybee', re.I))
-    events = []
-    seen = set()
-    for link in links:
-        href = link.get('href')
-        if not href: continue
-        full_url = urljoin("https://www.cksmh.gov.tw", href)
-        if full_url in seen: continue
-        title = extract_smart_title(link)
-        ev = create_event_obj(title, full_url, "中正紀念堂", None)
-        if ev: events.append(ev); seen.add(full_url)
-    logger.info(f"[中正紀念堂] 抓取 {len(events)} 筆")
-    return events
+@lru_cache(maxsize=8192)
+def url_shape(url):
+    """網址形狀：主機 + 上層路徑 (含數字等非單字的層以 * 代替) + 最後一層 (一律視為可變) + query 參數名稱
+
+    /events/abc123 與 /events/xyz 同形狀；/category/music、/tag/x 與活動頁不同形狀
+    """
+    parts = urlsplit(url)
+    segments = [seg for seg in parts.path.split('/') if seg]
+    shape = [seg if SHAPE_WORD_RE.fullmatch(seg) else '*' for seg in segments[:-1]] + ['*'] * bool(segments)
+    keys = sorted({k for k, _ in parse_qsl(parts.query, keep_blank_values=True)})
+    return parts.netloc.lower() + '/' + '/'.join(shape) + ('?' + '&'.join(keys) if keys else '')
+
+def prunable(spec):
+    """只有寬鬆掃描 (href_pattern / href_filter / 全部 <a href>) 的平台需要剪枝；CSS 選擇器本身已夠精準"""
+    return not spec.selector and not spec.row_selector
+
+class LinkPatterns:
+    """各平台產出過活動的網址形狀 (與最後一次產出的時間) 及已學習的輪數，跨輪次保存"""
+    def __init__(self, path=LINK_PATTERN_FILE, full_scan=FULL_SCAN):
+        self.path = Path(path)
+        self.full_scan = full_scan
+        try:
+            self.platforms = json.loads(self.path.read_text(encoding='utf-8'))
+        except (OSError, ValueError):
+            self.platforms = {}
+
+    def matcher(self, spec):
+        """本輪使用的形狀集合；None 表示全掃描 (指定全掃描、不適用、還沒學夠，或輪到探索)"""
+        entry = self.platforms.get(spec.key)
+        if self.full_scan or not prunable(spec) or not entry or not entry['shapes']: return None
+        if entry['runs'] < PRUNE_MIN_RUNS or entry['runs'] % PRUNE_EXPLORE_EVERY == 0: return None
+        return frozenset(entry['shapes'])
+
+    def learn(self, spec, events):
+        if not prunable(spec): return
+        entry = self.platforms.setdefault(spec.key, {'runs': 0, 'shapes': {}})
+        entry['runs'] += 1
+        now = time.time()
+        for ev in events: entry['shapes'][url_shape(ev['url'])] = now
+
+    def save(self):
+        cutoff = time.time() - PRUNE_FORGET_DAYS * 24 * 3600
+        for entry in self.platforms.values():
+            entry['shapes'] = {shape: t for shape, t in entry['shapes'].items() if t >= cutoff}
+        write_text_atomic(self.path, json.dumps(self.platforms, ensure_ascii=False, indent=1))
 
 # =========================
-# 🕷️ Aiohttp Group
+# 📈 執行指標
 # =========================
+REPORT_FILE = OUTPUT_DIR / "run_report.json"
+# 設定後另外輸出 Prometheus textfile (node_exporter textfile collector 格式)
+PROMETHEUS_TEXTFILE = os.environ.get("PROMETHEUS_TEXTFILE")
 
-async def fetch_indievox_aio():
-    logger.info("🚀 啟動 iNDIEVOX (Aiohttp)...")
-    html = await fetch_text_aiohttp("https://www.indievox.com/activity/list")
-    if not html: return []
-    soup = BeautifulSoup(html, "html.parser")
-    links = soup.select('a[href*="/activity/detail"]')
-    events = []
-    seen = set()
-    for link in links:
-        full_url = urljoin("https://www.indievox.com", link.get('href'))
-        if full_url in seen: continue
-        title = extract_smart_title(link)
-        img = link.find('img')
-        ev = create_event_obj(title, full_url, "iNDIEVOX", img.get('src') if img else None, type_override="音樂會/演唱會")
-        if ev: events.append(ev); seen.add(full_url)
-    logger.info(f"[iNDIEVOX] 抓取 {len(events)} 筆")
-    return events
+URL_METRIC_FIELDS = ('queue', 'sleep', 'backoff', 'ttfb', 'download', 'decode', 'parse', 'normalize')
+URL_COUNT_FIELDS = ('attempts', 'bytes', 'drained', 'dropped', 'anchors', 'structured', 'pruned', 'events')
 
-async def fetch_stroll_aio():
-    logger.info("🚀 啟動 StrollTimes (Aiohttp)...")
-    html = await fetch_text_aiohttp("https://strolltimes.com/")
-    if not html: return []
-    soup = BeautifulSoup(html, "html.parser")
-    # [V62] Case-insensitive + Title Blacklist applied in create_event_obj
-    all_links = soup.find_all('a', href=True)
-    events = []
-    seen = set()
-    for link in all_links:
-        href = link.get('href')
-        if not href or len(href) < 15: continue
-        # [V62] 不分大小寫過濾 contact, about
-        if any(x in href.lower() for x in ['category', 'tag', 'contact', 'about', 'facebook']): continue
-        
-        full_url = href
-        if full_url in seen: continue
-        title = extract_smart_title(link)
-        
-        ev = create_event_obj(title, full_url, "StrollTimes", None)
-        if ev: events.append(ev); seen.add(full_url)
-    logger.info(f"[StrollTimes] 抓取 {len(events)} 筆")
+def error_class(exc):
+    if isinstance(exc, aiohttp.ClientResponseError): return f"HTTP{exc.status}"
+    return type(exc).__name__
+
+class RunMetrics:
+    """本輪的每網址 / 每平台指標 (秒數、位元組、連結數、錯誤類別)"""
+    def __init__(self):
+        self.started_at = datetime.now(TW_TZ)
+        self.run_start = time.monotonic()
+        self.urls = {}
+        self.platforms = {}
+
+    def url(self, url, platform=None):
+        m = self.urls.get(url)
+        if m is None:
+            m = self.urls[url] = {'platform': platform, 'status': None, 'cache': None, 'error': None, 'cut': None,
+                                  **{k: 0.0 for k in URL_METRIC_FIELDS}, **{k: 0 for k in URL_COUNT_FIELDS}}
+        if platform: m['platform'] = platform
+        return m
+
+    @contextmanager
+    def timer(self, record, field):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            record[field] += time.perf_counter() - start
+
+    def platform_started(self, key):
+        self.platforms[key] = {'start': time.monotonic() - self.run_start, 'end': None, 'kept': 0}
+
+    def platform_finished(self, key, kept):
+        self.platforms[key].update(end=time.monotonic() - self.run_start, kept=kept)
+
+    def platform_summary(self):
+        summary = {}
+        for key, p in self.platforms.items():
+            rows = [m for m in self.urls.values() if m['platform'] == key]
+            errors = {}
+            for m in rows:
+                if m['error']: errors[m['error']] = errors.get(m['error'], 0) + 1
+            summary[key] = {
+                'start': round(p['start'], 3), 'end': round(p['end'] or 0, 3),
+                'duration': round((p['end'] or 0) - p['start'], 3),
+                'pages': len(rows), 'events_kept': p['kept'],
+                **{k: round(sum(m[k] for m in rows), 3) for k in URL_METRIC_FIELDS},
+                **{k: sum(m[k] for m in rows) for k in URL_COUNT_FIELDS},
+                'errors': errors,
+            }
+        return summary
+
+    def report(self, total_events, hosts=None):
+        return {
+            'started_at': self.started_at.isoformat(),
+            'duration': round(time.monotonic() - self.run_start, 3),
+            'events_total': total_events,
+            'hosts': hosts or {},
+            'platforms': self.platform_summary(),
+            'urls': {u: {k: round(v, 4) if isinstance(v, float) else v for k, v in m.items()}
+                     for u, m in self.urls.items()},
+        }
+
+    def write(self, report, path=REPORT_FILE, textfile=PROMETHEUS_TEXTFILE):
+        write_text_atomic(path, json.dumps(report, ensure_ascii=False, indent=1))
+        if textfile: write_text_atomic(textfile, prometheus_text(report))
+
+def prometheus_text(report):
+    lines = [
+        "# TYPE scraper_run_duration_seconds gauge",
+        f"scraper_run_duration_seconds {report['duration']}",
+        "# TYPE scraper_run_events gauge",
+        f"scraper_run_events {report['events_total']}",
+    ]
+    gauges = [('duration', 'scraper_platform_duration_seconds'), ('events_kept', 'scraper_platform_events'),
+              ('bytes', 'scraper_platform_bytes'), ('anchors', 'scraper_platform_anchors'),
+              ('structured', 'scraper_platform_structured_events'), ('pruned', 'scraper_platform_pruned_links'),
+              ('dropped', 'scraper_platform_dropped_connections'), ('pages', 'scraper_platform_pages')]
+    gauges += [(k, f"scraper_platform_{k}_seconds") for k in URL_METRIC_FIELDS]
+    for field, name in gauges:
+        lines.append(f"# TYPE {name} gauge")
+        lines += [f'{name}{{platform="{key}"}} {p[field]}' for key, p in report['platforms'].items()]
+    lines.append("# TYPE scraper_host_breaker_open gauge")
+    lines += [f'scraper_host_breaker_open{{host="{host}"}} {int(h["state"] != "closed")}' for host, h in report['hosts'].items()]
+    lines.append("# TYPE scraper_host_saved_seconds gauge")
+    lines += [f'scraper_host_saved_seconds{{host="{host}"}} {h["saved_seconds"]}' for host, h in report['hosts'].items()]
+    lines.append("# TYPE scraper_platform_errors gauge")
+    for key, p in report['platforms'].items():
+        lines += [f'scraper_platform_errors{{platform="{key}",class="{cls}"}} {n}' for cls, n in p['errors'].items()]
+    return "\n".join(lines) + "\n"
+
+# =========================
+# 🗃️ 活動資料庫 (增量更新)
+# =========================
+# 詳細頁補充的欄位只在有值時輸出，沒開補充時 data.json 維持原本的樣子
+DETAIL_FIELDS = ('location', 'region', 'description')
+EVENT_FIELDS = ('title', 'url', 'platform', 'img_url', 'date', 'type') + DETAIL_FIELDS
+TRACKING_PARAMS = re.compile(r'^(utm_\w+|fbclid|gclid|kdid)$', re.I)
+
+def normalize_event_url(url):
+    """去除追蹤參數、排序 query、統一大小寫與結尾斜線，作為活動的穩定鍵值"""
+    parts = urlsplit(url.strip())
+    query = sorted((k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True) if not TRACKING_PARAMS.match(k))
+    path = parts.path.rstrip('/') or '/'
+    return urlunsplit(('', parts.netloc.lower(), path, urlencode(query), ''))
+
+def event_id(url):
+    return hashlib.sha1(normalize_event_url(url).encode('utf-8')).hexdigest()[:16]
+
+# 重複度高的欄位 (平台、類別、日期、地區、同一輪的時間戳) 以 sys.intern 共用同一個字串物件
+INTERNED_FIELDS = frozenset({'platform', 'type', 'date', 'region', 'first_seen', 'last_seen', 'scraped_at'})
+# EventBatch 中「這筆沒有這個欄位」的標記 (輸出時略過該鍵)
+ABSENT = object()
+
+class Event:
+    """活動資料庫中的一筆紀錄；__slots__ 省掉每筆的 dict，重複的字串欄位共用同一物件"""
+    __slots__ = ('id',) + EVENT_FIELDS + ('first_seen', 'last_seen', 'active')
+
+    def __init__(self, eid, first_seen, **fields):
+        self.id = eid
+        for k in EVENT_FIELDS: setattr(self, k, None)
+        self.first_seen = self.last_seen = sys.intern(first_seen) if first_seen else first_seen
+        self.active = True
+        self.update(fields)
+
+    def update(self, fields):
+        for k, v in fields.items():
+            setattr(self, k, sys.intern(v) if k in INTERNED_FIELDS and isinstance(v, str) else v)
+
+    def get(self, key, default=None):
+        return getattr(self, key, default)
+
+    def __getitem__(self, key):
+        return getattr(self, key)
+
+    @classmethod
+    def from_dict(cls, d):
+        ev = cls(d['id'], d.get('first_seen'))
+        ev.update({k: d[k] for k in cls.__slots__ if k in d and k != 'id'})
+        return ev
+
+    def to_dict(self):
+        return {k: getattr(self, k) for k in self.__slots__ if k not in DETAIL_FIELDS or getattr(self, k)}
+
+class EventRow:
+    """EventBatch 中一筆的唯讀視圖，提供與 dict 相同的 ev['x'] / ev.get('x')，不複製資料"""
+    __slots__ = ('batch', 'index')
+
+    def __init__(self, batch, index):
+        self.batch = batch
+        self.index = index
+
+    def __getitem__(self, key):
+        value = self.batch.columns[key][self.index]
+        if value is ABSENT: raise KeyError(key)
+        return value
+
+    def get(self, key, default=None):
+        column = self.batch.columns.get(key)
+        value = ABSENT if column is None else column[self.index]
+        return default if value is ABSENT else value
+
+    def to_dict(self):
+        return {k: col[self.index] for k, col in self.batch.columns.items() if col[self.index] is not ABSENT}
+
+JSON_CONSTANTS = {None: "null", True: "true", False: "false"}
+
+class EventBatch:
+    """欄式活動清單：每個欄位一個 list，不建每筆的 dict
+
+    to_json 直接由欄位組出與 compact_json(list of dict) 完全相同的文字；缺少的欄位以 ABSENT 表示
+    """
+    def __init__(self, columns):
+        self.columns = columns
+
+    @classmethod
+    def from_events(cls, events):
+        """輸出用的欄式活動清單，由新到舊 (不含 last_seen，避免每輪都改動 data.json)"""
+        events = sorted(events, key=lambda r: (r.first_seen, r.platform, r.url), reverse=True)
+        columns = {k: [getattr(rec, k) or ABSENT for rec in events] if k in DETAIL_FIELDS
+                   else [getattr(rec, k) for rec in events] for k in EVENT_FIELDS + ('id', 'first_seen')}
+        columns['scraped_at'] = columns['first_seen']
+        return cls(columns)
+
+    def __len__(self):
+        return len(next(iter(self.columns.values()), ()))
+
+    def __getitem__(self, index):
+        return EventRow(self, index)
+
+    def __iter__(self):
+        return (EventRow(self, i) for i in range(len(self)))
+
+    def column(self, name):
+        return self.columns[name]
+
+    @classmethod
+    def from_dicts(cls, rows):
+        """由 dict 清單建立；欄位順序依各筆 key 的相對順序合併"""
+        fields = []
+        for row in rows:
+            prev = -1
+            for k in row:
+                if k in fields: prev = fields.index(k)
+                else:
+                    prev += 1
+                    fields.insert(prev, k)
+        return cls({k: [row.get(k, ABSENT) for row in rows] for k in fields})
+
+    def select(self, indices):
+        return EventBatch({k: [col[i] for i in indices] for k, col in self.columns.items()})
+
+    def with_column(self, name, values):
+        return EventBatch({**self.columns, name: values})
+
+    def to_json(self, indices=None):
+        """逐欄編碼後逐筆串接：重複值 (平台、類別...) 每個只編碼一次，字串用 json 的 C 編碼函式"""
+        fragments = []
+        for k, col in self.columns.items():
+            if indices is not None: col = [col[i] for i in indices]
+            prefix = "," + json.dumps(k, ensure_ascii=False) + ":"
+            if k in INTERNED_FIELDS:
+                encoded = {}
+                for v in col:
+                    if v not in encoded: encoded[v] = "" if v is ABSENT else prefix + compact_json(v)
+                fragments.append([encoded[v] for v in col])
+            else:
+                fragments.append(["" if v is ABSENT else prefix + (encode_json_string(v) if type(v) is str else
+                                  JSON_CONSTANTS[v] if v is None or type(v) is bool else compact_json(v)) for v in col])
+        return "[" + ",".join("{" + "".join(parts)[1:] + "}" for parts in zip(*fragments)) + "]"
+
+class EventStore:
+    """以穩定 ID 保存活動，逐輪比對出新增 / 異動 / 下架"""
+    def __init__(self, path=EVENT_STORE_FILE, retention_days=EVENT_STORE_RETENTION_DAYS):
+        self.path = Path(path)
+        self.retention = timedelta(days=retention_days)
+        self.records = self._load()
+
+    def _load(self):
+        try:
+            stored = json.loads(self.path.read_text(encoding='utf-8'))['events']
+            return {eid: Event.from_dict(rec) for eid, rec in stored.items()}
+        except (OSError, ValueError, KeyError):
+            pass
+        # 沒有資料庫時以現有 data.json 起始，避免把舊活動全部當成新活動通知
+        try:
+            previous = json.loads(OUTPUT_FILE.read_text(encoding='utf-8'))
+        except (OSError, ValueError):
+            return {}
+        records = {}
+        for e in previous:
+            seen_at = e.get('first_seen') or e.get('scraped_at')
+            eid = e.get('id') or event_id(e['url'])
+            records[eid] = Event(eid, seen_at, **{k: e.get(k) for k in EVENT_FIELDS})
+        return records
+
+    def merge(self, run_events, now, complete):
+        """合併本輪結果；complete 為本輪完整抓取的平台名稱，只有這些平台沒出現的活動才視為下架
+
+        抓取失敗或只抓到部分頁面的平台沿用舊資料 (由呼叫端判斷，不能由回傳的活動推得)
+        """
+        current = {}
+        for ev in run_events:
+            current.setdefault(event_id(ev['url']), ev)
+
+        diff = {'added': [], 'changed': [], 'removed': []}
+        for eid, ev in current.items():
+            fields = {k: ev.get(k) for k in EVENT_FIELDS}
+            rec = self.records.get(eid)
+            if rec is None:
+                rec = self.records[eid] = Event(eid, now)
+                diff['added'].append(rec)
+            elif not rec.active or any(getattr(rec, k) != v for k, v in fields.items()):
+                diff['changed'].append(rec)
+            rec.update(fields)
+            rec.last_seen = sys.intern(now)
+            rec.active = True
+
+        for eid, rec in self.records.items():
+            if rec.active and eid not in current and rec.platform in complete:
+                rec.active = False
+                diff['removed'].append(rec)
+
+        cutoff = (datetime.fromisoformat(now) - self.retention).isoformat()
+        self.records = {eid: rec for eid, rec in self.records.items() if rec.active or rec.last_seen >= cutoff}
+        return diff
+
+    def active_events(self):
+        return EventBatch.from_events(rec for rec in self.records.values() if rec.active)
+
+    def save(self):
+        records = {eid: rec.to_dict() for eid, rec in self.records.items()}
+        write_text_atomic(self.path, json.dumps({'events': records}, ensure_ascii=False))
+
+def write_bytes_atomic(path, data):
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(path.name + ".tmp")
+    tmp.write_bytes(data)
+    os.replace(tmp, path)
+
+def write_text_atomic(path, text):
+    write_bytes_atomic(path, text.encode('utf-8'))
+
+def write_if_changed(path, text):
+    """內容相同就不重寫，讓 git 只看到真正的變動"""
+    try:
+        if Path(path).read_text(encoding='utf-8') == text: return False
+    except OSError:
+        pass
+    write_text_atomic(path, text)
+    return True
+
+# =========================
+# 🏛️ 歷史封存 (每輪快照 → 可回溯任一時間點)
+# =========================
+def archive_time(value):
+    """ISO 時間或日期字串 -> 與資料庫相同格式的台灣時間字串 (未帶時區視為台灣時間)"""
+    at = value if isinstance(value, datetime) else datetime.fromisoformat(value)
+    return (at if at.tzinfo else at.replace(tzinfo=TW_TZ)).astimezone(TW_TZ).isoformat()
+
+class EventArchive:
+    """活動歷史：listings 每列是一檔活動的一個版本與其上架區間 [valid_from, valid_to)，valid_to 為 NULL 表示仍在架上
+
+    只有新增 / 異動 / 下架才寫入，內容不變的活動不會每輪重複一列；runs 記錄每輪各平台的筆數與增減
+    """
+    def __init__(self, path=ARCHIVE_FILE):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.db = sqlite3.connect(self.path)
+        self.db.row_factory = sqlite3.Row
+        self.db.execute("PRAGMA journal_mode=WAL")
+        columns = ", ".join(EVENT_FIELDS)
+        with self.db:
+            self.db.executescript(f"""
+                CREATE TABLE IF NOT EXISTS runs (at TEXT, platform TEXT, events INTEGER,
+                                                 added INTEGER, changed INTEGER, removed INTEGER);
+                CREATE INDEX IF NOT EXISTS runs_platform ON runs (platform, at);
+                CREATE INDEX IF NOT EXISTS runs_at ON runs (at);
+                CREATE TABLE IF NOT EXISTS listings (id TEXT, valid_from TEXT, valid_to TEXT, first_seen TEXT, {columns});
+                CREATE INDEX IF NOT EXISTS listings_id ON listings (id, valid_from);
+                CREATE INDEX IF NOT EXISTS listings_url ON listings (url);
+                CREATE INDEX IF NOT EXISTS listings_platform ON listings (platform, valid_from);
+                CREATE INDEX IF NOT EXISTS listings_type ON listings (type, valid_from);
+                CREATE INDEX IF NOT EXISTS listings_time ON listings (valid_from, valid_to);
+                CREATE UNIQUE INDEX IF NOT EXISTS listings_open ON listings (id) WHERE valid_to IS NULL;
+            """)
+        self.insert_sql = (f"INSERT INTO listings (id, valid_from, first_seen, {columns}) "
+                           f"VALUES ({', '.join('?' * (len(EVENT_FIELDS) + 3))})")
+
+    def close(self):
+        self.db.close()
+
+    def row(self, rec, valid_from):
+        return (rec.id, valid_from, rec.first_seen) + tuple(getattr(rec, k) for k in EVENT_FIELDS)
+
+    def seed(self, store):
+        """封存是空的就以現有活動資料庫起始 (上架時間取 first_seen，已下架的取 last_seen 為下架時間)"""
+        if self.db.execute("SELECT 1 FROM listings LIMIT 1").fetchone(): return
+        with self.db:
+            self.db.executemany(self.insert_sql, [self.row(rec, rec.first_seen) for rec in store.records.values()])
+            self.db.executemany("UPDATE listings SET valid_to=? WHERE id=?",
+                                [(rec.last_seen, rec.id) for rec in store.records.values() if not rec.active])
+
+    def record(self, platform, now, count, diff):
+        """記下一個平台一輪的結果：異動與下架的舊版本結束於 now，新增與異動寫入新版本"""
+        with self.db:
+            self.db.execute("INSERT INTO runs VALUES (?, ?, ?, ?, ?, ?)",
+                            (now, platform, count, len(diff['added']), len(diff['changed']), len(diff['removed'])))
+            # 新增的也先結束舊版本：活動資料庫重建過時，封存裡可能還有它未結束的版本
+            self.db.executemany("UPDATE listings SET valid_to=? WHERE id=? AND valid_to IS NULL",
+                                [(now, rec.id) for recs in diff.values() for rec in recs])
+            self.db.executemany(self.insert_sql, [self.row(rec, now) for rec in diff['added'] + diff['changed']])
+
+    def query(self, start=None, end=None, url=None, platform=None, type=None):
+        """在 [start, end] 期間曾經上架的版本 (皆為選填條件)，依上架時間排序"""
+        where, args = [], []
+        if start: where.append("(valid_to IS NULL OR valid_to > ?)"); args.append(archive_time(start))
+        if end: where.append("valid_from <= ?"); args.append(archive_time(end))
+        if url: where.append("url = ?"); args.append(url)
+        if platform: where.append("platform = ?"); args.append(platform)
+        if type: where.append("type = ?"); args.append(type)
+        sql = "SELECT * FROM listings" + (" WHERE " + " AND ".join(where) if where else "") + " ORDER BY valid_from"
+        return [dict(row) for row in self.db.execute(sql, args)]
+
+    def snapshot(self, at):
+        """某個時間點在架上的活動，格式與當時的 EventStore.active_events() 相同"""
+        at = archive_time(at)
+        events = []
+        for row in self.db.execute("SELECT * FROM listings WHERE valid_from <= ? AND (valid_to IS NULL OR valid_to > ?)",
+                                   (at, at)):
+            events.append(Event(row['id'], row['first_seen'], **{k: row[k] for k in EVENT_FIELDS}))
+        return EventBatch.from_events(events)
+
+    def yields(self, platform=None, start=None, end=None):
+        """各平台每輪的抓取筆數與增減 (平台產出量的時間序列)"""
+        where, args = [], []
+        if platform: where.append("platform = ?"); args.append(platform)
+        if start: where.append("at >= ?"); args.append(archive_time(start))
+        if end: where.append("at <= ?"); args.append(archive_time(end))
+        sql = "SELECT * FROM runs" + (" WHERE " + " AND ".join(where) if where else "") + " ORDER BY at"
+        return [dict(row) for row in self.db.execute(sql, args)]
+
+    def compact(self, days=ARCHIVE_COMPACT_DAYS, now=None):
+        """壓縮 cutoff 之前的歷史：首尾相接的版本併成一段 (保留較新的內容)，執行紀錄併成每平台每日一筆
+
+        cutoff 之後的查詢結果不受影響；回傳 (合併的版本數, 併掉的執行紀錄數)
+        """
+        cutoff = ((now or datetime.now(TW_TZ)) - timedelta(days=days)).isoformat()
+        with self.db:
+            pairs = self.db.execute("""
+                SELECT a.rowid, b.rowid FROM listings a JOIN listings b ON b.id = a.id AND b.valid_from = a.valid_to
+                WHERE a.valid_to < ? ORDER BY a.valid_from""", (cutoff,)).fetchall()
+            for older, newer in pairs:
+                self.db.execute("UPDATE listings SET valid_from = (SELECT valid_from FROM listings WHERE rowid = ?) "
+                                "WHERE rowid = ?", (older, newer))
+                self.db.execute("DELETE FROM listings WHERE rowid = ?", (older,))
+            days_rows = self.db.execute("""
+                SELECT MIN(at), platform, MAX(events), SUM(added), SUM(changed), SUM(removed), COUNT(*) FROM runs
+                WHERE at < ? GROUP BY platform, substr(at, 1, 10)""", (cutoff,)).fetchall()
+            folded = sum(r[6] for r in days_rows) - len(days_rows)
+            if folded:
+                self.db.execute("DELETE FROM runs WHERE at < ?", (cutoff,))
+                self.db.executemany("INSERT INTO runs VALUES (?, ?, ?, ?, ?, ?)", [tuple(r)[:6] for r in days_rows])
+        if pairs or folded: self.db.execute("VACUUM")
+        return len(pairs), folded
+
+def rebuild_outputs(at, archive=None):
+    """不重新爬取，由封存重建某個時間點的 data.json 與分片"""
+    archive = archive or EventArchive()
+    events = archive.snapshot(at)
+    written, shard_count, shard_written, merged = write_outputs(events)
+    logger.info(f"🏛️ 已由封存重建 {archive_time(at)} 的輸出 | {len(events)} 筆 | 跨平台合併 {merged} | "
+                f"分片重寫 {shard_written}/{shard_count}" + ("" if written else " (data.json 無變動)"))
     return events
 
+# =========================
+# 🔗 跨平台去重 (同一檔活動在多個售票網上架)
+# =========================
+# MinHash 簽章長度 (one-permutation hashing 的分箱數) 與 LSH 分段：同一段的值全部相同才成為候選配對
+DEDUP_BINS = 16
+DEDUP_BANDS = 8
+# 候選配對再以實際 Jaccard 相似度 (二字元 shingle) 確認
+DEDUP_THRESHOLD = 0.6
+# 過大的 LSH 桶 (通用標題) 直接略過，避免退化成平方複雜度
+DEDUP_MAX_BUCKET = 50
+# 正規化後完全相同的標題桶另有上限：熱門活動在各平台多場次上架仍要能合併，只擋掉極端的通用標題
+DEDUP_MAX_EXACT_BUCKET = 500
+DEDUP_STRIP_RE = re.compile(r'[^0-9a-z\u3400-\u9fff\uf900-\ufaff]+')
+# 年份、場次、「第五號」「十屆」這類中文序數
+DEDUP_NUMBER_RE = re.compile(r'\d+|(?<=第)[〇一二三四五六七八九十百千]+|[〇一二三四五六七八九十百千]+(?=[號号屆届場季部集])')
+
+def dedup_title(title):
+    """比對用標題：全形轉半形、小寫、去掉標點與空白"""
+    return DEDUP_STRIP_RE.sub('', unicodedata.normalize('NFKC', title).lower())
+
+def title_shingles(text):
+    return {text[i:i + 2] for i in range(len(text) - 1)} or {text}
+
+@lru_cache(maxsize=1 << 16)
+def shingle_hash(shingle):
+    # 內建 hash() 每次執行的種子不同，改用固定的 blake2b 讓分群結果可重現
+    return int.from_bytes(hashlib.blake2b(shingle.encode('utf-8'), digest_size=8).digest(), 'big')
+
+def minhash_signature(shingles):
+    """one-permutation MinHash：每個 shingle 只雜湊一次，依雜湊值分箱取最小值，空箱向右借值 (densification)"""
+    mins = [None] * DEDUP_BINS
+    for sh in shingles:
+        h = shingle_hash(sh)
+        b, v = h % DEDUP_BINS, h // DEDUP_BINS
+        if mins[b] is None or v < mins[b]: mins[b] = v
+    sig, borrowed = [None] * DEDUP_BINS, None
+    for i in range(2 * DEDUP_BINS - 1, -1, -1):
+        k = i % DEDUP_BINS
+        if mins[k] is not None: borrowed = (mins[k], i)
+        if i < DEDUP_BINS: sig[k] = (borrowed[0], borrowed[1] - i)
+    return sig
+
+def numbers_compatible(a, b):
+    """年份、場次等數字不可互相衝突 (一方的數字須包含另一方)"""
+    da, db = set(DEDUP_NUMBER_RE.findall(a)), set(DEDUP_NUMBER_RE.findall(b))
+    return da <= db or db <= da
+
+def find_duplicates(titles, platform_of):
+    """以 MinHash/LSH 找出跨平台的重複活動 (輸入為標題與平台兩欄)，回傳群組 (索引清單)
+
+    只比對落在同一 LSH 桶的配對，不做兩兩比較；同一群組內每個平台最多一筆
+    """
+    keys = [dedup_title(title) for title in titles]
+    shingles = [title_shingles(k) if k else None for k in keys]
+    rows = DEDUP_BINS // DEDUP_BANDS
+    buckets = {}
+    for i, sh in enumerate(shingles):
+        if not sh: continue
+        # 正規化後完全相同的標題另外分桶，通用詞把 LSH 桶撐爆時仍找得到
+        buckets.setdefault(keys[i], []).append(i)
+        sig = minhash_signature(sh)
+        for band in range(DEDUP_BANDS):
+            buckets.setdefault((band, tuple(sig[band * rows:(band + 1) * rows])), []).append(i)
+
+    pairs = set()
+    for key, members in buckets.items():
+        if len(members) < 2 or len(members) > (DEDUP_MAX_EXACT_BUCKET if type(key) is str else DEDUP_MAX_BUCKET): continue
+        for x, i in enumerate(members):
+            for j in members[x + 1:]:
+                if platform_of[i] != platform_of[j]: pairs.add((i, j))
+    scored = []
+    for i, j in pairs:
+        sim = len(shingles[i] & shingles[j]) / len(shingles[i] | shingles[j])
+        if sim >= DEDUP_THRESHOLD and numbers_compatible(keys[i], keys[j]): scored.append((-sim, i, j))
+    scored.sort()
+
+    # 相似度高的先合併 (union-find)；兩群有相同平台就不合併，避免把同平台的不同場次串在一起
+    parent = list(range(len(titles)))
+    platforms = {}
+    def find(x):
+        while parent[x] != x:
+            parent[x] = parent[parent[x]]
+            x = parent[x]
+        return x
+    for _, i, j in scored:
+        a, b = find(i), find(j)
+        if a == b: continue
+        pa = platforms.get(a) or {platform_of[a]}
+        pb = platforms.get(b) or {platform_of[b]}
+        if pa & pb: continue
+        parent[b] = a
+        platforms[a] = pa | pb
+        platforms.pop(b, None)
+    groups = {}
+    for i in range(len(titles)):
+        groups.setdefault(find(i), []).append(i)
+    return [g for g in groups.values() if len(g) > 1]
+
+def merge_duplicates(events):
+    """重複群組合併成一筆代表活動 (最早出現者)，所有上架平台列在 offers [{platform, url}]；其餘順序不變
+
+    輸入與輸出皆為 EventBatch；回傳 (合併後清單, 被併入的筆數)
+    """
+    order = {spec.name: i for i, spec in enumerate(PLATFORMS)}
+    rank = lambda i: (order.get(events[i]['platform'], len(order)), events[i]['url'])
+    offers, dropped = {}, set()
+    for group in find_duplicates(events.column('title'), events.column('platform')):
+        head = min(group, key=lambda i: (events[i].get('first_seen') or '', rank(i)))
+        offers[head] = [{'platform': events[i]['platform'], 'url': events[i]['url']} for i in sorted(group, key=rank)]
+        dropped.update(i for i in group if i != head)
+    if not offers: return events, 0
+    kept = [i for i in range(len(events)) if i not in dropped]
+    merged = events.select(kept).with_column('offers', [offers.get(i, ABSENT) for i in kept])
+    return merged, len(dropped)
+
+# =========================
+# 📦 分片輸出 (PWA 只下載有變動的分片)
+# =========================
+def compact_json(obj):
+    return json.dumps(obj, ensure_ascii=False, separators=(',', ':'))
+
+def platform_slug(name):
+    """平台顯示名稱 -> 分片目錄名；不在 PLATFORMS 的舊資料用名稱轉寫"""
+    for spec in PLATFORMS:
+        if spec.name == name: return spec.key
+    slug = re.sub(r'[^a-z0-9]+', '-', name.lower()).strip('-')
+    return slug or hashlib.sha1(name.encode('utf-8')).hexdigest()[:8]
+
+def write_shard(root, path, text):
+    """寫出一個分片 (精簡 JSON 文字 + .gz)，內容沒變就不重寫；回傳 (manifest 項目, 是否重寫)"""
+    data = text.encode('utf-8')
+    gz_path = root / (path + ".gz")
+    changed = write_if_changed(root / path, data.decode('utf-8')) or not gz_path.exists()
+    if changed: write_bytes_atomic(gz_path, gzip.compress(data, mtime=0))
+    return {'path': path, 'gz': path + ".gz", 'bytes': len(data), 'hash': hashlib.sha256(data).hexdigest()[:16]}, changed
+
+def write_shards(events, root=SHARD_DIR):
+    """依 平台 / 首次出現日期 切分 (輸入需已由新到舊排序)，寫出精簡 JSON、預先壓縮的 .gz 與含內容雜湊的 manifest
+
+    分組時同一輪掃描順便建立搜尋索引；只重寫內容有變的分片，並清掉已不存在的分片；回傳 (分片數, 重寫的分片數，不含搜尋索引)
+    """
+    root = Path(root)
+    groups = {}
+    index = SearchIndexBuilder()
+    slugs = {}
+    platforms, scraped = events.column('platform'), events.column('scraped_at')
+    for i, ev in enumerate(events):
+        slug = slugs.get(platforms[i]) or slugs.setdefault(platforms[i], platform_slug(platforms[i]))
+        groups.setdefault((scraped[i][:10], slug), []).append(i)
+        index.add(ev)
+    shards, written = [], 0
+    for (date, slug), group in sorted(groups.items(), reverse=True):
+        entry, changed = write_shard(root, f"{slug}/{date}.json", events.to_json(group))
+        shards.append({'platform': platforms[group[0]], 'date': date, 'count': len(group), **entry})
+        written += changed
+    search, _ = write_shard(root, SEARCH_INDEX_FILE, compact_json(index.to_dict()))
+    manifest = {'version': 1, 'total': len(events),
+                'latest': scraped[0] if len(events) else None, 'search': search, 'shards': shards}
+    write_if_changed(root / SHARD_MANIFEST.name, compact_json(manifest))
+
+    keep = {root / SHARD_MANIFEST.name} | {root / s[k] for s in shards + [search] for k in ('path', 'gz')}
+    for f in sorted(root.rglob('*'), reverse=True):
+        if f.is_file() and f not in keep: f.unlink()
+        elif f.is_dir() and not any(f.iterdir()): f.rmdir()
+    return len(shards), written
+
+# =========================
+# 🔎 搜尋與篩選索引 (PWA 不必每次掃描全部活動)
+# =========================
+SEARCH_INDEX_FILE = "search.json"
+FACET_FIELDS = ('platform', 'type', 'region')
+WORD_RE = re.compile(r'[a-z0-9]+')
+CJK_RUN_RE = re.compile(r'[\u3400-\u9fff\uf900-\ufaff]+')
+
+def title_terms(title):
+    """標題 -> (英數詞, 中文二字詞)；前端查詢用同樣的切法"""
+    t = title.lower()
+    words = {w for w in WORD_RE.findall(t) if len(w) > 1}
+    bigrams = {run[i:i + 2] for run in CJK_RUN_RE.findall(t) for i in range(len(run) - 1)}
+    return words, bigrams
+
+class SearchIndexBuilder:
+    """逐筆加入活動，建立 facet 計數、facet 倒排、英數詞倒排與中文 bigram 倒排
+
+    倒排清單存的是 ids 陣列中的位置 (遞增)，建置時間與活動數成線性
+    """
+    def __init__(self):
+        self.ids = []
+        self.postings = {field: {} for field in FACET_FIELDS}
+        self.words = {}
+        self.bigrams = {}
+
+    def add(self, ev):
+        pos = len(self.ids)
+        self.ids.append(ev['id'])
+        for field in FACET_FIELDS:
+            value = ev.get(field)
+            # 地區在前端以小寫 key 篩選 (north / central ...)
+            if field == 'region' and value: value = value.lower()
+            if value: self.postings[field].setdefault(value, []).append(pos)
+        # 跨平台合併的活動，篩選任一上架平台都找得到
+        for offer in ev.get('offers', ()):
+            if offer['platform'] != ev['platform']: self.postings['platform'].setdefault(offer['platform'], []).append(pos)
+        words, bigrams = title_terms(ev['title'])
+        for term in words: self.words.setdefault(term, []).append(pos)
+        for term in bigrams: self.bigrams.setdefault(term, []).append(pos)
+
+    def to_dict(self):
+        # 詞彙依字典序輸出，內容相同時雜湊才會相同 (set 的走訪順序每次執行不同)
+        postings = {field: dict(sorted(values.items())) for field, values in self.postings.items()}
+        facets = {field: {value: len(p) for value, p in values.items()} for field, values in postings.items()}
+        return {'version': 1, 'ids': self.ids, 'facets': facets, 'postings': postings,
+                'words': dict(sorted(self.words.items())), 'bigrams': dict(sorted(self.bigrams.items()))}
+
+# =========================
+# 🧾 詳細頁補充 (日期 / 地點 / 地區 / 簡介)
+# =========================
+DETAIL_DATE_LABEL_RE = re.compile(
+    r'^(?:活動時間|活動日期|演出時間|演出日期|展覽日期|展覽期間|展期|日期|時間|date|time)\s*[:：]?\s*(.*)$', re.I)
+DETAIL_VENUE_LABEL_RE = re.compile(
+    r'^(?:活動地點|演出地點|演出場地|展覽地點|地點|場地|地址|venue|location)\s*[:：]?\s*(.*)$', re.I)
+DETAIL_SPACE_RE = re.compile(r'\s+')
+
+def labeled_value(lines, label_re, accept=None):
+    """找「標籤：值」的行；標籤、冒號、值分在不同元素 (各自成行) 的版面也能處理"""
+    for i, line in enumerate(lines):
+        m = label_re.match(line)
+        if not m: continue
+        pieces = (p.strip(':： ') for p in [m.group(1)] + lines[i + 1:i + 3])
+        value = next((p for p in pieces if p), None)
+        if value and (accept is None or accept.search(value)): return value
+    return None
+
+def extract_detail(html):
+    """從活動詳細頁擷取日期、地點、地區與簡介；找不到的欄位不回傳
+
+    頁面有 JSON-LD Event 時先採用其中的日期與地點，其餘欄位再從頁面文字補
+    """
+    soup = make_soup(html)
+    events = [ld_event_fields(ev) for ev in structured_items(html)]
+    detail = dict(events[0][3]) if len(events) == 1 else {}
+    meta = soup.find('meta', attrs={'property': 'og:description'}) or soup.find('meta', attrs={'name': 'description'})
+    if meta and meta.get('content'):
+        desc = DETAIL_SPACE_RE.sub(' ', meta['content']).strip()
+        if desc: detail['description'] = desc[:DETAIL_DESC_MAX]
+    for tag in soup(['script', 'style', 'noscript']): tag.decompose()
+    lines = [line.strip() for line in soup.get_text('\n').splitlines() if line.strip()]
+
+    date_text = labeled_value(lines, DETAIL_DATE_LABEL_RE, DETAIL_DATE_RE)
+    if not date_text:
+        tag = soup.find('time', attrs={'datetime': DETAIL_DATE_RE})
+        date_text = tag and tag['datetime']
+    date = format_dates(date_text)
+    if date: detail.setdefault('date', date)
+
+    venue = labeled_value(lines, DETAIL_VENUE_LABEL_RE)
+    # 太長的多半是整段說明文字，不是地點
+    if venue and len(venue) <= 80: detail.setdefault('location', venue)
+    region = region_of(detail.get('location'))
+    if region: detail['region'] = region
+    return detail
+
+class DetailCache:
+    """詳細頁擷取結果，以網址為 key；超過 TTL 才重抓，重抓前沿用舊值"""
+    def __init__(self, path=DETAIL_CACHE_FILE, ttl=DETAIL_TTL):
+        self.path = Path(path)
+        self.ttl = ttl
+        try:
+            self.entries = json.loads(self.path.read_text(encoding='utf-8'))
+        except (OSError, ValueError):
+            self.entries = {}
+
+    def get(self, url):
+        entry = self.entries.get(url)
+        return entry['detail'] if entry else None
+
+    def due(self, url, now):
+        entry = self.entries.get(url)
+        return entry is None or now - entry['fetched_at'] > self.ttl
+
+    def put(self, url, detail, now):
+        self.entries[url] = {'fetched_at': now, 'detail': detail}
+
+    def save(self):
+        # 很久沒再出現的網址不會被重抓，超過活動資料庫保留期就丟掉
+        cutoff = time.time() - EVENT_STORE_RETENTION_DAYS * 24 * 3600
+        self.entries = {url: e for url, e in self.entries.items() if e['fetched_at'] >= cutoff}
+        write_text_atomic(self.path, json.dumps(self.entries, ensure_ascii=False))
+
+class Enricher:
+    """抓取活動詳細頁補上欄位；只抓新的或過期的網址，每輪最多 limit 頁，其餘留到下一輪
+
+    詳細頁與列表頁同主機，併發與禮貌延遲沿用 Fetcher 的 HostThrottle
+    """
+    def __init__(self, fetcher, cache=None, limit=DETAIL_MAX_PER_RUN):
+        self.fetcher = fetcher
+        self.cache = cache or DetailCache()
+        self.budget = limit
+        self.counters = {'fetched': 0, 'failed': 0, 'deferred': 0}
+
+    async def enrich(self, events):
+        now = time.time()
+        due = [ev['url'] for ev in events if self.cache.due(ev['url'], now)]
+        todo = due[:max(self.budget, 0)]
+        self.budget -= len(todo)
+        self.counters['deferred'] += len(due) - len(todo)
+        await asyncio.gather(*(self._fetch(url, now) for url in todo))
+        return [self.apply(ev) for ev in events]
+
+    async def _fetch(self, url, now):
+        page = await self.fetcher.fetch_page(url, breaker=False)
+        if not page.text:
+            self.counters['failed'] += 1
+            return
+        try:
+            detail = await asyncio.get_running_loop().run_in_executor(None, extract_detail, page.text)
+        except Exception as e:
+            logger.warning(f"⚠️ 詳細頁解析失敗: {url} - {type(e).__name__} {e}")
+            self.counters['failed'] += 1
+            return
+        self.cache.put(url, detail, now)
+        self.counters['fetched'] += 1
+
+    def apply(self, ev):
+        """套上快取的詳細頁欄位；詳細頁沒有地點時以標題中的縣市推地區"""
+        detail = dict(self.cache.get(ev['url']) or {})
+        if 'region' not in detail:
+            region = region_of(ev['title'])
+            if region: detail['region'] = region
+        return {**ev, **detail} if detail else ev
+
+    def save(self):
+        self.cache.save()
+        c = self.counters
+        logger.info(f"🧾 詳細頁補充: 抓取 {c['fetched']} | 失敗 {c['failed']} | 留待下輪 {c['deferred']} | "
+                    f"快取 {len(self.cache.entries)} 筆")
+
+# =========================
+# 🏭 串流管線 (抓取 → 解析 → 清洗分類 → 增量寫出)
+# =========================
+class PlatformRun:
+    """單一平台在管線中的進度；各頁結果依 urls 順序保存，全部完成才合併去重
+
+    missing 記錄抓取失敗、被斷路器略過或解析失敗的頁面；有任何一頁缺漏就是不完整的一輪
+    """
+    def __init__(self, spec, shapes=None):
+        self.spec = spec
+        self.shapes = shapes
+        self.pages = [None] * len(spec.urls)
+        self.missing = []
+        self.queued = 0
+        self.done = 0
+        self.fetched = False
+        self.finished = False
+        self.failed = None
+
+    @property
+    def complete(self):
+        return self.fetched and self.done == self.queued
+
+def parse_page(spec, html, m, metrics, shapes=None):
+    """在解析執行緒中執行"""
+    with metrics.timer(m, 'parse'):
+        return list(extract_candidates(spec, html, m, shapes))
+
+def platform_spec(key):
+    return next(spec for spec in PLATFORMS if spec.key == key)
+
+def parse_in_worker(key, body, encoding, shapes=None):
+    """在解析程序中執行：只收平台代碼與原始位元組 (PlatformSpec 含 lambda 無法 pickle)，
+    回傳 (候選 tuple 清單, {anchors, structured, pruned} 計數, 解碼秒數, 解析秒數)"""
+    started = time.perf_counter()
+    html = decode_body(body, encoding)
+    decoded = time.perf_counter()
+    stats = {'anchors': 0, 'structured': 0, 'pruned': 0}
+    rows = list(extract_candidates(platform_spec(key), html, stats, shapes))
+    return rows, stats, decoded - started, time.perf_counter() - decoded
+
+def process_pool(workers):
+    """解析程序池；不用 fork：建立時事件迴圈的執行緒池可能正持有鎖 (例如 logging)，fork 出的子程序會卡死
+
+    可用 forkserver 時由乾淨的 server 程序分出子程序 (預先載入本模組)，否則用 spawn；子程序重新 import 本模組取得平台設定
+    """
+    if 'forkserver' in multiprocessing.get_all_start_methods():
+        context = multiprocessing.get_context('forkserver')
+        context.set_forkserver_preload([__name__])
+    else:
+        context = multiprocessing.get_context('spawn')
+    return ProcessPoolExecutor(workers, mp_context=context)
+
+class Pipeline:
+    """各階段以有界佇列串接：抓取 → 解析 (執行緒池) → 清洗分類 → (詳細頁補充) → 寫出
+
+    佇列滿了上游就會等待，同時在途的頁面數有上限，記憶體不隨平台數成長；
+    每個平台完成就交給 on_platform(spec, events) 發佈，不必等全部平台結束；有頁面缺漏的平台不發佈
+    """
+    def __init__(self, fetcher, on_platform=None, workers=PARSE_WORKERS, queue_size=PIPELINE_QUEUE_SIZE,
+                 timeout=PLATFORM_TIMEOUT, mode=PARSE_MODE, enricher=None, executor=None, patterns=None):
+        self.fetcher = fetcher
+        self.patterns = patterns
+        self.executor = executor
+        self.on_platform = on_platform
+        self.enricher = enricher
+        self.workers = workers
+        self.mode = mode
+        self.queue_size = queue_size
+        self.timeout = timeout
+        self.results = {}
+        self.failures = {}
+        self.publishing = set()
+
+    async def run(self, specs):
+        """執行所有平台，回傳依平台順序合併的活動清單"""
+        self.pages_q = asyncio.Queue(self.queue_size)
+        self.parsed_q = asyncio.Queue(self.queue_size)
+        self.done_q = asyncio.Queue()
+        runs = [PlatformRun(spec, self.patterns.matcher(spec) if self.patterns else None) for spec in specs]
+        # 常駐模式傳入共用的解析池，不必每輪重建
+        if self.executor: executor = self.executor
+        elif self.mode == "process": executor = process_pool(self.workers)
+        else: executor = ThreadPoolExecutor(self.workers, thread_name_prefix="parse")
+        tasks = [asyncio.create_task(self._parse(executor)) for _ in range(self.workers)]
+        tasks += [asyncio.create_task(self._normalize()), asyncio.create_task(self._write())]
+        try:
+            await asyncio.gather(*(self._fetch(run) for run in runs))
+            for q in (self.pages_q, self.parsed_q, self.done_q): await q.join()
+        finally:
+            for task in tasks: task.cancel()
+            if executor is not self.executor: executor.shutdown(wait=False)
+        return [ev for run in runs for ev in self.results.get(run.spec.key, [])]
+
+    async def _fetch(self, run):
+        spec = run.spec
+        self.fetcher.metrics.platform_started(spec.key)
+        logger.info(f"🚀 啟動 {spec.label}...")
+        if run.shapes is not None: logger.info(f"✂️ [{spec.label}] 只處理 {len(run.shapes)} 種已知網址形狀的連結")
+
+        async def fetch_one(idx, url):
+            page = await self.fetcher.fetch_page(url, decode=self.mode != "process",
+                                                 max_bytes=spec.max_bytes, stop_at=spec.stop_at)
+            await self.pages_q.put((run, idx, page))
+            run.queued += 1
+
+        try:
+            await asyncio.wait_for(asyncio.gather(*(fetch_one(i, u) for i, u in enumerate(spec.urls))), self.timeout)
+        except asyncio.TimeoutError:
+            run.failed = f"超過 {self.timeout}s 未完成"
+        except Exception as e:
+            run.failed = f"{type(e).__name__} {e}"
+        run.fetched = True
+        self._check_done(run)
+
+    async def _parse(self, executor):
+        loop = asyncio.get_running_loop()
+        while True:
+            run, idx, page = await self.pages_q.get()
+            result = None
+            try:
+                m = self.fetcher.metrics.url(page.url, run.spec.key)
+                cached = reuse_cached_events(self.fetcher, page) if page.ok else None
+                if cached is not None:
+                    result = ('events', cached)
+                elif page.text:
+                    result = ('candidates', await loop.run_in_executor(
+                        executor, parse_page, run.spec, page.text, m, self.fetcher.metrics, run.shapes))
+                elif page.body:
+                    rows, stats, decode_s, parse_s = await loop.run_in_executor(
+                        executor, parse_in_worker, run.spec.key, page.body, page.encoding, run.shapes)
+                    for k, v in stats.items(): m[k] += v
+                    m['decode'] += decode_s; m['parse'] += parse_s
+                    result = ('candidates', rows)
+            except Exception as e:
+                logger.error(f"💥 解析失敗: {page.url} - {type(e).__name__} {e}")
+            await self.parsed_q.put((run, idx, page, result))
+            self.pages_q.task_done()
+
+    async def _normalize(self):
+        while True:
+            run, idx, page, result = await self.parsed_q.get()
+            events = []
+            if not result: run.missing.append(page.url)
+            try:
+                if result:
+                    kind, data = result
+                    m = self.fetcher.metrics.url(page.url, run.spec.key)
+                    if kind == 'events': events = data
+                    else:
+                        with self.fetcher.metrics.timer(m, 'normalize'):
+                            events = build_events(run.spec, data)
+                        if self.fetcher.cache: self.fetcher.cache.store_events(page.url, events)
+                    m['events'] = len(events)
+            except Exception as e:
+                logger.error(f"💥 清洗失敗: {page.url} - {type(e).__name__} {e}")
+                run.missing.append(page.url)
+            run.pages[idx] = events
+            run.done += 1
+            self._check_done(run)
+            self.parsed_q.task_done()
+
+    def _check_done(self, run):
+        if run.complete and not run.finished:
+            run.finished = True
+            self.done_q.put_nowait(run)
+
+    async def _write(self):
+        while True:
+            run = await self.done_q.get()
+            # 詳細頁補充要等網路，各平台各自進行，不互相卡住發佈
+            task = asyncio.create_task(self._publish(run))
+            self.publishing.add(task)
+            task.add_done_callback(self.publishing.discard)
+
+    async def _publish(self, run):
+        spec = run.spec
+        events = []
+        try:
+            if run.failed or run.missing:
+                # 不完整的結果 (含部分頁面失敗或被斷路器略過) 不發佈，避免把沒抓到的活動誤判為下架
+                reason = run.failed or f"{len(run.missing)}/{len(spec.urls)} 頁未取得"
+                logger.error(f"❌ 平台任務錯誤 {spec.key}: {reason}")
+                self.failures[spec.key] = reason
+            else:
+                events = merge_page_events(p for p in run.pages if p)
+                if self.patterns and events: self.patterns.learn(spec, events)
+                if self.enricher and events: events = await self._enrich(spec, events)
+            logger.info(f"[{spec.label}] 抓取 {len(events)} 筆")
+            self.results[spec.key] = events
+            if self.on_platform and events: self.on_platform(spec, events)
+        except Exception as e:
+            logger.error(f"❌ 發佈失敗 {spec.key}: {type(e).__name__} {e}")
+        finally:
+            self.fetcher.metrics.platform_finished(spec.key, len(events))
+            self.done_q.task_done()
+
+    async def _enrich(self, spec, events):
+        try:
+            return await asyncio.wait_for(self.enricher.enrich(events), self.timeout)
+        except asyncio.TimeoutError:
+            logger.warning(f"⚠️ [{spec.label}] 詳細頁補充逾時，先以快取內容發佈")
+            return [self.enricher.apply(ev) for ev in events]
+
+# =========================
+# 🔔 通知派送 (outbox → 摘要 → 各通道)
+# =========================
+class NotifyError(Exception):
+    """通道回應失敗；retry_after 為對方要求的等待秒數 (429)"""
+    def __init__(self, status, retry_after=None):
+        super().__init__(f"HTTP {status}")
+        self.status = status
+        self.retry_after = retry_after
+
+async def post_notify(session, url, **kwargs):
+    async with session.post(url, **kwargs) as resp:
+        if resp.status >= 400:
+            retry_after = resp.headers.get('Retry-After')
+            raise NotifyError(resp.status, int(retry_after) if retry_after and retry_after.isdigit() else None)
+
+class LineNotifySink:
+    name = "line"
+    max_chars = 1000          # LINE Notify 單則訊息上限
+    min_interval = NOTIFY_MIN_INTERVAL
+
+    def __init__(self, token, url=LINE_NOTIFY_URL):
+        self.token = token
+        self.url = url
+
+    async def send(self, session, text):
+        await post_notify(session, self.url, headers={"Authorization": f"Bearer {self.token}"}, data={"message": text})
+
+class WebhookSink:
+    """POST JSON {"text": ...}；可指向 Slack / Discord 相容端點或本機替身伺服器"""
+    name = "webhook"
+    max_chars = 4000
+    min_interval = NOTIFY_MIN_INTERVAL
+
+    def __init__(self, url):
+        self.url = url
+
+    async def send(self, session, text):
+        await post_notify(session, self.url, json={"text": text})
+
+def default_sinks():
+    sinks = []
+    if LINE_TOKEN: sinks.append(LineNotifySink(LINE_TOKEN))
+    if NOTIFY_WEBHOOK: sinks.append(WebhookSink(NOTIFY_WEBHOOK))
+    return sinks
+
+def digest_blocks(events, keywords=NOTIFY_KEYWORDS, per_group=NOTIFY_DIGEST_ITEMS):
+    """依關鍵字 (優先) 或類別分組，每組列出前幾筆；回傳文字區塊清單"""
+    groups = {}
+    for ev in events:
+        title = ev['title'].lower()
+        keyword = next((k for k in keywords if k.lower() in title), None)
+        groups.setdefault(f"⭐ {keyword}" if keyword else f"🏷️ {ev.get('type') or '其他'}", []).append(ev)
+    keyword_groups = [f"⭐ {k}" for k in keywords if f"⭐ {k}" in groups]
+    others = sorted((g for g in groups if g not in keyword_groups), key=lambda g: -len(groups[g]))
+    blocks = []
+    for group in keyword_groups + others:
+        items = groups[group]
+        lines = [f"\n【{group}】{len(items)} 筆"]
+        lines += [f"📌 {ev['title'][:30]}\n🔗 {ev['url']}" for ev in items[:per_group]]
+        if len(items) > per_group: lines.append(f"...還有 {len(items) - per_group} 筆，請上網頁查看！")
+        blocks.append("\n".join(lines))
+    return blocks
+
+def pack_messages(header, blocks, max_chars):
+    """把區塊依序裝進不超過 max_chars 的訊息；單一區塊過長時截斷"""
+    messages, current = [], header
+    for block in blocks:
+        if len(current) + len(block) + 1 > max_chars and current != header:
+            messages.append(current)
+            current = ""
+        current = (current + "\n" + block)[:max_chars]
+    if current: messages.append(current)
+    return messages
+
+class Notifier:
+    """通知派送：新活動先寫進持久化的 outbox，累積一段時間後依關鍵字 / 類別整理成摘要，
+    在背景送往各通道 (LINE、webhook)；各通道限速，失敗以指數退避重試並計數，程式中斷也不會遺失
+    """
+    def __init__(self, sinks=None, path=OUTBOX_FILE, window=NOTIFY_BATCH_WINDOW):
+        self.sinks = {sink.name: sink for sink in (default_sinks() if sinks is None else sinks)}
+        self.path = Path(path)
+        self.window = window
+        self.counters = {'queued': 0, 'sent': 0, 'failed': 0, 'dropped': 0}
+        self.next_send = {}
+        self.wake = asyncio.Event()
+        self.closing = False
+        self.session = None
+        try:
+            self.outbox = json.loads(self.path.read_text(encoding='utf-8'))
+        except (OSError, ValueError):
+            self.outbox = {'events': [], 'since': None, 'messages': []}
+
+    async def __aenter__(self):
+        self.session = aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=HTTP_TIMEOUT))
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.session.close()
+        self.save()
+
+    def enqueue(self, events):
+        if not self.sinks or not events: return
+        self.outbox['events'] += [{k: ev.get(k) for k in ('title', 'url', 'platform', 'type')} for ev in events]
+        self.outbox['since'] = self.outbox['since'] or time.time()
+        self.counters['queued'] += len(events)
+        self.save()
+        self.wake.set()
+
+    def digest(self):
+        """把累積的新活動整理成各通道的訊息放進 outbox"""
+        events = self.outbox['events']
+        if not events: return
+        header = f"\n🔥 發現 {len(events)} 個新活動！"
+        blocks = digest_blocks(events)
+        now = time.time()
+        for sink in self.sinks.values():
+            self.outbox['messages'] += [{'sink': sink.name, 'text': text, 'attempts': 0, 'next_at': now}
+                                        for text in pack_messages(header, blocks, sink.max_chars)]
+        self.outbox.update(events=[], since=None)
+        self.save()
+
+    async def dispatch(self, flush=False):
+        """送出到期的訊息；回傳距離下一件工作的秒數 (沒有待辦則為 None)"""
+        since = self.outbox['since']
+        if not since and not self.outbox['messages']: return None
+        if since and (flush or time.time() - since >= self.window): self.digest()
+        pending = []
+        for msg in self.outbox['messages']:
+            sink = self.sinks.get(msg['sink'])
+            if sink is None:
+                # 通道已移除 (例如取消設定 LINE_TOKEN)，訊息無法再送
+                self.counters['dropped'] += 1
+                continue
+            now = time.time()
+            if msg['next_at'] > now or self.next_send.get(sink.name, 0) > now:
+                pending.append(msg)
+                continue
+            self.next_send[sink.name] = now + sink.min_interval
+            try:
+                await sink.send(self.session, msg['text'])
+                self.counters['sent'] += 1
+            except (aiohttp.ClientError, asyncio.TimeoutError, NotifyError) as e:
+                msg['attempts'] += 1
+                self.counters['failed'] += 1
+                if msg['attempts'] >= NOTIFY_MAX_ATTEMPTS:
+                    self.counters['dropped'] += 1
+                    logger.error(f"🔕 通知放棄 ({sink.name}): 已失敗 {msg['attempts']} 次 - {type(e).__name__} {e}")
+                    continue
+                wait = NOTIFY_BACKOFF * 2 ** (msg['attempts'] - 1)
+                if isinstance(e, NotifyError) and e.retry_after:
+                    wait = max(wait, e.retry_after)
+                    self.next_send[sink.name] = time.time() + e.retry_after
+                msg['next_at'] = time.time() + wait
+                logger.warning(f"⚠️ 通知失敗 ({sink.name}) 第 {msg['attempts']} 次，{wait:.0f}s 後重試 - {type(e).__name__} {e}")
+                pending.append(msg)
+        self.outbox['messages'] = pending
+        self.save()
+        due = [max(m['next_at'], self.next_send.get(m['sink'], 0)) for m in pending]
+        if self.outbox['since']: due.append(self.outbox['since'] + self.window)
+        return max(0.0, min(due) - time.time()) if due else None
+
+    async def run(self):
+        """背景派送迴圈：有新活動或到了重試時間就處理"""
+        while not self.closing:
+            # 先清再派送：派送期間的 enqueue / finish 留下的喚醒訊號不會被抹掉
+            self.wake.clear()
+            delay = await self.dispatch()
+            if self.closing: break
+            try:
+                await asyncio.wait_for(self.wake.wait(), delay)
+            except asyncio.TimeoutError:
+                pass
+
+    async def finish(self, dispatcher, timeout):
+        """單次執行結束前：等背景迴圈送完手上這則後停下，再立即整理摘要並在 timeout 內盡量送完；
+        沒送完的留在 outbox 給下一輪 (背景迴圈超過 timeout 還沒停下就取消)"""
+        self.closing = True
+        self.wake.set()
+        deadline = time.monotonic() + timeout
+        try:
+            await asyncio.wait_for(dispatcher, timeout)
+        except asyncio.TimeoutError:
+            logger.warning(f"⚠️ 通知背景派送 {timeout}s 內未停下，已取消")
+        delay = await self.dispatch(flush=True)
+        while delay is not None and time.monotonic() + delay < deadline:
+            await asyncio.sleep(delay)
+            delay = await self.dispatch(flush=True)
+        c = self.counters
+        if any(c.values()) or self.outbox['messages']:
+            logger.info(f"🔔 通知: 排入 {c['queued']} 筆活動 | 送出 {c['sent']} 則 | 失敗 {c['failed']} 次 | "
+                        f"放棄 {c['dropped']} 則 | outbox 剩 {len(self.outbox['messages'])} 則")
+
+    def status(self):
+        return {**self.counters, 'pending_events': len(self.outbox['events']),
+                'pending_messages': len(self.outbox['messages']), 'sinks': list(self.sinks)}
+
+    def save(self):
+        if not self.sinks and not self.path.exists(): return
+        write_text_atomic(self.path, json.dumps(self.outbox, ensure_ascii=False))
+
 # =========================
 # 💾 存檔與執行
 # =========================
-def send_line_notify(message):
-    if not LINE_TOKEN: return
-    try:
-        requests.post(
-            "https://notify-api.line.me/api/notify",
-            headers={"Authorization": f"Bearer {LINE_TOKEN}"},
-            data={"message": message},
-            timeout=10
-        )
-    except: pass
-
-def save_data_and_notify(new_events):
-    OUTPUT_DIR.mkdir(parents=True, exist_ok=True)
-    with open(OUTPUT_FILE, 'w', encoding='utf-8') as f:
-        json.dump(new_events, f, ensure_ascii=False, indent=2)
-    
-    logger.info(f"📊 資料庫重置完畢 | 本次總筆數: {len(new_events)}")
-
-    if new_events and LINE_TOKEN:
-        msg = f"\n🔥 發現 {len(new_events)} 個新活動！\n"
-        for e in new_events[:5]:
-            msg += f"\n📌 {e['title'][:30]}\n🔗 {e['url']}\n"
-        if len(new_events) > 5:
-            msg += f"\n...還有 {len(new_events)-5} 筆，請上網頁查看！"
-        send_line_notify(msg)
-
-async def main_async():
+def write_outputs(output):
+    """跨平台去重後寫出 data.json 與 PWA 分片 (輸入為 EventBatch)；回傳 (data.json 是否改變, 分片數, 重寫分片數, 合併筆數)"""
+    output, merged = merge_duplicates(output)
+    return write_merged(output) + (merged,)
+
+def write_merged(output):
+    """寫出已去重的 data.json 與 PWA 分片；回傳 (data.json 是否改變, 分片數, 重寫分片數)"""
+    if PRETTY_OUTPUT: text = json.dumps([ev.to_dict() for ev in output], ensure_ascii=False, indent=2)
+    else: text = output.to_json()
+    return (write_if_changed(OUTPUT_FILE, text),) + write_shards(output)
+
+class IncrementalWriter:
+    """每個平台完成就併入活動資料庫並重新發佈輸出；之後的平台卡住或程式中斷，已完成的結果仍已落地
+
+    寫出 (去重、data.json、分片與 gzip) 在背景執行緒進行，不卡住事件迴圈上其他平台的抓取；
+    寫出期間完成的平台合併成下一次寫出。lock 由共用同一份輸出的 writer 共用 (常駐模式)
+
+    新活動通知以去重後的群組為單位：同一檔活動在多個平台上架只通知一次，群組裡有先前就存在的活動則不通知
+    """
+    def __init__(self, store=None, skip_unchanged=False, notifier=None, archive=None, lock=None):
+        self.store = store or EventStore()
+        self.skip_unchanged = skip_unchanged
+        self.notifier = notifier
+        self.archive = archive
+        self.lock = lock or asyncio.Lock()
+        self.now = datetime.now(TW_TZ).isoformat()
+        self.diff = {'added': [], 'changed': [], 'removed': []}
+        self.written = False
+        self.pending = []
+        self.task = None
+        self.notified = set()
+
+    def publish(self, spec, events):
+        """on_platform 回呼：Pipeline 只交出所有頁面都成功的平台，沒出現的舊活動才能視為下架"""
+        diff = self.store.merge(events, self.now, {spec.name})
+        for k in self.diff: self.diff[k] += diff[k]
+        self.store.save()
+        if self.archive: self.archive.record(spec.name, self.now, len(events), diff)
+        if self.skip_unchanged and not any(diff.values()):
+            logger.info(f"💾 [{spec.label}] 無變動，不重新發佈")
+            return
+        logger.info(f"💾 [{spec.label}] 已併入 | 新增 {len(diff['added'])} | 異動 {len(diff['changed'])} | "
+                    f"下架 {len(diff['removed'])}")
+        self.pending.append(spec.label)
+        if self.task is None or self.task.done(): self.task = asyncio.create_task(self._write())
+
+    async def _write(self):
+        loop = asyncio.get_running_loop()
+        async with self.lock:
+            while self.pending:
+                labels, self.pending = self.pending, []
+                try:
+                    # 快照在事件迴圈上取 (資料庫只在這裡被修改)，之後的去重與寫檔交給執行緒
+                    output, merged = await loop.run_in_executor(None, merge_duplicates, self.store.active_events())
+                    self.announce(output)
+                    written, shard_count, shard_written = await loop.run_in_executor(None, write_merged, output)
+                except Exception as e:
+                    logger.error(f"❌ 寫出失敗 ({', '.join(labels)}): {type(e).__name__} {e}")
+                    continue
+                self.written = self.written or written
+                logger.info(f"💾 已發佈 ({', '.join(labels)}) | 跨平台合併 {merged} | 分片重寫 {shard_written}/{shard_count}")
+
+    def announce(self, output):
+        """去重後的代表活動中，整個群組都是本輪才首次出現 (代表取最早出現者) 且尚未通知過的，放進通知 outbox"""
+        if not self.notifier: return
+        fresh = []
+        for i, first_seen in enumerate(output.column('first_seen')):
+            if first_seen != self.now: continue
+            ev = output[i]
+            urls = [offer['url'] for offer in ev.get('offers') or ()] or [ev['url']]
+            # 稍早的發佈已通知過群組裡的某一筆 (之後才有其他平台上架)，不再重複通知
+            if self.notified.isdisjoint(urls): fresh.append(ev)
+            self.notified.update(urls)
+        self.notifier.enqueue(fresh)
+
+    async def flush(self):
+        """等背景寫出完成 (含排隊中的平台)"""
+        if self.task: await self.task
+
+    def finish(self):
+        diff = self.diff
+        logger.info(f"📊 資料庫增量更新 | 新增 {len(diff['added'])} | 異動 {len(diff['changed'])} | "
+                    f"下架 {len(diff['removed'])} | 目前總筆數: {len(self.store.active_events())}"
+                    + ("" if self.written else " (data.json 無變動)"))
+
+def log_critical_path(metrics, throttle):
+    """輸出關鍵路徑摘要：哪個主機 / 平台決定了本輪總耗時"""
+    total = time.monotonic() - metrics.run_start
+    slowest = sorted(metrics.platforms.items(), key=lambda kv: kv[1]['end'], reverse=True)[:3]
+    logger.info(f"⏱️ 本輪總耗時 {total:.1f}s | 最慢平台: " + ", ".join(
+        f"{key} {p['end']:.1f}s" for key, p in slowest))
+    hosts = [(h, st) for h, st in throttle.stats.items() if st['last_end'] is not None]
+    hosts.sort(key=lambda kv: kv[1]['last_end'], reverse=True)
+    for host, st in hosts[:3]:
+        logger.info(f"⏱️ 主機 {host}: 結束於 {st['last_end'] - metrics.run_start:.1f}s | "
+                    f"{st['requests']} 次請求 | 累計排隊等待 {st['sleep']:.1f}s")
+    if hosts:
+        logger.info(f"🧭 關鍵路徑主機: {hosts[0][0]}")
+
+async def main_async(specs=None, full_scan=FULL_SCAN):
     logger.info(f"🔥 爬蟲程式開始執行 V62 (Refined Polish)...")
-    
-    session = create_session()
-    sync_events = []
+    specs = specs or PLATFORMS
+
+    # 所有平台同時啟動，共用一個連線池；禮貌延遲與併發上限由 HostThrottle 依主機各自控管
+    # 抓到的頁面經管線解析、清洗分類，每個平台完成就立即併入資料庫並發佈
+    metrics = RunMetrics()
+    cache = HttpCache()
+    health = HostHealth()
+    recorder = FixtureArchive(RECORD_DIR) if RECORD_DIR else None
+    archive = EventArchive()
+    patterns = LinkPatterns(full_scan=full_scan)
+    # 通知在背景派送，各平台發佈後的寫出就把新活動 (以去重群組為單位) 放進 outbox，不等到整輪結束
+    async with Notifier() as notifier:
+        dispatcher = asyncio.create_task(notifier.run())
+        writer = IncrementalWriter(notifier=notifier, archive=archive)
+        archive.seed(writer.store)
+        async with Fetcher(cache=cache, metrics=metrics, health=health, recorder=recorder) as fetcher:
+            enricher = Enricher(fetcher) if ENRICH_DETAILS else None
+            all_events = await Pipeline(fetcher, on_platform=writer.publish, enricher=enricher,
+                                        patterns=patterns).run(specs)
+        await writer.flush()
+        cache.save()
+        patterns.save()
+        health.save()
+        if recorder: recorder.save()
+        if enricher: enricher.save()
+
+        logger.info(f"🔍 本輪爬取匯總: 共抓取到 {len(all_events)} 筆有效資料")
+        log_critical_path(metrics, fetcher.throttle)
+        metrics.write(metrics.report(len(all_events), hosts=health.summary()))
+        writer.finish()
+        await notifier.finish(dispatcher, NOTIFY_DRAIN_TIMEOUT)
+    archive.compact()
+    archive.close()
+
+async def dry_run_async(specs=None, full_scan=FULL_SCAN):
+    """照常抓取、解析、分類並與活動資料庫比對，但不寫出任何檔案 (輸出、資料庫、封存、HTTP 快取、剪枝形狀、通知)"""
+    store = EventStore()
+    now = datetime.now(TW_TZ).isoformat()
+    def preview(spec, events):
+        diff = store.merge(events, now, {spec.name})
+        logger.info(f"🧪 [{spec.label}] {len(events)} 筆 | 新增 {len(diff['added'])} | 異動 {len(diff['changed'])} | "
+                    f"下架 {len(diff['removed'])}")
+    async with Fetcher(health=HostHealth()) as fetcher:
+        events = await Pipeline(fetcher, on_platform=preview, patterns=LinkPatterns(full_scan=full_scan)).run(specs or PLATFORMS)
+    logger.info(f"🧪 試跑結束：共 {len(events)} 筆，未寫出任何檔案")
+    return events
+
+async def replay_events(archive, specs=None, mode=PARSE_MODE, workers=PARSE_WORKERS):
+    """經由本機替身伺服器跑完整抓取管線 (Fetcher、節流、解碼、解析、清洗、分類)，回傳 (活動, 指標)"""
+    runner, base = await serve_fixtures(archive)
     try:
-        sync_events.extend(fetch_kktix(session))
-        sync_events.extend(fetch_accupass(session))
-        sync_events.extend(fetch_tixcraft(session))
-        sync_events.extend(fetch_kham(session))
-        sync_events.extend(fetch_opentix(session))
-        sync_events.extend(fetch_udn(session))
-        sync_events.extend(fetch_fami(session))
-        sync_events.extend(fetch_era(session))
-        sync_events.extend(fetch_tixfun(session))
-        sync_events.extend(fetch_eventgo(session))
-        sync_events.extend(fetch_beclass(session))
-        sync_events.extend(fetch_ibon(session))
-        sync_events.extend(fetch_huashan(session))
-        sync_events.extend(fetch_songshan(session))
-        sync_events.extend(fetch_kidsclub(session))
-        sync_events.extend(fetch_wtc(session))
-        sync_events.extend(fetch_cksmh(session))
-    except Exception as e:
-        logger.error(f"❌ 同步任務錯誤: {e}")
+        fetcher = Fetcher(throttle=HostThrottle(delay=(0, 0)), replay=base)
+        async with fetcher:
+            events = await Pipeline(fetcher, mode=mode, workers=workers).run(specs or PLATFORMS)
     finally:
-        session.close()
+        await runner.cleanup()
+    return events, fetcher.metrics
 
-    async_events = []
-    try:
-        async_events.extend(await fetch_indievox_aio())
-        async_events.extend(await fetch_stroll_aio())
-    except Exception as e:
-        logger.error(f"❌ 非同步任務錯誤: {e}")
+# =========================
+# 🛰️ 常駐模式 (各平台各自排程)
+# =========================
+class Daemon:
+    """常駐服務：連線池、HTTP 快取、斷路器、活動資料庫與解析池都留在記憶體
+
+    各平台依 interval (加抖動) 各自重抓，有變動才重新發佈；本機控制端點可查看排程與手動觸發
+    """
+    def __init__(self, specs=None, host=CONTROL_HOST, port=CONTROL_PORT, full_scan=FULL_SCAN):
+        self.specs = {spec.key: spec for spec in (specs or PLATFORMS)}
+        self.host = host
+        self.port = port
+        self.full_scan = full_scan
+        self.state = {key: {'interval': spec.interval, 'next_at': None, 'last_run': None, 'duration': None,
+                            'events': None, 'error': None, 'runs': 0, 'running': False, 'metrics': None}
+                      for key, spec in self.specs.items()}
+
+    async def run(self):
+        self.cache, self.health, self.store = HttpCache(), HostHealth(), EventStore()
+        self.details = DetailCache()
+        self.patterns = LinkPatterns(full_scan=self.full_scan)
+        self.archive = EventArchive()
+        self.archive.seed(self.store)
+        self.archive.compact()
+        self.wake = {key: asyncio.Event() for key in self.specs}
+        self.output_lock = asyncio.Lock()
+        self.notifier = Notifier()
+        self.schedule_from_store()
+        if PARSE_MODE == "process": self.executor = process_pool(PARSE_WORKERS)
+        else: self.executor = ThreadPoolExecutor(PARSE_WORKERS, thread_name_prefix="parse")
+        async with Fetcher(cache=self.cache, health=self.health) as fetcher, self.notifier:
+            self.fetcher = fetcher
+            runner = await self.serve()
+            try:
+                await asyncio.gather(self.notifier.run(), *(self.loop(spec) for spec in self.specs.values()))
+            finally:
+                await runner.cleanup()
+                self.executor.shutdown(wait=False)
+                self.save()
+                self.archive.close()
+
+    def schedule_from_store(self):
+        """上次成功抓取 (資料庫 last_seen) 加上間隔；重啟常駐程式不會把所有平台重抓一遍"""
+        last_seen = {}
+        for rec in self.store.records.values():
+            last_seen[rec.platform] = max(last_seen.get(rec.platform, ''), rec.last_seen or '')
+        now = time.time()
+        for key, spec in self.specs.items():
+            seen = last_seen.get(spec.name)
+            due = datetime.fromisoformat(seen).timestamp() + spec.interval if seen else now
+            self.state[key]['next_at'] = max(due, now) + random.uniform(0, STARTUP_SPREAD)
+
+    async def loop(self, spec):
+        st, wake = self.state[spec.key], self.wake[spec.key]
+        while True:
+            delay = st['next_at'] - time.time()
+            if delay > 0:
+                try:
+                    await asyncio.wait_for(wake.wait(), delay)
+                except asyncio.TimeoutError:
+                    pass
+            wake.clear()
+            # 單一平台的例外 (含存檔、寫出) 不能讓整個常駐程式停下
+            try:
+                await self.refresh(spec)
+            except Exception as e:
+                error = f"{type(e).__name__} {e}"
+                logger.error(f"❌ 常駐排程錯誤 {spec.key}: {error}")
+                st.update(running=False, error=error, next_at=time.time() + min(spec.interval, REFRESH_RETRY))
+
+    async def refresh(self, spec):
+        st = self.state[spec.key]
+        st['running'] = True
+        started = time.time()
+        # 每次重抓各自一份指標，結束後只留平台摘要，網址明細不會在常駐程式中無限累積
+        fetcher = self.fetcher.with_metrics(RunMetrics())
+        writer = IncrementalWriter(self.store, skip_unchanged=True, notifier=self.notifier, archive=self.archive,
+                                   lock=self.output_lock)
+        enricher = Enricher(fetcher, self.details) if ENRICH_DETAILS else None
+        pipeline = Pipeline(fetcher, on_platform=writer.publish, enricher=enricher, executor=self.executor,
+                            patterns=self.patterns)
+        try:
+            events = await pipeline.run([spec])
+            error = pipeline.failures.get(spec.key) or (None if events else "0 筆")
+            await writer.flush()
+            writer.finish()
+        except Exception as e:
+            events, error = [], f"{type(e).__name__} {e}"
+            logger.error(f"❌ 常駐排程錯誤 {spec.key}: {error}")
+        interval = spec.interval if not error else min(spec.interval, REFRESH_RETRY)
+        st.update(running=False, last_run=started, duration=round(time.time() - started, 1),
+                  events=len(events), error=error, runs=st['runs'] + 1,
+                  metrics=fetcher.metrics.platform_summary().get(spec.key),
+                  next_at=time.time() + interval * random.uniform(1 - REFRESH_JITTER, 1 + REFRESH_JITTER))
+        self.save()
+
+    def save(self):
+        self.cache.save()
+        self.health.save()
+        self.patterns.save()
+        if ENRICH_DETAILS: self.details.save()
+
+    async def serve(self):
+        app = web.Application()
+        app.router.add_get('/status', self.handle_status)
+        app.router.add_post('/refresh/{key}', self.handle_refresh)
+        runner = web.AppRunner(app, access_log=None)
+        await runner.setup()
+        await web.TCPSite(runner, self.host, self.port).start()
+        logger.info(f"🛰️ 常駐模式啟動，控制端點 http://{self.host}:{self.port}/status")
+        return runner
+
+    def status(self):
+        now = time.time()
+        platforms = {}
+        for key, st in self.state.items():
+            platforms[key] = {
+                **{k: st[k] for k in ('interval', 'duration', 'events', 'error', 'runs', 'running', 'metrics')},
+                'next_in': max(0, round(st['next_at'] - now)),
+                'last_run': datetime.fromtimestamp(st['last_run'], TW_TZ).isoformat() if st['last_run'] else None,
+            }
+        return {'platforms': platforms, 'events_total': sum(1 for r in self.store.records.values() if r.active),
+                'http_cache': self.cache.counters, 'hosts': self.health.summary(), 'notify': self.notifier.status()}
+
+    async def handle_status(self, request):
+        return web.json_response(self.status(), dumps=partial(json.dumps, ensure_ascii=False))
+
+    async def handle_refresh(self, request):
+        key = request.match_info['key']
+        keys = list(self.specs) if key == "all" else [key]
+        if any(k not in self.specs for k in keys):
+            return web.json_response({'error': f"unknown platform {key}"}, status=404)
+        for k in keys:
+            self.state[k]['next_at'] = time.time()
+            self.wake[k].set()
+        return web.json_response({'queued': keys}, status=202)
+
+# =========================
+# ⌨️ 命令列
+# =========================
+def build_parser():
+    keys = [spec.key for spec in PLATFORMS]
+    parser = argparse.ArgumentParser(prog="scraper.py", description="台灣藝文活動爬蟲；不帶子命令等同 scrape (cron / Termux)")
+    # 子命令沒定義的選項 (含不帶子命令時) 的預設值
+    parser.set_defaults(platform=None, dry_run=False, full_scan=False)
+    sub = parser.add_subparsers(dest="command")
+
+    def platform_option(p):
+        p.add_argument("-p", "--platform", action="append", choices=keys, metavar="KEY",
+                       help="只處理指定平台，可重複 (" + ", ".join(keys) + ")")
+
+    def full_scan_option(p):
+        p.add_argument("--full-scan", action="store_true", help="不使用學到的網址形狀剪枝，每個連結都完整處理")
+
+    p = sub.add_parser("scrape", help="單次抓取並發佈 data.json / 分片")
+    platform_option(p)
+    p.add_argument("--dry-run", action="store_true", help="只抓取並比對，不寫出任何檔案")
+    full_scan_option(p)
+    p = sub.add_parser("replay", help="以錄製檔離線重播抓取流程 (不寫出 data.json)")
+    platform_option(p)
+    p.add_argument("--fixtures", default="fixtures", help="錄製檔目錄 (預設 fixtures)")
+    p.add_argument("--output", help="把重播得到的活動寫成 JSON 檔")
+    p = sub.add_parser("rebuild", help="由歷史封存重建某個時間點的 data.json 與分片")
+    p.add_argument("at", nargs="?", help="ISO 時間或日期 (預設為現在)")
+    p = sub.add_parser("daemon", help="常駐模式，各平台依間隔各自重抓")
+    platform_option(p)
+    full_scan_option(p)
+    return parser
 
-    all_events = sync_events + async_events
-    logger.info(f"🔍 本輪爬取匯總: 共抓取到 {len(all_events)} 筆有效資料")
-    save_data_and_notify(all_events)
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    command = args.command or "scrape"
+    setup_logging(mode='w' if command in ("scrape", "daemon") and not args.dry_run else 'a')
+    specs = [spec for spec in PLATFORMS if not args.platform or spec.key in args.platform]
+    full_scan = args.full_scan or FULL_SCAN
+    if command == "daemon": asyncio.run(Daemon(specs, full_scan=full_scan).run())
+    elif command == "rebuild": rebuild_outputs(args.at or datetime.now(TW_TZ))
+    elif command == "replay":
+        events, _ = asyncio.run(replay_events(FixtureArchive(args.fixtures), specs))
+        logger.info(f"📼 重播完成：共 {len(events)} 筆")
+        if args.output: write_text_atomic(args.output, json.dumps(events, ensure_ascii=False, indent=1))
+    elif command == "scrape" and args.dry_run: asyncio.run(dry_run_async(specs, full_scan))
+    elif command == "scrape": asyncio.run(main_async(specs, full_scan))
 
 if __name__ == "__main__":
-    asyncio.run(main_async())
+    main()